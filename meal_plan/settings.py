@@ -1,4 +1,5 @@
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -33,7 +34,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'recipes.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -82,13 +83,38 @@ WSGI_APPLICATION = 'meal_plan.wsgi.application'
 
 
 
+# MEAL_PLAN_DB_NAME points the app at a database file other than db.sqlite3 in the project root.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('MEAL_PLAN_DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# MEAL_PLAN_DB_PROFILE=production tunes SQLite for concurrent requests: WAL lets readers run
+# alongside the single writer, write transactions take the write lock up front (BEGIN IMMEDIATE)
+# instead of failing with "database is locked" when a read lock cannot be upgraded, and waiting
+# writers queue for up to ``timeout`` seconds. Connections persist across requests so the
+# pragmas and page cache are set up once per worker thread rather than once per request.
+DATABASE_PROFILE = os.environ.get('MEAL_PLAN_DB_PROFILE', 'default')
+SQLITE_PRODUCTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+)
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRODUCTION_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    })
+
 
 
 
@@ -126,3 +152,57 @@ STATIC_URL = 'static/'
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Default page size of the keyset-paginated list endpoints; clients may override it with ?page_size=.
+API_PAGE_SIZE = 50
+
+# Latency budget for ranking leftover-ingredient suggestions; see recipes/leftovers.py.
+LEFTOVER_SUGGESTION_BUDGET_MS = 50
+
+# Bayesian prior for recipe rating scores: ratings are shrunk towards this mean as if it had this many reviews.
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 5
+
+# Popular recipe leaderboards: how many recipes each keeps, how many seconds a process may serve
+# its copy before checking for changes made elsewhere, and the half-life of the trending board.
+POPULAR_RECIPES_LEADERBOARD_SIZE = 100
+POPULAR_RECIPES_MAX_STALENESS = 30
+TRENDING_HALF_LIFE_DAYS = 7
+
+# The snapshot generations, the response cache and the JWT user cache only need
+# get/set/add/incr, but they only stay coherent between processes sharing the backend.
+# Local memory is per process, which suits the single-process development server. The
+# production profile runs several workers, so it shares Redis when MEAL_PLAN_REDIS_URL is
+# set, and otherwise a table in the database (create it with `manage.py createcachetable`).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'meal-planner',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+if DATABASE_PROFILE == 'production':
+    if os.environ.get('MEAL_PLAN_REDIS_URL'):
+        CACHES['default'] = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['MEAL_PLAN_REDIS_URL'],
+        }
+    else:
+        CACHES['default'] = {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'meal_planner_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+
+# Seconds a cached read-only API payload may be served; writes invalidate it sooner through signals.
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Seconds the nutrition-target planner may spend improving a plan after its greedy pass.
+MEAL_PLAN_OPTIMIZER_TIME_BUDGET = 0.5
+
+# Seconds an authenticated user row may be reused; saving or deleting the user drops it sooner.
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Threads the batch endpoint runs consecutive GET sub-requests on; 1 runs them one after another.
+BATCH_MAX_WORKERS = 4
@@ -0,0 +1,76 @@
+"""JWT authentication that resolves users from a short-lived cache instead of a query per request."""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import response_cache
+
+
+def token_user_id(validated_token):
+    try:
+        return validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+
+
+def user_cache_key(user_id):
+    """Key of the cached user, under the version of the user's scope that saves and deletes bump."""
+    return response_cache.versioned_key("jwt-user", [response_cache.user_scope(user_id)], user_id)
+
+
+def cached_fields(user):
+    """
+    What the cache keeps of ``user``: its id and the flags permissions read, never the password hash.
+
+    The revocation check needs only the digest of the hash, which every token issued to
+    the user already carries.
+    """
+    fields = {
+        api_settings.USER_ID_FIELD: getattr(user, api_settings.USER_ID_FIELD),
+        "is_active": user.is_active,
+        "is_staff": user.is_staff,
+    }
+    if api_settings.CHECK_REVOKE_TOKEN:
+        fields["password_digest"] = get_md5_hash_password(user.password)
+    return fields
+
+
+def check_user(fields, validated_token):
+    """The checks ``JWTAuthentication.get_user`` makes on a loaded user, repeated on every cached one."""
+    if api_settings.CHECK_USER_IS_ACTIVE and not fields["is_active"]:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    if api_settings.CHECK_REVOKE_TOKEN and (
+        validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != fields["password_digest"]
+    ):
+        raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` with the user's id and flags cached for ``AUTH_USER_CACHE_TIMEOUT`` seconds.
+
+    Tokens are still decoded and verified on every request; only the lookup of the user
+    they name is cached. Cached users are rebuilt as instances with every other field
+    deferred, so code that reads one loads the row on demand. Saving or deleting a user
+    bumps its cache version, so deactivations and password changes apply on the next
+    request, and the active and password checks run against the cached fields each
+    time. Refresh-token rotation and blacklisting happen at the refresh endpoint and are
+    unaffected.
+    """
+
+    def get_user(self, validated_token):
+        # The key is taken before the row is read, so a save that lands in between bumps
+        # the version past it instead of leaving the older row cached under the new one.
+        key = user_cache_key(token_user_id(validated_token))
+        fields = cache.get(key)
+        if fields is not None:
+            check_user(fields, validated_token)
+            names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in fields]
+            return self.user_model.from_db(None, names, [fields[name] for name in names])
+        user = super().get_user(validated_token)
+        cache.set(key, cached_fields(user), getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 60))
+        return user
@@ -0,0 +1,149 @@
+"""Several API calls answered by one request, dispatched in-process through the URL resolver."""
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+# Sub-requests one batch may carry.
+MAX_BATCH_REQUESTS = 20
+# Only API routes can be batched.
+PATH_PREFIX = "/api/"
+READ_METHODS = ("GET", "HEAD")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "BATCH_MAX_WORKERS", 4), thread_name_prefix="batch"
+        )
+    return _executor
+
+
+def parse(items):
+    """
+    Validates the ``requests`` list of a batch, raising ``ValueError`` with a readable message.
+
+    Each item is ``{"method", "path", "body"}``; the method defaults to GET and the body,
+    sent as JSON, is only allowed on writes. Returns ``[(method, path, body)]``.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("requests must be a non-empty list.")
+    if len(items) > MAX_BATCH_REQUESTS:
+        raise ValueError(f"A batch may carry at most {MAX_BATCH_REQUESTS} requests.")
+    parsed = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            raise ValueError(f"Request {position} must be an object with a path.")
+        method = str(item.get("method", "GET")).upper()
+        if method not in READ_METHODS + WRITE_METHODS:
+            raise ValueError(f"Request {position} has an unsupported method: {method}.")
+        body = item.get("body")
+        if body is not None and method in READ_METHODS:
+            raise ValueError(f"Request {position} is a {method} and cannot carry a body.")
+        parsed.append((method, item["path"], body))
+    return parsed
+
+
+def _sub_request(parent, method, path, body):
+    """Builds a request for one item, carrying the batch's headers and already authenticated user."""
+    url = urlsplit(path)
+    request = HttpRequest()
+    request.method = method
+    request.path = request.path_info = url.path
+    request.META = {
+        **parent.META,
+        "REQUEST_METHOD": method,
+        "PATH_INFO": url.path,
+        "QUERY_STRING": url.query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": "0",
+    }
+    request.GET = QueryDict(url.query)
+    if body is not None:
+        data = json.dumps(body).encode()
+        request.META["CONTENT_LENGTH"] = str(len(data))
+        request._stream = io.BytesIO(data)
+    request.COOKIES = parent.COOKIES
+    # DRF's ``Request`` takes a forced user as is, so the sub-request skips token checks
+    # and the user lookup.
+    request.user = request._force_auth_user = parent.user
+    return request
+
+
+def _dispatch(parent, method, path, body):
+    """Runs one item through its view and returns ``{"method", "path", "status", "body"}``."""
+    result = {"method": method, "path": path}
+    route = urlsplit(path).path
+    try:
+        if not route.startswith(PATH_PREFIX):
+            raise Resolver404
+        match = resolve(route)
+    except Resolver404:
+        return {**result, "status": 404, "body": {"detail": "Not found."}}
+    if match.url_name == "batch":
+        return {**result, "status": 400, "body": {"detail": "Batches cannot be nested."}}
+
+    try:
+        response = match.func(_sub_request(parent, method, path, body), *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batched request %s %s failed", method, path)
+        return {**result, "status": 500, "body": {"detail": "Internal server error."}}
+    if response.streaming:
+        return {**result, "status": 400, "body": {"detail": "Streaming endpoints cannot be batched."}}
+    if hasattr(response, "data"):
+        # DRF responses keep their data, which the batch response serializes once.
+        payload = response.data
+    elif response.content and response.get("Content-Type", "").startswith("application/json"):
+        payload = json.loads(response.content)
+    else:
+        payload = None
+    return {**result, "status": response.status_code, "body": payload}
+
+
+def _dispatch_in_worker(parent, method, path, body):
+    # Worker threads hold their own connections, closed like a request's once they expire.
+    close_old_connections()
+    try:
+        return _dispatch(parent, method, path, body)
+    finally:
+        close_old_connections()
+
+
+def run(parent, items):
+    """
+    Dispatches the parsed ``items`` in order and returns their results in the same order.
+
+    Consecutive reads run concurrently on a small thread pool; a write waits for the
+    reads before it and runs on the request's own thread and connection, so a read
+    listed after a write sees its effect.
+    """
+    results = []
+    reads = []
+
+    def flush():
+        if len(reads) > 1 and getattr(settings, "BATCH_MAX_WORKERS", 4) > 1:
+            results.extend(_pool().map(lambda item: _dispatch_in_worker(parent, *item), reads))
+        else:
+            results.extend(_dispatch(parent, *item) for item in reads)
+        reads.clear()
+
+    for item in items:
+        if item[0] in READ_METHODS:
+            reads.append(item)
+        else:
+            flush()
+            results.append(_dispatch(parent, *item))
+    flush()
+    return results
@@ -0,0 +1,84 @@
+"""
+ETag / Last-Modified validators for frequently polled endpoints.
+
+A full response computes its validators from the objects it already loaded, at no extra
+cost. Only a request carrying If-None-Match or If-Modified-Since pays for a version
+lookup: one indexed query over timestamps that decides on a 304 before anything is
+fetched in full or serialized.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .models import Recipe
+
+
+def _stamp(value):
+    return f"{value.timestamp():.6f}" if value else ""
+
+
+def has_validators(request):
+    return "HTTP_IF_NONE_MATCH" in request.META or "HTTP_IF_MODIFIED_SINCE" in request.META
+
+
+def not_modified(request, version):
+    """Returns a 304 response if ``version``, an ``(etag, last_modified)`` pair, matches the request."""
+    if version is None:
+        return None
+    etag, last_modified = version
+    return get_conditional_response(request, etag=quote_etag(etag), last_modified=int(last_modified.timestamp()))
+
+
+def set_validators(response, version):
+    if version is not None and response.status_code == 200:
+        etag, last_modified = version
+        response["ETag"] = quote_etag(etag)
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def recipe_version(recipe):
+    return f"recipe-{recipe.pk}-{_stamp(recipe.updated_at)}", recipe.updated_at
+
+
+def stored_recipe_version(pk):
+    updated_at = Recipe.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+    return (f"recipe-{pk}-{_stamp(updated_at)}", updated_at) if updated_at else None
+
+
+def _meal_plan_rows_version(scope, rows):
+    """
+    Versions a list of ``(plan_id, plan_updated, recipe_count, recipes_updated)`` rows.
+
+    Recipe counts catch recipes removed by a cascade, which leaves no newer timestamp behind.
+    """
+    if not rows:
+        return None
+    last_modified = max(timestamp for row in rows for timestamp in (row[1], row[3]) if timestamp)
+    key = repr([(plan_id, _stamp(plan_updated), count, _stamp(recipes_updated))
+                for plan_id, plan_updated, count, recipes_updated in sorted(rows)])
+    return f"{scope}-{hashlib.sha1(key.encode()).hexdigest()[:24]}", last_modified
+
+
+def meal_plan_version(scope, meal_plans):
+    """Versions meal plans loaded with ``MealPlanQuerySet.with_recipes()``."""
+    rows = []
+    for meal_plan in meal_plans:
+        recipes = meal_plan.recipes.all()
+        rows.append((
+            meal_plan.pk,
+            meal_plan.updated_at,
+            len(recipes),
+            max((recipe.updated_at for recipe in recipes), default=None),
+        ))
+    return _meal_plan_rows_version(scope, rows)
+
+
+def stored_meal_plan_version(scope, meal_plans, limit=None):
+    """The same version as ``meal_plan_version``, from one aggregate query over the ``meal_plans`` queryset."""
+    rows = meal_plans.annotate(
+        recipe_count=Count("recipes"), recipes_updated=Max("recipes__updated_at")
+    ).order_by("id").values_list("id", "updated_at", "recipe_count", "recipes_updated")
+    return _meal_plan_rows_version(scope, list(rows[:limit] if limit else rows))
@@ -0,0 +1,65 @@
+"""Maintenance of ``Recipe.dietary_filters``, the indexed link table mirroring ``Recipe.dietary_tags``."""
+from django.db import transaction
+
+from . import response_cache
+from .indexing import QUERY_BATCH_SIZE, _batches
+from .models import DietaryFilter, Recipe, tag_names
+
+# Values of the ``match`` query parameter and the queryset methods they select.
+TAG_MATCHES = {"all": "with_all_tags", "any": "with_any_tags"}
+
+
+def filter_ids(names):
+    """Returns ``{name: id}`` for ``names``, creating the missing ``DietaryFilter`` rows."""
+    names = set(names)
+    ids = {}
+    for batch in _batches(names):
+        ids.update(DietaryFilter.objects.filter(name__in=batch).values_list("name", "id"))
+    missing = names - set(ids)
+    if missing:
+        # bulk_create sends no signals, so the cached filter list is dropped here.
+        DietaryFilter.objects.bulk_create([DietaryFilter(name=name) for name in missing], ignore_conflicts=True)
+        response_cache.invalidate(response_cache.DIETARY_FILTERS)
+        for batch in _batches(missing):
+            ids.update(DietaryFilter.objects.filter(name__in=batch).values_list("name", "id"))
+    return ids
+
+
+def sync_dietary_filters(recipes):
+    """
+    Points the ``dietary_filters`` of every recipe in ``recipes`` at its normalized ``dietary_tags``.
+
+    Stored links are read first and only the recipes whose tags changed are rewritten,
+    so saving a recipe with unchanged tags costs one query.
+    """
+    recipes = [recipe for recipe in recipes if recipe.pk is not None]
+    through = Recipe.dietary_filters.through
+    stored = {}
+    for batch in _batches([recipe.pk for recipe in recipes]):
+        for recipe_id, name in through.objects.filter(recipe_id__in=batch).values_list("recipe_id", "dietaryfilter__name"):
+            stored.setdefault(recipe_id, set()).add(name)
+    expected = {recipe.pk: set(tag_names(recipe.dietary_tags)) for recipe in recipes}
+    changed = [recipe_id for recipe_id, names in expected.items() if names != stored.get(recipe_id, set())]
+    if not changed:
+        return
+    with transaction.atomic():
+        for batch in _batches(changed):
+            through.objects.filter(recipe_id__in=batch).delete()
+        ids = filter_ids(name for recipe_id in changed for name in expected[recipe_id])
+        through.objects.bulk_create(
+            [through(recipe_id=recipe_id, dietaryfilter_id=ids[name]) for recipe_id in changed for name in expected[recipe_id]],
+            batch_size=QUERY_BATCH_SIZE,
+        )
+
+
+def filter_by_tags(queryset, params):
+    """
+    Applies the ``tags`` (comma-separated) and ``match`` ("all" by default, or "any") query parameters.
+
+    Raises ``ValueError`` for an unknown ``match``.
+    """
+    tags = [tag for tag in params.get("tags", "").split(",") if tag.strip()]
+    match = params.get("match", "all").lower()
+    if match not in TAG_MATCHES:
+        raise ValueError(f"match must be one of: {', '.join(TAG_MATCHES)}.")
+    return getattr(queryset, TAG_MATCHES[match])(tags) if tags else queryset
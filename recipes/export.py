@@ -0,0 +1,36 @@
+"""Streaming NDJSON export of the recipe catalog."""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Recipe
+
+EXPORT_FIELDS = (
+    "id", "title", "ingredients", "instructions", "nutrition", "rating", "rating_count", "rating_score", "dietary_tags",
+    "calories", "protein", "carbs", "fat", "fiber", "updated_at", "favorites",
+)
+CHUNK_SIZE = 2000
+
+
+def export_queryset(fields, updated_since=None):
+    """Returns the recipe queryset for an export of ``fields``, in primary key order."""
+    columns = [field for field in fields if field != "favorites"]
+    queryset = Recipe.objects.order_by("id").only(*columns)
+    if "favorites" in fields:
+        queryset = queryset.with_favorites()
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return queryset
+
+
+def iter_ndjson(queryset, fields):
+    """Yields one JSON line per recipe, reading the queryset ``CHUNK_SIZE`` rows at a time."""
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for recipe in queryset.iterator(chunk_size=CHUNK_SIZE):
+        row = {}
+        for field in fields:
+            if field == "favorites":
+                row[field] = [user.pk for user in recipe.favorites.all()]
+            else:
+                row[field] = getattr(recipe, field)
+        yield encoder.encode(row) + "\n"
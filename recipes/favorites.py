@@ -0,0 +1,67 @@
+"""Idempotent favorite and unfavorite writes, one statement on the favorites table each."""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .leaderboard import add_favorites, remove_favorites
+from .models import Recipe, RecipeFavorite
+
+# Largest list of recipe ids one batch request may carry.
+MAX_BATCH_SIZE = 500
+
+
+def _created_at_converter():
+    """Returns a function turning ``created_at`` values read back by raw SQL into aware datetimes."""
+    column = RecipeFavorite._meta.get_field("created_at").get_col(RecipeFavorite._meta.db_table)
+    converters = connection.ops.get_db_converters(column) + column.get_db_converters(connection)
+
+    def convert(value):
+        for converter in converters:
+            value = converter(value, column, connection)
+        return value
+
+    return convert
+
+
+def favorite(user, recipe_ids):
+    """
+    Favorites every existing recipe in ``recipe_ids`` for ``user``; returns the ids newly favorited.
+
+    A single ``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` both skips unknown recipes and
+    links that already exist, so repeating a request is harmless and there is no window
+    between checking and inserting. Its ``RETURNING`` rows drive the counter updates.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return []
+    qn = connection.ops.quote_name
+    now = timezone.now()
+    sql = (
+        f"INSERT INTO {qn(RecipeFavorite._meta.db_table)} ({qn('recipe_id')}, {qn('user_id')}, {qn('created_at')}) "
+        f"SELECT {qn('id')}, %s, %s FROM {qn(Recipe._meta.db_table)} "
+        f"WHERE {qn('id')} IN ({', '.join(['%s'] * len(recipe_ids))}) "
+        f"ON CONFLICT ({qn('recipe_id')}, {qn('user_id')}) DO NOTHING RETURNING {qn('recipe_id')}"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, connection.ops.adapt_datetimefield_value(now), *recipe_ids])
+        added = sorted(row[0] for row in cursor.fetchall())
+        add_favorites((recipe_id, now) for recipe_id in added)
+    return added
+
+
+def unfavorite(user, recipe_ids):
+    """Removes ``user``'s favorites of ``recipe_ids`` in one ``DELETE``; returns the ids that were favorited."""
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return []
+    qn = connection.ops.quote_name
+    sql = (
+        f"DELETE FROM {qn(RecipeFavorite._meta.db_table)} "
+        f"WHERE {qn('user_id')} = %s AND {qn('recipe_id')} IN ({', '.join(['%s'] * len(recipe_ids))}) "
+        f"RETURNING {qn('recipe_id')}, {qn('created_at')}"
+    )
+    convert = _created_at_converter()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, *recipe_ids])
+        removed = [(recipe_id, convert(created_at)) for recipe_id, created_at in cursor.fetchall()]
+        remove_favorites(removed)
+    return sorted(recipe_id for recipe_id, _ in removed)
@@ -0,0 +1,126 @@
+"""Maintenance and lookup for the per-recipe ingredient index tables."""
+from django.db import transaction
+from django.db.models import Count
+
+from .ingredients import parse_ingredients, tokenize
+from .models import Ingredient, RecipeIngredient, RecipeIngredientToken
+
+# Keeps ``recipe_id IN (...)`` lists well under SQLite's bound-parameter limit.
+QUERY_BATCH_SIZE = 900
+
+
+def _batches(items, size=QUERY_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def expected_tokens(recipe):
+    """Returns the token set the index should hold for ``recipe``."""
+    return tokenize(recipe.ingredients or "")
+
+
+def expected_lines(recipe):
+    """Returns the ``(quantity, unit, name)`` rows ``RecipeIngredient`` should hold for ``recipe``."""
+    return [(quantity, unit, name[:255]) for quantity, unit, name in parse_ingredients(recipe.ingredients or "")]
+
+
+def ingredient_ids(names):
+    """Returns ``{name: id}`` for ``names``, creating the missing ``Ingredient`` rows."""
+    names = set(names)
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+    ids = {}
+    for batch in _batches(names):
+        ids.update(Ingredient.objects.filter(name__in=batch).values_list("name", "id"))
+    return ids
+
+
+def index_recipes(recipes):
+    """
+    Replaces the index rows of every recipe in ``recipes`` in a single transaction.
+
+    Returns ``{recipe_id: {ingredient_id: name}}`` for the rows that were written.
+    """
+    recipes = [recipe for recipe in recipes if recipe.pk is not None]
+    if not recipes:
+        return {}
+    lines = {recipe.pk: expected_lines(recipe) for recipe in recipes}
+    with transaction.atomic():
+        for batch in _batches([recipe.pk for recipe in recipes]):
+            RecipeIngredientToken.objects.filter(recipe_id__in=batch).delete()
+            RecipeIngredient.objects.filter(recipe_id__in=batch).delete()
+        RecipeIngredientToken.objects.bulk_create(
+            [
+                RecipeIngredientToken(token=token, recipe_id=recipe.pk)
+                for recipe in recipes
+                for token in expected_tokens(recipe)
+            ],
+            batch_size=QUERY_BATCH_SIZE,
+        )
+        ids = ingredient_ids(name for rows in lines.values() for _, _, name in rows)
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ids[name],
+                    quantity=quantity,
+                    unit=unit,
+                    position=position,
+                )
+                for recipe_id, rows in lines.items()
+                for position, (quantity, unit, name) in enumerate(rows)
+            ],
+            batch_size=QUERY_BATCH_SIZE,
+        )
+    return {
+        recipe_id: {ids[name]: name for _, _, name in rows}
+        for recipe_id, rows in lines.items()
+    }
+
+
+def search_recipe_ids(ingredients):
+    """
+    Returns the ids of recipes containing every ingredient in ``ingredients``.
+
+    Each ingredient is tokenized the same way recipes are indexed. The postings of all
+    tokens are read in one query, grouped by recipe and kept where every token matched;
+    the ``(token, recipe)`` unique index covers both the lookup and the grouping.
+    """
+    tokens = set()
+    for ingredient in ingredients:
+        tokens |= tokenize(ingredient)
+    if not tokens:
+        return []
+    return list(
+        RecipeIngredientToken.objects.filter(token__in=tokens)
+        .values("recipe_id")
+        .annotate(matched=Count("token", distinct=True))
+        .filter(matched=len(tokens))
+        .order_by("recipe_id")
+        .values_list("recipe_id", flat=True)
+    )
+
+
+def find_inconsistencies(recipes):
+    """Yields ``(recipe_id, problem)`` for every recipe whose index rows drifted from its text."""
+    recipes = list(recipes)
+    stored_tokens = {}
+    stored_lines = {}
+    for batch in _batches([recipe.pk for recipe in recipes]):
+        for recipe_id, token in RecipeIngredientToken.objects.filter(recipe_id__in=batch).values_list(
+            "recipe_id", "token"
+        ):
+            stored_tokens.setdefault(recipe_id, set()).add(token)
+        for recipe_id, quantity, unit, name in (
+            RecipeIngredient.objects.filter(recipe_id__in=batch)
+            .order_by("recipe_id", "position")
+            .values_list("recipe_id", "quantity", "unit", "ingredient__name")
+        ):
+            stored_lines.setdefault(recipe_id, []).append((quantity, unit, name))
+    for recipe in recipes:
+        expected = expected_tokens(recipe)
+        actual = stored_tokens.get(recipe.pk, set())
+        if expected != actual:
+            yield recipe.pk, f"tokens missing {sorted(expected - actual)}, stale {sorted(actual - expected)}"
+        if expected_lines(recipe) != stored_lines.get(recipe.pk, []):
+            yield recipe.pk, "ingredient rows do not match the ingredients text"
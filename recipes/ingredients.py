@@ -0,0 +1,127 @@
+"""Helpers for splitting and normalizing the free-text ``Recipe.ingredients`` field."""
+import re
+
+_WORD_RE = re.compile(r"[a-z]+")
+_QUANTITY_RE = re.compile(r"^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)\s*([a-zA-Z]+\.?)?\s*(.*)$")
+MAX_TOKEN_LENGTH = 64
+
+# Words that never identify an ingredient on their own: units, sizes and
+# preparation notes. They are dropped before a line is turned into tokens.
+STOPWORDS = {
+    "a", "an", "and", "or", "of", "to", "the", "for", "with", "into", "taste",
+    "cup", "cups", "tbsp", "tablespoon", "tablespoons", "tsp", "teaspoon", "teaspoons",
+    "g", "gram", "grams", "kg", "mg", "ml", "l", "oz", "ounce", "ounces", "lb", "lbs",
+    "pound", "pounds", "pinch", "dash", "clove", "cloves", "slice", "slices", "piece",
+    "pieces", "can", "cans", "handful", "large", "medium", "small", "fresh", "chopped",
+    "diced", "minced", "sliced", "grated", "optional",
+}
+
+# Maps the unit spellings found in recipe text onto one short canonical name.
+UNIT_ALIASES = {
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "g": "g", "gram": "g", "grams": "g",
+    "kg": "kg", "mg": "mg",
+    "ml": "ml", "l": "l",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "pinch": "pinch", "dash": "dash",
+    "clove": "clove", "cloves": "clove",
+    "slice": "slice", "slices": "slice",
+    "piece": "piece", "pieces": "piece",
+    "can": "can", "cans": "can",
+    "handful": "handful",
+}
+
+# Factors converting each canonical unit of volume or mass onto one base unit (US
+# customary measures); units missing here, such as "clove" or "pinch", are kept as is.
+UNIT_CONVERSIONS = {
+    "ml": ("ml", 1.0), "l": ("ml", 1000.0),
+    "cup": ("ml", 236.588), "tbsp": ("ml", 14.787), "tsp": ("ml", 4.929),
+    "g": ("g", 1.0), "kg": ("g", 1000.0), "mg": ("g", 0.001),
+    "oz": ("g", 28.3495), "lb": ("g", 453.592),
+}
+
+
+def split_ingredients(text):
+    """Splits the comma-separated ingredients field into trimmed, non-empty lines."""
+    if not text:
+        return []
+    return [part.strip() for part in text.split(',') if part.strip()]
+
+
+def normalize_token(word):
+    """Lowercases a word and folds the common English plural forms onto the singular."""
+    word = word.lower()
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Returns the set of normalized ingredient tokens found in ``text``."""
+    return {
+        normalize_token(word)[:MAX_TOKEN_LENGTH]
+        for word in _WORD_RE.findall(text.lower())
+        if word not in STOPWORDS
+    }
+
+
+def normalize_name(text):
+    """Reduces an ingredient description to its normalized name, e.g. "Chopped Onions" -> "onion"."""
+    words = [
+        normalize_token(word)[:MAX_TOKEN_LENGTH]
+        for word in _WORD_RE.findall(text.lower())
+        if word not in STOPWORDS
+    ]
+    return " ".join(words) or text.strip().lower()
+
+
+def _parse_quantity(text):
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            if float(denominator) == 0:
+                return None
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def parse_ingredient_line(line):
+    """
+    Splits one ingredient line into ``(quantity, unit, name)``.
+
+    "1 1/2 cups whole milk" gives ``(1.5, "cup", "whole milk")``; lines without a
+    leading amount such as "salt" give ``(None, "", "salt")``.
+    """
+    match = _QUANTITY_RE.match(line)
+    if not match:
+        return None, "", normalize_name(line)
+    amount, unit, rest = match.groups()
+    quantity = _parse_quantity(amount)
+    unit = (unit or "").rstrip(".").lower()
+    if unit in UNIT_ALIASES:
+        unit = UNIT_ALIASES[unit]
+    elif unit:
+        rest = f"{unit} {rest}"
+        unit = ""
+    return quantity, unit, normalize_name(rest or line)
+
+
+def parse_ingredients(text):
+    """Parses the whole ingredients field into a list of ``(quantity, unit, name)`` tuples."""
+    return [parse_ingredient_line(line) for line in split_ingredients(text)]
+
+
+def to_base_unit(quantity, unit):
+    """Converts ``quantity`` of a canonical ``unit`` onto its base unit, e.g. ``(2, "cup")`` -> ``(473.176, "ml")``."""
+    base, factor = UNIT_CONVERSIONS.get(unit, (unit, 1.0))
+    return quantity * factor, base
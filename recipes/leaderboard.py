@@ -0,0 +1,149 @@
+"""Denormalized favorite counters and the materialized popular-recipe leaderboards built on them."""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from . import response_cache
+from .models import Recipe
+from .snapshots import Snapshot
+
+# Trending weights are measured from this instant and double every half-life after it.
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+# Floor of 1 − S/T when taking back favorites, where rounding can leave nothing of S.
+_SMALLEST_SHARE = 1e-300
+# The column each leaderboard ranks by, highest first with newer recipes winning ties.
+BOARDS = {"all-time": "favorites_count", "trending": "trending_score"}
+
+
+def favorite_log_weight(created_at):
+    """
+    Returns the natural log of what one favorite added at ``created_at`` weighs.
+
+    Rather than decaying old favorites, each new one weighs exp(λ·(t − epoch)). Every
+    recipe's sum then shrinks by the same factor as time passes, so the stored scores
+    never need rewriting. The weight itself outgrows a float after about a thousand
+    half-lives, so only its log, λ·(t − epoch), is ever computed.
+    """
+    half_life = getattr(settings, "TRENDING_HALF_LIFE_DAYS", 7) * 86400
+    return math.log(2) * (created_at - TRENDING_EPOCH).total_seconds() / half_life
+
+
+def log_sum_exp(values):
+    """ln(Σ exp(v)) of ``values``, computed without leaving the range of a float."""
+    peak = max(values)
+    return peak + math.log(sum(math.exp(value - peak) for value in values))
+
+
+class Leaderboard:
+    """The top recipes of each board as ``(score, recipe_id)`` lists, best first."""
+
+    def __init__(self, size):
+        self.size = size
+        self.boards = {}
+
+    @classmethod
+    def build(cls):
+        leaderboard = cls(getattr(settings, "POPULAR_RECIPES_LEADERBOARD_SIZE", 100))
+        for board, field in BOARDS.items():
+            rows = Recipe.objects.order_by(f"-{field}", "-id").values_list(field, "id")[:leaderboard.size]
+            leaderboard.boards[board] = list(rows)
+        return leaderboard
+
+    def raise_scores(self, recipe_id, scores):
+        """
+        Moves ``recipe_id`` up to its new ``{board: score}`` where that places it in the top.
+
+        Only increases can be applied in place; after a decrease some recipe outside the
+        list may belong in it, so callers invalidate the snapshot instead.
+        """
+        for board, score in scores.items():
+            entries = self.boards[board]
+            kept = [entry for entry in entries if entry[1] != recipe_id]
+            if len(kept) < len(entries) or len(entries) < self.size or (score, recipe_id) > entries[-1]:
+                kept.append((score, recipe_id))
+                kept.sort(reverse=True)
+                del kept[self.size:]
+                self.boards[board] = kept
+
+    def top(self, board, limit):
+        return [recipe_id for _, recipe_id in self.boards[board][:limit]]
+
+
+leaderboard = Snapshot(
+    "leaderboard",
+    Leaderboard.build,
+    max_age=getattr(settings, "POPULAR_RECIPES_MAX_STALENESS", 30),
+)
+
+
+def _apply(links, sign):
+    """
+    Adds (``sign=1``) or takes back (``sign=-1``) the ``(recipe_id, created_at)`` favorite links.
+
+    ``trending_score`` holds ln(1 + Σ w), so a recipe without favorites scores 0 and
+    ordering by it is ordering by the decayed favorite count. With T = exp(trending_score)
+    and S the summed weight of the links, the new score is ln(T + S) or ln(T − S), both
+    evaluated in the database in log space.
+    """
+    changes = defaultdict(list)
+    for recipe_id, created_at in links:
+        changes[recipe_id].append(favorite_log_weight(created_at))
+    # Recipes receiving the same increments share one UPDATE, as a batch of favorites by one user does.
+    by_delta = defaultdict(list)
+    for recipe_id, log_weights in changes.items():
+        by_delta[len(log_weights), log_sum_exp(log_weights)].append(recipe_id)
+    now = timezone.now()
+    score = F("trending_score")
+    for (count, log_weight), recipe_ids in by_delta.items():
+        log_weight = Value(log_weight, output_field=FloatField())
+        if sign > 0:
+            # ln(T + S) = max + ln(1 + exp(−|ln T − ln S|))
+            trending = Greatest(score, log_weight) + Ln(1 + Exp(-Abs(score - log_weight)))
+        else:
+            # ln(T − S) = ln T + ln(1 − S/T), never below the score of no favorites.
+            trending = Case(
+                When(favorites_count__lte=count, then=Value(0.0)),
+                default=Greatest(score + Ln(Greatest(1 - Exp(log_weight - score), Value(_SMALLEST_SHARE))), Value(0.0)),
+                output_field=FloatField(),
+            )
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            favorites_count=F("favorites_count") + Value(sign * count),
+            trending_score=trending,
+            updated_at=now,
+        )
+    response_cache.invalidate_recipes(changes)
+    return list(changes)
+
+
+def add_favorites(links):
+    recipe_ids = _apply(links, 1)
+    if not recipe_ids:
+        return
+    scores = {
+        recipe_id: dict(zip(BOARDS, values))
+        for recipe_id, *values in Recipe.objects.filter(pk__in=recipe_ids).values_list("id", *BOARDS.values())
+    }
+
+    def publish(board):
+        for recipe_id, recipe_scores in scores.items():
+            board.raise_scores(recipe_id, recipe_scores)
+
+    transaction.on_commit(lambda: leaderboard.update(publish))
+
+
+def remove_favorites(links):
+    if _apply(links, -1):
+        transaction.on_commit(leaderboard.invalidate)
+
+
+def popular_recipes(board, limit=10):
+    """Returns the top ``limit`` recipes of ``board`` from the in-memory leaderboard."""
+    recipe_ids = leaderboard.get().top(board, limit)
+    recipes = Recipe.objects.with_favorites().in_bulk(recipe_ids)
+    return [recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes]
@@ -0,0 +1,233 @@
+"""Ranks recipes by how much of their ingredient list a set of leftovers already covers."""
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .ingredients import normalize_name, tokenize
+from .models import Ingredient, RecipeIngredient
+from .snapshots import Snapshot
+
+# Posting lists merged between two checks of the latency budget.
+_MERGE_GROUP_SIZE = 8
+# Rows allocated up front; arrays double when full.
+_MIN_CAPACITY = 1024
+# Retired rows are dropped once there are at least this many and they make up half the rows.
+_MIN_RETIRED_TO_COMPACT = 1024
+
+
+def _appended(array, count, value):
+    """Writes ``value`` at ``array[count]``, doubling the array into a new one when it is full."""
+    if count == len(array):
+        grown = np.zeros(max(2 * len(array), 8), dtype=array.dtype)
+        grown[:count] = array
+        array = grown
+    array[count] = value
+    return array
+
+
+class _Rows:
+    """
+    The row arrays as one reader sees them: rows ``0..size-1`` of ``recipe_ids``,
+    ``totals`` and ``ingredients``, and ``postings`` mapping an ingredient id to
+    ``(rows, count)``.
+
+    Writers only fill slots past what a published ``_Rows`` covers and then publish a
+    new one, while growth and compaction allocate fresh arrays. A reader that takes
+    ``index.rows`` once therefore never sees an array change shape under it.
+    """
+    __slots__ = ("recipe_ids", "totals", "ingredients", "postings", "size")
+
+    def __init__(self, recipe_ids, totals, ingredients, postings, size):
+        self.recipe_ids = recipe_ids
+        self.totals = totals
+        self.ingredients = ingredients
+        self.postings = postings
+        self.size = size
+
+
+class LeftoverIndex:
+    """
+    In-memory ingredient postings over dense recipe rows.
+
+    Every recipe gets a row; ``postings`` maps an ingredient id to the rows that use it
+    and ``totals`` holds each row's distinct ingredient count. Scoring a query is then
+    a ``bincount`` over the posting arrays of the leftovers, independent of how the
+    recipes are stored in the database.
+
+    Edits append a new row and retire the old one in amortized constant time; once
+    retired rows make up half the index it is compacted. Lookup tables are replaced
+    rather than mutated, so readers need no lock.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.by_name = {}
+        self.by_token = {}
+        self.row_of = {}
+        self.retired = 0
+        self._load([], [])
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for ingredient_id, name in Ingredient.objects.values_list("id", "name").iterator(chunk_size=10000):
+            index.add_ingredient(ingredient_id, name)
+        by_recipe = defaultdict(set)
+        rows = RecipeIngredient.objects.order_by().values_list("recipe_id", "ingredient_id")
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            by_recipe[recipe_id].add(ingredient_id)
+        index._load(list(by_recipe), [frozenset(ids) for ids in by_recipe.values()])
+        return index
+
+    def _load(self, recipe_ids, ingredients):
+        """Publishes fresh arrays holding exactly ``recipe_ids`` with their ingredient sets."""
+        capacity = max(len(recipe_ids) * 5 // 4, _MIN_CAPACITY)
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:len(recipe_ids)] = recipe_ids
+        totals = np.zeros(capacity, dtype=np.int32)
+        totals[:len(recipe_ids)] = [len(ingredient_ids) for ingredient_ids in ingredients]
+        postings = defaultdict(list)
+        for row, ingredient_ids in enumerate(ingredients):
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].append(row)
+        self.row_of = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        self.retired = 0
+        self.rows = _Rows(
+            ids, totals, list(ingredients),
+            {ingredient_id: (np.array(rows, dtype=np.int32), len(rows)) for ingredient_id, rows in postings.items()},
+            len(recipe_ids),
+        )
+
+    @property
+    def size(self):
+        return self.rows.size
+
+    def add_ingredient(self, ingredient_id, name):
+        if ingredient_id in self.names:
+            return
+        self.names[ingredient_id] = name
+        self.by_name[name] = ingredient_id
+        for token in tokenize(name):
+            self.by_token[token] = self.by_token.get(token, frozenset()) | {ingredient_id}
+
+    def put(self, recipe_id, ingredients):
+        """Replaces the ingredients of one recipe; ``ingredients`` maps ingredient id to name."""
+        self.remove(recipe_id)
+        if not ingredients:
+            return
+        rows = self.rows
+        row = rows.size
+        recipe_ids = _appended(rows.recipe_ids, row, recipe_id)
+        totals = _appended(rows.totals, row, len(ingredients))
+        rows.ingredients.append(frozenset(ingredients))
+        postings = rows.postings
+        for ingredient_id, name in ingredients.items():
+            self.add_ingredient(ingredient_id, name)
+            posting, count = postings.get(ingredient_id, (np.zeros(0, dtype=np.int32), 0))
+            postings[ingredient_id] = (_appended(posting, count, row), count + 1)
+        self.row_of[recipe_id] = row
+        self.rows = _Rows(recipe_ids, totals, rows.ingredients, postings, row + 1)
+
+    def remove(self, recipe_id):
+        """Retires the recipe's row; its stale postings are ignored because its total drops to zero."""
+        row = self.row_of.pop(recipe_id, None)
+        if row is None:
+            return
+        self.rows.totals[row] = 0
+        self.rows.ingredients[row] = frozenset()
+        self.retired += 1
+        if self.retired >= _MIN_RETIRED_TO_COMPACT and 2 * self.retired >= self.rows.size:
+            self.compact()
+
+    def compact(self):
+        """Drops the retired rows by republishing the live ones."""
+        rows = self.rows
+        live = sorted(self.row_of.items(), key=lambda item: item[1])
+        self._load([recipe_id for recipe_id, _ in live], [rows.ingredients[row] for _, row in live])
+
+    def resolve(self, leftover):
+        """
+        Returns the ingredient ids a leftover stands for.
+
+        Every ingredient whose name contains all of the leftover's tokens counts, so
+        "chicken" covers both "chicken" and "chicken breast".
+        """
+        matches = set()
+        name = normalize_name(leftover)
+        if name in self.by_name:
+            matches.add(self.by_name[name])
+        tokens = sorted(tokenize(leftover), key=lambda token: len(self.by_token.get(token, ())))
+        if tokens:
+            candidates = set(self.by_token.get(tokens[0], ()))
+            for token in tokens[1:]:
+                candidates &= self.by_token.get(token, set())
+            matches |= candidates
+        return matches
+
+    def rank(self, leftovers, limit, min_coverage=0.0, budget_ms=None):
+        """
+        Returns ``(matches, truncated)`` for the ``limit`` best-covered recipes.
+
+        Each match is ``(recipe_id, coverage, missing_ingredient_ids)``, ordered by coverage,
+        then fewest missing ingredients, then recipe id. Posting lists are merged rarest
+        first; if the latency budget runs out part way, ranking uses what was merged so
+        far and ``truncated`` is true.
+        """
+        deadline = time.monotonic() + budget_ms / 1000 if budget_ms else None
+        # One published view for the whole query, whatever writers do meanwhile.
+        state = self.rows
+        size = state.size
+        have = set()
+        for leftover in leftovers:
+            have |= self.resolve(leftover)
+        lists = []
+        for ingredient_id in have:
+            posting, count = state.postings.get(ingredient_id, (None, 0))
+            if count:
+                lists.append(posting[:count])
+        lists.sort(key=len)
+        if not lists or not size:
+            return [], False
+
+        hits = np.zeros(size, dtype=np.int32)
+        truncated = False
+        for start in range(0, len(lists), _MERGE_GROUP_SIZE):
+            if deadline and start and time.monotonic() > deadline:
+                truncated = True
+                break
+            group = np.concatenate(lists[start:start + _MERGE_GROUP_SIZE])
+            # Rows appended after ``state`` was taken fall past ``size`` and are cut off.
+            hits += np.bincount(group, minlength=size)[:size].astype(np.int32)
+
+        # Copied, so a row retired part way through cannot turn into a division by zero.
+        totals = state.totals[:size].copy()
+        recipe_ids = state.recipe_ids[:size]
+        live = totals > 0
+        coverage = np.divide(hits, totals, out=np.zeros(size), where=live)
+        rows = np.flatnonzero(live & (hits > 0) & (coverage >= min_coverage))
+        if len(rows) > limit:
+            # Keep every row tied with the limit-th best coverage, then order that short list exactly.
+            threshold = np.partition(coverage[rows], len(rows) - limit)[len(rows) - limit]
+            rows = rows[coverage[rows] >= threshold]
+        missing = totals[rows] - hits[rows]
+        order = np.lexsort((recipe_ids[rows], missing, -coverage[rows]))[:limit]
+        return [
+            (int(recipe_ids[row]), float(coverage[row]), sorted(state.ingredients[row] - have))
+            for row in rows[order]
+        ], truncated
+
+
+leftover_index = Snapshot("leftovers", LeftoverIndex.build)
+
+
+def rank_recipes(leftovers, limit, min_coverage=0.0):
+    """Ranks recipes for ``leftovers`` within the configured latency budget."""
+    budget_ms = getattr(settings, "LEFTOVER_SUGGESTION_BUDGET_MS", 50)
+    index = leftover_index.get()
+    matches, truncated = index.rank(leftovers, limit, min_coverage, budget_ms)
+    return [
+        (recipe_id, coverage, [index.names[ingredient_id] for ingredient_id in missing])
+        for recipe_id, coverage, missing in matches
+    ], truncated
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import response_cache
+from recipes.models import Recipe
+from recipes.optimizer import nutrition_matrix
+from recipes.recommendations import recommendation_index
+
+
+class Command(BaseCommand):
+    help = "Parses Recipe.nutrition into the typed nutrition columns for every recipe."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = time.monotonic()
+        processed = 0
+        batch = []
+        for recipe in Recipe.objects.only("id", "nutrition").order_by("id").iterator(chunk_size=batch_size):
+            recipe.sync_nutrition()
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                processed += self._flush(batch)
+                batch = []
+        if batch:
+            processed += self._flush(batch)
+        # bulk_update sends no signals; both snapshots encode the nutrition columns.
+        nutrition_matrix.invalidate()
+        recommendation_index.invalidate()
+        response_cache.invalidate(response_cache.CATALOG)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Backfilled nutrition for {processed} recipes in {elapsed:.1f}s."))
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            Recipe.objects.bulk_update(batch, Recipe.NUTRITION_FIELDS)
+        return len(batch)
@@ -0,0 +1,212 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes import response_cache
+from recipes.dietary import sync_dietary_filters
+from recipes.indexing import index_recipes
+from recipes.leftovers import leftover_index
+from recipes.models import Recipe
+from recipes.optimizer import nutrition_matrix
+from recipes.recommendations import recommendation_index
+from recipes.sampling import recipe_sampler
+
+IMPORT_FIELDS = ("title", "ingredients", "instructions", "nutrition", "dietary_tags")
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_ndjson(handle):
+    for line_number, line in enumerate(handle, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, RowError(f"invalid JSON: {exc.msg}")
+            continue
+        yield line_number, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+
+def read_csv(handle):
+    # Line 1 is the header row.
+    for line_number, row in enumerate(csv.DictReader(handle), start=2):
+        yield line_number, row
+
+
+def _json_cell(value, expected_type, field):
+    """CSV cells carry JSON for structured fields; NDJSON rows already hold decoded values."""
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return expected_type()
+        if expected_type is list and not value.startswith("["):
+            return [part.strip() for part in value.replace(";", ",").split(",") if part.strip()]
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise RowError(f"{field} is not valid JSON")
+    if value is None:
+        return expected_type()
+    if not isinstance(value, expected_type):
+        raise RowError(f"{field} must be a {expected_type.__name__}")
+    return value
+
+
+def clean_row(row):
+    """Validates one input row and returns the model field values, raising ``RowError``."""
+    title = str(row.get("title") or "").strip()
+    if not title:
+        raise RowError("title is required")
+    if len(title) > 255:
+        raise RowError("title is longer than 255 characters")
+
+    ingredients = row.get("ingredients")
+    if isinstance(ingredients, list):
+        ingredients = ", ".join(str(item).strip() for item in ingredients)
+    ingredients = str(ingredients or "").strip()
+    if not ingredients:
+        raise RowError("ingredients are required")
+
+    instructions = str(row.get("instructions") or "").strip()
+    if not instructions:
+        raise RowError("instructions are required")
+
+    return {
+        "title": title,
+        "ingredients": ingredients,
+        "instructions": instructions,
+        "nutrition": _json_cell(row.get("nutrition"), dict, "nutrition"),
+        "dietary_tags": _json_cell(row.get("dietary_tags"), list, "dietary_tags"),
+    }
+
+
+class Command(BaseCommand):
+    help = "Bulk-imports recipes from an NDJSON or CSV file in batched transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["ndjson", "csv"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--update-existing",
+            action="store_true",
+            help="Update recipes whose title already exists instead of inserting duplicates.",
+        )
+        parser.add_argument("--max-errors", type=int, default=20, help="Invalid rows to print before going quiet.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("csv" if path.lower().endswith(".csv") else "ndjson")
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        self.update_existing = options["update_existing"]
+        self.created = self.updated = self.invalid = 0
+        started = time.monotonic()
+        try:
+            with open(path, newline="", encoding="utf-8") as handle:
+                reader = read_csv(handle) if file_format == "csv" else read_ndjson(handle)
+                batch = []
+                for line_number, row in reader:
+                    try:
+                        if isinstance(row, RowError):
+                            raise row
+                        values = clean_row(row)
+                    except RowError as exc:
+                        self.invalid += 1
+                        if self.invalid <= options["max_errors"]:
+                            self.stderr.write(f"line {line_number}: {exc}")
+                        continue
+                    batch.append(values)
+                    if len(batch) >= batch_size:
+                        self._write(batch)
+                        batch = []
+                        self._progress(started)
+                if batch:
+                    self._write(batch)
+                    self._progress(started)
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+        finally:
+            if self.created or self.updated:
+                # Bulk writes bypass the model signals that keep the in-memory indexes current.
+                for snapshot in (leftover_index, recommendation_index, recipe_sampler, nutrition_matrix):
+                    snapshot.invalidate()
+                response_cache.invalidate(response_cache.CATALOG)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.created} new and {self.updated} updated recipes, "
+            f"skipped {self.invalid} invalid rows in {time.monotonic() - started:.1f}s."
+        ))
+
+    def _write(self, batch):
+        """Inserts every row of ``batch``, or with ``--update-existing`` applies rows to the recipe titled alike."""
+        now = timezone.now()
+        existing = {}
+        if self.update_existing:
+            titles = {values["title"] for values in batch}
+            for recipe in Recipe.objects.filter(title__in=titles).order_by("-id"):
+                existing[recipe.title] = recipe
+
+        to_create, to_update = [], {}
+        updated = 0
+        for values in batch:
+            recipe = existing.get(values["title"])
+            if recipe is None:
+                recipe = Recipe(**values)
+                to_create.append(recipe)
+                if self.update_existing:
+                    # A later row with this title updates the recipe this one creates, as across batches.
+                    existing[recipe.title] = recipe
+            else:
+                for field, value in values.items():
+                    setattr(recipe, field, value)
+                if recipe.pk is not None:
+                    to_update[recipe.pk] = recipe
+                updated += 1
+            recipe.sync_nutrition()
+            recipe.updated_at = now
+
+        written = to_create + list(to_update.values())
+        with transaction.atomic():
+            Recipe.objects.bulk_create(to_create)
+            self._update(list(to_update.values()))
+            index_recipes(written)
+            sync_dietary_filters(written)
+        self.created += len(to_create)
+        self.updated += updated
+
+    def _update(self, recipes):
+        """
+        Writes ``recipes`` back with one parameterized UPDATE run through ``executemany``.
+
+        ``QuerySet.bulk_update`` builds a CASE expression per field and row, which grows
+        quadratically with the batch size.
+        """
+        if not recipes:
+            return
+        fields = [Recipe._meta.get_field(name) for name in (*IMPORT_FIELDS, *Recipe.NUTRITION_FIELDS, "updated_at")]
+        qn = connection.ops.quote_name
+        assignments = ", ".join(f"{qn(field.column)} = %s" for field in fields)
+        sql = f"UPDATE {qn(Recipe._meta.db_table)} SET {assignments} WHERE {qn(Recipe._meta.pk.column)} = %s"
+        params = [
+            [field.get_db_prep_save(getattr(recipe, field.attname), connection) for field in fields] + [recipe.pk]
+            for recipe in recipes
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def _progress(self, started):
+        elapsed = time.monotonic() - started
+        written = self.created + self.updated
+        rate = written / elapsed if elapsed else 0
+        self.stdout.write(f"{written} recipes written ({rate:,.0f}/s), {self.invalid} invalid rows")
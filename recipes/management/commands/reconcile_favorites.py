@@ -0,0 +1,53 @@
+import math
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import response_cache
+from recipes.leaderboard import favorite_log_weight, leaderboard, log_sum_exp
+from recipes.models import Recipe, RecipeFavorite
+
+
+class Command(BaseCommand):
+    help = "Recomputes favorites_count and trending_score from the favorite links, or checks them with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report recipes whose counters are out of date.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # A running ln(1 + Σ w) per recipe, starting from the 0 of a recipe without favorites.
+        expected = defaultdict(lambda: [0, 0.0])
+        links = RecipeFavorite.objects.order_by().values_list("recipe_id", "created_at")
+        for recipe_id, created_at in links.iterator(chunk_size=10000):
+            expected[recipe_id][0] += 1
+            expected[recipe_id][1] = log_sum_exp([expected[recipe_id][1], favorite_log_weight(created_at)])
+
+        drifted = []
+        processed = 0
+        recipes = Recipe.objects.order_by("id").values_list("id", *Recipe.POPULARITY_FIELDS)
+        for recipe_id, favorites_count, trending_score in recipes.iterator(chunk_size=10000):
+            processed += 1
+            count, score = expected.get(recipe_id, (0, 0.0))
+            if favorites_count != count or not math.isclose(trending_score, score, rel_tol=1e-9, abs_tol=1e-9):
+                drifted.append((recipe_id, count, score))
+                if options["check"]:
+                    self.stdout.write(f"recipe {recipe_id}: {favorites_count} favorites stored, {count} linked")
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{len(drifted)} of {processed} recipes have out-of-date favorite counters.")
+            self.stdout.write(self.style.SUCCESS(f"Favorite counters are consistent for {processed} recipes."))
+            return
+
+        with transaction.atomic():
+            for recipe_id, count, score in drifted:
+                Recipe.objects.filter(pk=recipe_id).update(favorites_count=count, trending_score=score)
+        if drifted:
+            leaderboard.invalidate()
+            response_cache.invalidate(response_cache.CATALOG)
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(drifted)} of {processed} recipes in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import response_cache
+from recipes.models import Recipe
+from recipes.ratings import aggregates, review_totals
+
+
+class Command(BaseCommand):
+    help = "Recomputes the rating aggregates of every recipe from its reviews, or checks them for drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report recipes whose aggregates are out of date.")
+        parser.add_argument("--tolerance", type=float, default=1e-6)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        totals = review_totals()
+        drifted = []
+        processed = 0
+        recipes = Recipe.objects.only("id", *Recipe.RATING_FIELDS).order_by("id").iterator(chunk_size=5000)
+        for recipe in recipes:
+            processed += 1
+            expected = aggregates(*totals.get(recipe.pk, (0.0, 0)))
+            stale = [
+                field for field, value in expected.items()
+                if abs(getattr(recipe, field) - value) > options["tolerance"]
+            ]
+            if stale:
+                drifted.append((recipe.pk, expected))
+                if options["check"]:
+                    self.stdout.write(f"recipe {recipe.pk}: {', '.join(stale)} out of date")
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{len(drifted)} of {processed} recipes have out-of-date rating aggregates.")
+            self.stdout.write(self.style.SUCCESS(f"Rating aggregates are consistent for {processed} recipes."))
+            return
+
+        with transaction.atomic():
+            for recipe_id, expected in drifted:
+                Recipe.objects.filter(pk=recipe_id).update(**expected)
+        if drifted:
+            response_cache.invalidate(response_cache.CATALOG)
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(drifted)} of {processed} recipes in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,147 @@
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from recipes.models import MealPlan, Recipe
+from recipes.planning import create_meal_plans
+from recipes.ratings import rate
+
+PROFILES = ("default", "production")
+
+
+def _percentile(latencies, fraction):
+    latencies = sorted(latencies)
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] if latencies else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammers a copy of the SQLite database with concurrent meal-plan writes, ratings and reads under "
+        "each database profile (MEAL_PLAN_DB_PROFILE) and compares throughput and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent clients, each with its own connection.")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run.")
+        parser.add_argument("--write-ratio", type=float, default=0.3, help="Share of operations that write.")
+        parser.add_argument("--profile", choices=PROFILES, action="append", help="Profile to run; repeatable, default both.")
+        # Set on the child process that runs one profile against one copy.
+        parser.add_argument("--worker", action="store_true", help="Run against the configured database in this process.")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            self._work(options)
+            return
+        if connection.vendor != "sqlite":
+            raise CommandError("This stress test only applies to SQLite databases.")
+        source = settings.DATABASES["default"]["NAME"]
+        if not Path(source).exists():
+            raise CommandError(f"{source} does not exist; migrate and import some recipes first.")
+
+        self.stdout.write(f"{options['threads']} threads for {options['seconds']:.0f}s, write ratio {options['write_ratio']}")
+        self.stdout.write(
+            f"{'profile':<11} {'journal':<8} {'ops/s':>8} {'reads/s':>8} {'writes/s':>8} "
+            f"{'write p99 ms':>12} {'locked':>7}"
+        )
+        for profile in options["profile"] or PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                # Every profile starts from the same rollback-journal copy, so no run inherits
+                # the journal mode or the writes of another.
+                copy = Path(directory) / "stress.sqlite3"
+                with closing(sqlite3.connect(source)) as original, closing(sqlite3.connect(copy)) as target:
+                    original.backup(target)
+                    target.execute("PRAGMA journal_mode=DELETE")
+                completed = subprocess.run(
+                    [
+                        sys.executable, "-m", "django", "stress_sqlite", "--worker",
+                        "--threads", str(options["threads"]), "--seconds", str(options["seconds"]),
+                        "--write-ratio", str(options["write_ratio"]),
+                    ],
+                    env={
+                        **os.environ,
+                        "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+                        "MEAL_PLAN_DB_PROFILE": profile,
+                        "MEAL_PLAN_DB_NAME": str(copy),
+                    },
+                    capture_output=True,
+                    text=True,
+                )
+            if completed.returncode:
+                raise CommandError(f"The {profile} run failed:\n{completed.stderr}")
+            self.stdout.write(f"{profile:<11} {completed.stdout.strip()}")
+
+    def _work(self, options):
+        # The production profile caches in the database unless Redis is configured.
+        call_command("createcachetable", verbosity=0)
+        recipe_ids = list(Recipe.objects.order_by("?").values_list("id", flat=True)[:500])
+        if len(recipe_ids) < 3:
+            raise CommandError("The catalog needs at least three recipes.")
+        suffix = f"{os.getpid()}-{time.time_ns()}"
+        users = [User.objects.create_user(username=f"stress-{suffix}-{n}") for n in range(options["threads"])]
+        journal_mode = connection.cursor().execute("PRAGMA journal_mode").fetchone()[0]
+        close_old_connections()
+
+        deadline = time.monotonic() + options["seconds"]
+        lock = threading.Lock()
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        write_latencies = []
+
+        def client(user, seed):
+            rng = random.Random(seed)
+            today = timezone.now().date()
+            while time.monotonic() < deadline:
+                write = rng.random() < options["write_ratio"]
+                started = time.perf_counter()
+                # Each operation stands for one request, with the connection handling Django gives a request.
+                close_old_connections()
+                try:
+                    if write and rng.random() < 0.5:
+                        create_meal_plans(user, today + timedelta(days=rng.randrange(365)), [rng.sample(recipe_ids, 3)])
+                    elif write:
+                        rate(Recipe.objects.get(pk=rng.choice(recipe_ids)), user, float(rng.randint(1, 5)))
+                    else:
+                        list(MealPlan.objects.filter(user=user, date__range=[today, today + timedelta(days=6)]).with_recipes())
+                        Recipe.objects.with_favorites().filter(pk=rng.choice(recipe_ids)).first()
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+                    with lock:
+                        counts["locked"] += 1
+                    continue
+                finally:
+                    close_old_connections()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    counts["writes" if write else "reads"] += 1
+                    if write:
+                        write_latencies.append(elapsed)
+            connection.close()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, args=(user, n)) for n, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        total = counts["reads"] + counts["writes"]
+        self.stdout.write(
+            f"{journal_mode:<8} {total / elapsed:>8.0f} {counts['reads'] / elapsed:>8.0f} "
+            f"{counts['writes'] / elapsed:>8.0f} {_percentile(write_latencies, 0.99) * 1000:>12.1f} {counts['locked']:>7}"
+        )
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:38
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A copy of the ``recipes.ingredients`` tokenizer, so later changes to it cannot change
+# the rows this migration writes.
+WORD_RE = re.compile(r'[a-z]+')
+STOPWORDS = {
+    'a', 'an', 'and', 'or', 'of', 'to', 'the', 'for', 'with', 'into', 'taste',
+    'cup', 'cups', 'tbsp', 'tablespoon', 'tablespoons', 'tsp', 'teaspoon', 'teaspoons',
+    'g', 'gram', 'grams', 'kg', 'mg', 'ml', 'l', 'oz', 'ounce', 'ounces', 'lb', 'lbs',
+    'pound', 'pounds', 'pinch', 'dash', 'clove', 'cloves', 'slice', 'slices', 'piece',
+    'pieces', 'can', 'cans', 'handful', 'large', 'medium', 'small', 'fresh', 'chopped',
+    'diced', 'minced', 'sliced', 'grated', 'optional',
+}
+
+
+def normalize_token(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return {normalize_token(word)[:64] for word in WORD_RE.findall((text or '').lower()) if word not in STOPWORDS}
+
+
+def build_ingredient_tokens(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredientToken = apps.get_model('recipes', 'RecipeIngredientToken')
+    batch = []
+    for recipe_id, ingredients in Recipe.objects.values_list('id', 'ingredients').iterator(chunk_size=1000):
+        batch.extend(RecipeIngredientToken(token=token, recipe_id=recipe_id) for token in tokenize(ingredients))
+        if len(batch) >= 5000:
+            RecipeIngredientToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    RecipeIngredientToken.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_alter_recipereview_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredientToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_tokens', to='recipes.recipe')),
+            ],
+            options={
+                'unique_together': {('token', 'recipe')},
+            },
+        ),
+        migrations.RunPython(build_ingredient_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:39
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# A copy of the ``recipes.ingredients`` parser, so later changes to it cannot change the
+# rows this migration writes.
+WORD_RE = re.compile(r'[a-z]+')
+QUANTITY_RE = re.compile(r'^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)\s*([a-zA-Z]+\.?)?\s*(.*)$')
+STOPWORDS = {
+    'a', 'an', 'and', 'or', 'of', 'to', 'the', 'for', 'with', 'into', 'taste',
+    'cup', 'cups', 'tbsp', 'tablespoon', 'tablespoons', 'tsp', 'teaspoon', 'teaspoons',
+    'g', 'gram', 'grams', 'kg', 'mg', 'ml', 'l', 'oz', 'ounce', 'ounces', 'lb', 'lbs',
+    'pound', 'pounds', 'pinch', 'dash', 'clove', 'cloves', 'slice', 'slices', 'piece',
+    'pieces', 'can', 'cans', 'handful', 'large', 'medium', 'small', 'fresh', 'chopped',
+    'diced', 'minced', 'sliced', 'grated', 'optional',
+}
+UNIT_ALIASES = {
+    'cup': 'cup', 'cups': 'cup',
+    'tbsp': 'tbsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'tsp': 'tsp', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'g': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'mg': 'mg',
+    'ml': 'ml', 'l': 'l',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'pinch': 'pinch', 'dash': 'dash',
+    'clove': 'clove', 'cloves': 'clove',
+    'slice': 'slice', 'slices': 'slice',
+    'piece': 'piece', 'pieces': 'piece',
+    'can': 'can', 'cans': 'can',
+    'handful': 'handful',
+}
+
+
+def normalize_token(word):
+    word = word.lower()
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize_name(text):
+    words = [normalize_token(word)[:64] for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+    return ' '.join(words) or text.strip().lower()
+
+
+def parse_quantity(text):
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            if float(denominator) == 0:
+                return None
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def parse_ingredient_line(line):
+    match = QUANTITY_RE.match(line)
+    if not match:
+        return None, '', normalize_name(line)
+    amount, unit, rest = match.groups()
+    quantity = parse_quantity(amount)
+    unit = (unit or '').rstrip('.').lower()
+    if unit in UNIT_ALIASES:
+        unit = UNIT_ALIASES[unit]
+    elif unit:
+        rest = f'{unit} {rest}'
+        unit = ''
+    return quantity, unit, normalize_name(rest or line)
+
+
+def parse_ingredients(text):
+    return [parse_ingredient_line(part.strip()) for part in (text or '').split(',') if part.strip()]
+
+
+def backfill_recipe_ingredients(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    def flush(batch):
+        parsed = [(recipe_id, parse_ingredients(text)) for recipe_id, text in batch]
+        names = {name[:255] for _, lines in parsed for _, _, name in lines}
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+        names = list(names)
+        ids = {}
+        for start in range(0, len(names), 900):
+            ids.update(Ingredient.objects.filter(name__in=names[start:start + 900]).values_list('name', 'id'))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ids[name[:255]], quantity=quantity, unit=unit, position=position)
+            for recipe_id, lines in parsed
+            for position, (quantity, unit, name) in enumerate(lines)
+        ])
+
+    batch = []
+    for row in Recipe.objects.order_by('id').values_list('id', 'ingredients').iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipeingredienttoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.FloatField(blank=True, null=True)),
+                ('unit', models.CharField(blank=True, max_length=32)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipes.ingredient')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ['recipe', 'position'],
+                'indexes': [models.Index(fields=['ingredient', 'recipe'], name='recipes_rec_ingredi_bc6c07_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_recipe_ingredients, migrations.RunPython.noop),
+    ]
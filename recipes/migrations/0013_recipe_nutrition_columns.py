@@ -0,0 +1,84 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:40
+
+import re
+
+from django.db import migrations, models
+
+# A copy of the ``recipes.nutrition`` parser, so later changes to it cannot change the
+# values this migration writes.
+NUMBER_RE = re.compile(r'-?(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+)(?:\.\d+)?')
+NUTRIENT_KEYS = {
+    'calories': ('calories', 'kcal', 'energy'),
+    'protein': ('protein', 'proteins'),
+    'carbs': ('carbs', 'carbohydrates', 'carbohydrate'),
+    'fat': ('fat', 'fats', 'total_fat'),
+    'fiber': ('fiber', 'fibre'),
+}
+
+
+def parse_amount(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_RE.search(str(value))
+    return float(match.group().replace(',', '')) if match else None
+
+
+def normalize_nutrition(nutrition):
+    values = {}
+    for nutrient, keys in NUTRIENT_KEYS.items():
+        raw = None
+        if isinstance(nutrition, dict):
+            raw = next((nutrition[key] for key in keys if nutrition.get(key) not in (None, '')), None)
+        values[nutrient] = parse_amount(raw)
+    return values
+
+
+def backfill_nutrition(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    batch = []
+    for recipe in Recipe.objects.only('id', 'nutrition').order_by('id').iterator(chunk_size=1000):
+        for field, value in normalize_nutrition(recipe.nutrition).items():
+            setattr(recipe, field, value)
+        batch.append(recipe)
+        if len(batch) >= 1000:
+            Recipe.objects.bulk_update(batch, list(NUTRIENT_KEYS))
+            batch = []
+    Recipe.objects.bulk_update(batch, list(NUTRIENT_KEYS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='calories',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbs',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fat',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fiber',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_nutrition, migrations.RunPython.noop),
+    ]
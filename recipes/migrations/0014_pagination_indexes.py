@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_nutrition_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', 'date'], name='recipes_mea_user_id_1c29da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipereview',
+            index=models.Index(fields=['recipe', 'created_at'], name='recipes_rec_recipe__de47a8_idx'),
+        ),
+    ]
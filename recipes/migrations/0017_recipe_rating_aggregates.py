@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def aggregates(total, count):
+    """The rating columns for ``count`` reviews summing to ``total``, as ``recipes.ratings`` computed them."""
+    if not count:
+        return {'rating_sum': 0.0, 'rating_count': 0, 'rating_avg': 0.0, 'rating_score': 0.0, 'rating': 0.0}
+    mean = float(getattr(settings, 'RATING_PRIOR_MEAN', 3.0))
+    weight = float(getattr(settings, 'RATING_PRIOR_WEIGHT', 5))
+    return {
+        'rating_sum': total,
+        'rating_count': count,
+        'rating_avg': total / count,
+        'rating_score': (weight * mean + total) / (weight + count),
+        'rating': total / count,
+    }
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeReview = apps.get_model('recipes', 'RecipeReview')
+    totals = {
+        row['recipe_id']: (row['total'], row['count'])
+        for row in RecipeReview.objects.order_by().values('recipe_id').annotate(total=Sum('rating'), count=Count('id'))
+    }
+    # The old ``rating`` column held whichever value was submitted last; unreviewed recipes start from zero.
+    Recipe.objects.update(rating=0.0)
+    for recipe_id, (total, count) in totals.items():
+        Recipe.objects.filter(pk=recipe_id).update(**aggregates(total, count))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_avg',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_score',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
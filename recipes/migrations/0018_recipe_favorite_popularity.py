@@ -0,0 +1,86 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:57
+
+import math
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# A copy of the ``recipes.leaderboard`` weight, so later changes to it cannot change the
+# scores this migration writes.
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def favorite_log_weight(created_at):
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_DAYS', 7) * 86400
+    return math.log(2) * (created_at - TRENDING_EPOCH).total_seconds() / half_life
+
+
+def backfill_popularity(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeFavorite = apps.get_model('recipes', 'RecipeFavorite')
+    # Existing favorites all received the migration time as created_at, so they share one weight.
+    log_weight = favorite_log_weight(django.utils.timezone.now())
+    counts = RecipeFavorite.objects.order_by().values('recipe_id').annotate(count=Count('id'))
+    for row in counts.iterator(chunk_size=1000):
+        # ln(1 + count·w), kept in log space like ``recipes.leaderboard``.
+        exponent = math.log(row['count']) + log_weight
+        score = exponent + math.log1p(math.exp(-exponent)) if exponent > 0 else math.log1p(math.exp(exponent))
+        Recipe.objects.filter(pk=row['recipe_id']).update(favorites_count=row['count'], trending_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        # Adopt the auto-created favorites table as an explicit through model, keeping its rows.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeFavorite',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'recipes_recipe_favorites',
+                        'unique_together': {('recipe', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='favorites',
+                    field=models.ManyToManyField(blank=True, related_name='favorite_recipes', through='recipes.RecipeFavorite', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipefavorite',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AddField(
+            model_name='recipefavorite',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_popularity, migrations.RunPython.noop),
+    ]
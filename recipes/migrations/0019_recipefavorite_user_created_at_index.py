@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_recipe_favorite_popularity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipefavorite',
+            index=models.Index(fields=['user', 'created_at'], name='recipes_rec_user_id_9379c3_idx'),
+        ),
+    ]
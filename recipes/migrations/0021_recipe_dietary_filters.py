@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+def tag_names(tags):
+    """The distinct normalized names of ``tags``, as ``recipes.models.tag_names`` computed them."""
+    if not isinstance(tags, list):
+        return []
+    return sorted({str(tag).strip().lower()[:100] for tag in tags} - {''})
+
+
+def backfill_dietary_filters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    DietaryFilter = apps.get_model('recipes', 'DietaryFilter')
+    through = Recipe.dietary_filters.through
+    tags = {
+        recipe_id: tag_names(dietary_tags)
+        for recipe_id, dietary_tags in Recipe.objects.order_by().values_list('id', 'dietary_tags').iterator(chunk_size=10000)
+    }
+    names = {name for recipe_names in tags.values() for name in recipe_names}
+    DietaryFilter.objects.bulk_create([DietaryFilter(name=name) for name in names], ignore_conflicts=True)
+    ids = dict(DietaryFilter.objects.values_list('name', 'id'))
+    through.objects.bulk_create(
+        [through(recipe_id=recipe_id, dietaryfilter_id=ids[name]) for recipe_id, recipe_names in tags.items() for name in recipe_names],
+        batch_size=900,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_mealplan_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='dietary_filters',
+            field=models.ManyToManyField(blank=True, related_name='recipes', to='recipes.dietaryfilter'),
+        ),
+        migrations.RunPython(backfill_dietary_filters, migrations.RunPython.noop),
+    ]
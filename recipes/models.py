@@ -1,21 +1,137 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .nutrition import normalize_nutrition
+
+
+def normalize_tag(tag):
+    return str(tag).strip().lower()
+
+
+def tag_names(tags):
+    """Returns the distinct normalized names of ``tags``, dropping blanks; anything but a list has none."""
+    if not isinstance(tags, list):
+        return []
+    # Cut to the length of ``DietaryFilter.name``, which indexes them.
+    return sorted({normalize_tag(tag)[:100] for tag in tags} - {""})
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_favorites(self):
+        """Prefetches the favorites ids that ``RecipeSerializer`` renders, in one query for the whole set."""
+        return self.prefetch_related(models.Prefetch("favorites", queryset=User.objects.only("id")))
+
+    def _tag_names(self, tags):
+        return tag_names([tags] if isinstance(tags, str) else list(tags))
+
+    def _tagged(self, names):
+        """The ``dietary_filters`` link rows for the filters named ``names``, joined on the unique name index."""
+        return self.model.dietary_filters.through.objects.filter(dietaryfilter__name__in=names)
+
+    def with_any_tags(self, tags):
+        """Recipes carrying at least one of ``tags``; no tags leaves the queryset unfiltered."""
+        names = self._tag_names(tags)
+        if not names:
+            return self
+        return self.filter(pk__in=self._tagged(names).values("recipe_id"))
+
+    def with_all_tags(self, tags):
+        """Recipes carrying every one of ``tags``; no tags leaves the queryset unfiltered."""
+        names = self._tag_names(tags)
+        if not names:
+            return self
+        matched = (
+            self._tagged(names).order_by().values("recipe_id")
+            .annotate(matched=models.Count("dietaryfilter_id")).filter(matched=len(names))
+        )
+        return self.filter(pk__in=matched.values("recipe_id"))
+
 
 class Recipe(models.Model):
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     ingredients = models.TextField()
     instructions = models.TextField()
     nutrition = models.JSONField(default=dict)
+    # Mirrors ``rating_avg``; the rating columns are running aggregates of the recipe's reviews, see recipes/ratings.py.
     rating = models.FloatField(default=0.0)
-    favorites = models.ManyToManyField(User, related_name="favorite_recipes", blank=True)
+    rating_sum = models.FloatField(default=0.0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0.0)
+    rating_score = models.FloatField(default=0.0, db_index=True)
+    favorites = models.ManyToManyField(User, related_name="favorite_recipes", blank=True, through="RecipeFavorite")
+    # Denormalized popularity, maintained on favorite add/remove; see recipes/leaderboard.py.
+    favorites_count = models.PositiveIntegerField(default=0, db_index=True)
+    trending_score = models.FloatField(default=0.0, db_index=True)
     dietary_tags = models.JSONField(default=list, blank=True)
+    # Index of ``dietary_tags``, one link per normalized tag, kept in step by recipes/dietary.py.
+    dietary_filters = models.ManyToManyField("DietaryFilter", related_name="recipes", blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Typed copies of ``nutrition``, refreshed on every save so nutrition filters are indexed range queries.
+    calories = models.FloatField(null=True, blank=True, db_index=True)
+    protein = models.FloatField(null=True, blank=True, db_index=True)
+    carbs = models.FloatField(null=True, blank=True, db_index=True)
+    fat = models.FloatField(null=True, blank=True, db_index=True)
+    fiber = models.FloatField(null=True, blank=True, db_index=True)
+
+    NUTRITION_FIELDS = ("calories", "protein", "carbs", "fat", "fiber")
+    RATING_FIELDS = ("rating", "rating_sum", "rating_count", "rating_avg", "rating_score")
+    POPULARITY_FIELDS = ("favorites_count", "trending_score")
+
+    objects = RecipeQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    def sync_nutrition(self):
+        """Copies the parsed ``nutrition`` JSON into the typed nutrition columns."""
+        for field, value in normalize_nutrition(self.nutrition).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        self.sync_nutrition()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields) | {"updated_at"}
+            if "nutrition" in update_fields:
+                update_fields |= set(self.NUTRITION_FIELDS)
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+
+class RecipeFavorite(models.Model):
+    """The ``Recipe.favorites`` link, timestamped so a removed favorite can take back its trending weight."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "recipes_recipe_favorites"
+        unique_together = ("recipe", "user")
+        indexes = [models.Index(fields=["user", "created_at"])]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.recipe_id}"
+
+
+class MealPlanQuerySet(models.QuerySet):
+    def with_recipes(self):
+        """Prefetches everything ``MealPlanSerializer`` renders, so serializing costs a fixed number of queries."""
+        return self.prefetch_related(models.Prefetch("recipes", queryset=Recipe.objects.with_favorites()))
+
+
 class MealPlan(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateField()
     recipes = models.ManyToManyField('Recipe')  # Use the string 'Recipe' to avoid circular imports
+    # Also touched when recipes are added or removed, so it versions the plan for conditional GETs.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = MealPlanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "date"])]
+
     def __str__(self):
         return f"Meal Plan for {self.user} on {self.date}"
 
@@ -42,5 +158,42 @@ class RecipeReview(models.Model):
     rating = models.FloatField()
     review_text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["recipe", "created_at"])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.recipe.title} - {self.rating}"
+
+class RecipeIngredientToken(models.Model):
+    """Inverted ingredient index: one row per (normalized token, recipe) posting."""
+    token = models.CharField(max_length=64)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="ingredient_tokens")
+
+    class Meta:
+        unique_together = ("token", "recipe")
+
+    def __str__(self):
+        return f"{self.token} -> {self.recipe_id}"
+
+
+class Ingredient(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """One parsed line of ``Recipe.ingredients``, linked to its normalized ``Ingredient``."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="recipe_ingredients")
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name="recipe_ingredients")
+    quantity = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=32, blank=True)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ["recipe", "position"]
+        indexes = [models.Index(fields=["ingredient", "recipe"])]
+
     def __str__(self):
-        return f"{self.user.username} - {self.recipe.title} - {self.rating}"
\ No newline at end of file
+        return f"{self.recipe_id}: {self.quantity or ''} {self.unit} {self.ingredient}".strip()
@@ -0,0 +1,39 @@
+"""Normalization of the free-form ``Recipe.nutrition`` JSON into typed values."""
+import re
+
+# Amounts may group thousands with commas, as in "1,200 kcal".
+_NUMBER_RE = re.compile(r"-?(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+)(?:\.\d+)?")
+
+# Canonical nutrient name -> keys seen for it in recipe data, in order of preference.
+NUTRIENT_KEYS = {
+    "calories": ("calories", "kcal", "energy"),
+    "protein": ("protein", "proteins"),
+    "carbs": ("carbs", "carbohydrates", "carbohydrate"),
+    "fat": ("fat", "fats", "total_fat"),
+    "fiber": ("fiber", "fibre"),
+}
+
+
+def raw_value(nutrition, nutrient, default=None):
+    """Returns the value stored for ``nutrient`` under whichever alias the recipe uses."""
+    if not isinstance(nutrition, dict):
+        return default
+    for key in NUTRIENT_KEYS[nutrient]:
+        if nutrition.get(key) not in (None, ""):
+            return nutrition[key]
+    return default
+
+
+def parse_amount(value):
+    """Parses amounts such as ``40``, ``"40g"`` or ``"1,200 kcal"``; returns ``None`` when there is no number."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def normalize_nutrition(nutrition):
+    """Returns ``{nutrient: float or None}`` for every canonical nutrient."""
+    return {nutrient: parse_amount(raw_value(nutrition, nutrient)) for nutrient in NUTRIENT_KEYS}
@@ -0,0 +1,297 @@
+"""Meal plans solved against daily nutrition targets over an in-memory nutrition matrix."""
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import Recipe
+from .sampling import normalize_tag
+from .snapshots import Snapshot
+
+NUTRIENTS = Recipe.NUTRITION_FIELDS
+# How much a relative miss on each nutrient counts towards a day's error.
+NUTRIENT_WEIGHTS = {"calories": 1.0, "protein": 0.6, "carbs": 0.3, "fat": 0.3, "fiber": 0.2}
+# The greedy pass picks at random among this many best candidates, so plans vary between runs.
+GREEDY_CHOICES = 8
+# Candidates scored per local-search move, drawn at random from the eligible rows.
+MOVE_SAMPLE_SIZE = 4096
+# Largest plan one request may solve for.
+MAX_DAYS = 14
+MAX_MEALS_PER_DAY = 6
+
+
+class _Rows:
+    """
+    The rows one reader sees: the first ``size`` rows of ``matrix``, ``recipe_ids``,
+    ``live`` and each of the ``tag_masks``.
+
+    As in ``recipes.leftovers``, writers only fill slots past what a published ``_Rows``
+    covers, while growth and new tags allocate fresh arrays and a fresh mask dict, so a
+    reader that takes ``matrix.rows`` once never sees an array change shape under it.
+    """
+    __slots__ = ("matrix", "recipe_ids", "live", "tag_masks", "size")
+
+    def __init__(self, matrix, recipe_ids, live, tag_masks, size):
+        self.matrix = matrix
+        self.recipe_ids = recipe_ids
+        self.live = live
+        self.tag_masks = tag_masks
+        self.size = size
+
+    def eligible(self, tags=()):
+        """Returns the rows of live recipes carrying every tag in ``tags``."""
+        mask = self.live[:self.size].copy()
+        for tag in tags:
+            tag_mask = self.tag_masks.get(normalize_tag(tag))
+            if tag_mask is None:
+                return np.zeros(0, dtype=np.int64)
+            mask &= tag_mask[:self.size]
+        return np.flatnonzero(mask)
+
+
+class NutritionMatrix:
+    """
+    A ``float32`` matrix with one row of ``NUTRIENTS`` per recipe with known calories.
+
+    Missing macros count as zero. Rows are recycled through a ``live`` mask, and each
+    dietary tag keeps a boolean mask over the rows, so eligibility is a few vector ANDs.
+    """
+
+    def __init__(self, capacity=1024):
+        self.rows = _Rows(
+            np.zeros((capacity, len(NUTRIENTS)), dtype=np.float32),
+            np.zeros(capacity, dtype=np.int64),
+            np.zeros(capacity, dtype=bool),
+            {},
+            0,
+        )
+        self.tags_of = {}
+        self.row_of = {}
+
+    @classmethod
+    def build(cls):
+        recipes = Recipe.objects.exclude(calories=None).order_by().values_list("id", "dietary_tags", *NUTRIENTS)
+        recipes = list(recipes)
+        matrix = cls(capacity=max(len(recipes) * 5 // 4, 1024))
+        for recipe_id, tags, *nutrition in recipes:
+            matrix.put(recipe_id, tags, nutrition)
+        return matrix
+
+    def put(self, recipe_id, tags, nutrition):
+        """Sets a recipe's row from ``nutrition`` in ``NUTRIENTS`` order; recipes without calories are dropped."""
+        if nutrition[0] is None:
+            self.remove(recipe_id)
+            return
+        rows = self.rows
+        matrix, recipe_ids, live, tag_masks, size = rows.matrix, rows.recipe_ids, rows.live, rows.tag_masks, rows.size
+        row = self.row_of.get(recipe_id)
+        if row is None:
+            row = size
+            size += 1
+            if row == len(matrix):
+                grow = max(len(matrix) // 2, 1024)
+                matrix = np.vstack([matrix, np.zeros((grow, len(NUTRIENTS)), dtype=np.float32)])
+                recipe_ids = np.concatenate([recipe_ids, np.zeros(grow, dtype=np.int64)])
+                live = np.concatenate([live, np.zeros(grow, dtype=bool)])
+                tag_masks = {tag: np.concatenate([mask, np.zeros(grow, dtype=bool)]) for tag, mask in tag_masks.items()}
+            recipe_ids[row] = recipe_id
+        tags = {normalize_tag(tag) for tag in tags} if isinstance(tags, list) else set()
+        if not tags <= tag_masks.keys():
+            tag_masks = {**tag_masks, **{tag: np.zeros(len(matrix), dtype=bool) for tag in tags - tag_masks.keys()}}
+        for tag in self.tags_of.get(recipe_id, ()):
+            tag_masks[tag][row] = False
+        for tag in tags:
+            tag_masks[tag][row] = True
+        self.tags_of[recipe_id] = tags
+        matrix[row] = [value or 0.0 for value in nutrition]
+        live[row] = True
+        if rows.matrix is not matrix or rows.tag_masks is not tag_masks or rows.size != size:
+            self.rows = _Rows(matrix, recipe_ids, live, tag_masks, size)
+        self.row_of[recipe_id] = row
+
+    def remove(self, recipe_id):
+        row = self.row_of.pop(recipe_id, None)
+        if row is None:
+            return
+        rows = self.rows
+        for tag in self.tags_of.pop(recipe_id, ()):
+            rows.tag_masks[tag][row] = False
+        rows.live[row] = False
+        rows.matrix[row] = 0
+
+
+nutrition_matrix = Snapshot("nutrition-matrix", NutritionMatrix.build)
+
+
+class WeekPlanner:
+    """
+    Picks ``meals_per_day`` recipes for each of ``days`` days to match daily nutrient ``targets``.
+
+    A day's error is the weighted sum of squared relative misses on each targeted
+    nutrient. A greedy pass fills the slots in order, each one against the share of the
+    targets it completes; local search then replaces single meals with better-fitting
+    candidates and swaps meals between days until a full pass finds nothing or the time
+    budget runs out. No recipe is used twice in a plan while there are enough
+    candidates; smaller pools only keep each day's meals distinct.
+    """
+
+    def __init__(self, matrix, rows, targets, days, meals_per_day, rng):
+        self.columns = [NUTRIENTS.index(name) for name in targets]
+        self.values = matrix.matrix[rows][:, self.columns].astype(np.float64)
+        self.recipe_ids = matrix.recipe_ids[rows]
+        self.targets = np.array([targets[name] for name in targets], dtype=np.float64)
+        self.weights = np.array([NUTRIENT_WEIGHTS[name] for name in targets]) / self.targets ** 2
+        self.days = days
+        self.meals_per_day = meals_per_day
+        self.rng = rng
+        self.unique = len(rows) >= days * meals_per_day
+        self.used = np.zeros(len(rows), dtype=bool)
+        self.plan = np.zeros((days, meals_per_day), dtype=np.int64)
+
+    def _errors(self, base, target):
+        """Returns the error of ``base`` plus each candidate row against ``target``."""
+        return ((self.values + base - target) ** 2) @ self.weights
+
+    def _blocked(self, day, slots):
+        """Rows a slot of ``day`` may not take: used anywhere in the plan, or in the given ``slots`` of that day."""
+        if self.unique:
+            return self.used
+        blocked = np.zeros(len(self.values), dtype=bool)
+        blocked[self.plan[day, slots]] = True
+        return blocked
+
+    def day_error(self, day):
+        total = self.values[self.plan[day]].sum(axis=0)
+        return float(((total - self.targets) ** 2) @ self.weights)
+
+    def greedy(self):
+        for day in range(self.days):
+            total = np.zeros(len(self.targets))
+            for slot in range(self.meals_per_day):
+                # Each slot aims at the share of the day's targets met once it is filled.
+                errors = self._errors(total, self.targets * (slot + 1) / self.meals_per_day)
+                errors[self._blocked(day, slice(0, slot))] = np.inf
+                choices = min(GREEDY_CHOICES, int(np.count_nonzero(np.isfinite(errors))))
+                best = np.argpartition(errors, choices - 1)[:choices]
+                row = int(self.rng.choice(best))
+                self.plan[day, slot] = row
+                self.used[row] = True
+                total += self.values[row]
+
+    def _replace(self, day, slot):
+        """Moves the best of a random sample of candidates into the slot if that lowers the day's error."""
+        current = self.plan[day, slot]
+        base = self.values[self.plan[day]].sum(axis=0) - self.values[current]
+        sample = self.rng.integers(len(self.values), size=min(MOVE_SAMPLE_SIZE, len(self.values)))
+        errors = ((self.values[sample] + base - self.targets) ** 2) @ self.weights
+        others = [other for other in range(self.meals_per_day) if other != slot]
+        errors[self._blocked(day, others)[sample]] = np.inf
+        best = int(np.argmin(errors))
+        if not errors[best] < self.day_error(day) - 1e-12:
+            return False
+        self.used[current] = False
+        self.plan[day, slot] = sample[best]
+        self.used[sample[best]] = True
+        return True
+
+    def _swap(self, day, slot):
+        """
+        Exchanges the slot's meal with one from another day if that lowers their combined error.
+
+        Replacements alone stall once the best recipes are all in use; swaps let the
+        plan rebalance them between days.
+        """
+        totals = self.values[self.plan].sum(axis=1)
+        current = self.plan[day, slot]
+        rows = self.plan.ravel()
+        owners = np.repeat(np.arange(self.days), self.meals_per_day)
+        # Every candidate moves into ``day`` while ``current`` moves into the candidate's day.
+        incoming = totals[day] - self.values[current] + self.values[rows]
+        outgoing = totals[owners] - self.values[rows] + self.values[current]
+        errors = (((incoming - self.targets) ** 2) @ self.weights + ((outgoing - self.targets) ** 2) @ self.weights)
+        errors -= ((totals[owners] - self.targets) ** 2) @ self.weights
+        errors[owners == day] = np.inf
+        if not self.unique:
+            errors[np.isin(rows, self.plan[day])] = np.inf
+            errors[[current in self.plan[owner] for owner in owners]] = np.inf
+        best = int(np.argmin(errors))
+        if not errors[best] < self.day_error(day) - 1e-12:
+            return False
+        other_day, other_slot = divmod(best, self.meals_per_day)
+        self.plan[day, slot], self.plan[other_day, other_slot] = rows[best], current
+        return True
+
+    def improve(self, deadline):
+        """Replaces and swaps single meals while that lowers the error; returns the number of moves made."""
+        moves = 0
+        improved = True
+        while improved:
+            improved = False
+            for day in range(self.days):
+                for slot in range(self.meals_per_day):
+                    if time.monotonic() >= deadline:
+                        return moves
+                    for move in (self._replace, self._swap):
+                        if move(day, slot):
+                            moves += 1
+                            improved = True
+        return moves
+
+    def recipe_plan(self):
+        return [[int(self.recipe_ids[row]) for row in day] for day in self.plan]
+
+
+def optimize_week(targets, tags=(), days=7, meals_per_day=3, time_budget=None, seed=None):
+    """
+    Solves a plan of ``days`` x ``meals_per_day`` recipes for daily nutrient ``targets``.
+
+    ``targets`` maps names from ``NUTRIENTS`` to positive daily amounts; ``tags`` are the
+    dietary tags every recipe must carry. Local search stops after ``time_budget``
+    seconds (``MEAL_PLAN_OPTIMIZER_TIME_BUDGET`` by default); the greedy pass always
+    completes, so a plan is returned whenever enough recipes qualify.
+
+    Returns ``None`` when fewer than ``meals_per_day`` recipes qualify, otherwise a dict
+    with the recipe ids per day, each day's nutrient totals and the mean daily error.
+    """
+    started = time.monotonic()
+    if time_budget is None:
+        time_budget = getattr(settings, "MEAL_PLAN_OPTIMIZER_TIME_BUDGET", 0.5)
+    # One view throughout, so the rows picked here index the arrays the planner reads.
+    matrix = nutrition_matrix.get().rows
+    rows = matrix.eligible(tags)
+    if len(rows) < meals_per_day:
+        return None
+
+    planner = WeekPlanner(matrix, rows, targets, days, meals_per_day, np.random.default_rng(seed))
+    planner.greedy()
+    moves = planner.improve(started + time_budget)
+    totals = matrix.matrix[rows][planner.plan].sum(axis=1)
+    return {
+        "recipe_ids": planner.recipe_plan(),
+        "totals": [
+            {name: round(float(day[NUTRIENTS.index(name)]), 1) for name in NUTRIENTS} for day in totals
+        ],
+        "error": sum(planner.day_error(day) for day in range(days)) / days,
+        "moves": moves,
+        "elapsed": time.monotonic() - started,
+    }
+
+
+def parse_targets(value):
+    """Validates a ``{nutrient: daily amount}`` mapping, raising ``ValueError`` with a readable message."""
+    if not isinstance(value, dict) or not value:
+        raise ValueError(f"targets must map some of {', '.join(NUTRIENTS)} to daily amounts.")
+    unknown = sorted(set(value) - set(NUTRIENTS))
+    if unknown:
+        raise ValueError(f"Unknown nutrients in targets: {', '.join(unknown)}")
+    targets = {}
+    for name in NUTRIENTS:
+        if name not in value:
+            continue
+        try:
+            targets[name] = float(value[name])
+        except (TypeError, ValueError):
+            raise ValueError(f"The {name} target must be a number.")
+        if not targets[name] > 0:
+            raise ValueError(f"The {name} target must be positive.")
+    return targets
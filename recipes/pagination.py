@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a stable ordering.
+
+    Each page is fetched with a ``WHERE key > cursor`` lookup on an indexed column, so deep
+    pages cost the same as the first one. Clients may pick ``page_size`` up to the maximum.
+    """
+    page_size = getattr(settings, "API_PAGE_SIZE", 50)
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class RecipeCursorPagination(KeysetPagination):
+    ordering = "id"
+
+
+class MealHistoryCursorPagination(KeysetPagination):
+    ordering = ("-date", "-id")
+
+
+class ReviewCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class FavoriteCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
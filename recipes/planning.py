@@ -0,0 +1,51 @@
+"""Bulk creation of multi-day meal plans."""
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+
+from . import response_cache
+from .models import MealPlan, Recipe
+from .sampling import recipe_sampler
+
+
+def draw_recipe_ids(days, per_day, tag=None):
+    """
+    Draws recipe ids for ``days`` days of ``per_day`` meals in one pass over the sampler.
+
+    Meals never repeat within a week while the catalog has enough recipes; smaller
+    catalogs fall back to distinct recipes within each day only.
+    """
+    needed = days * per_day
+    pool = recipe_sampler.get().sample(needed, tag)
+    if not pool:
+        return []
+    if len(pool) >= needed:
+        return [pool[day * per_day:(day + 1) * per_day] for day in range(days)]
+    return [random.sample(pool, min(per_day, len(pool))) for _ in range(days)]
+
+
+def create_meal_plans(user, start_date, recipe_ids_by_day):
+    """
+    Writes one ``MealPlan`` per day starting at ``start_date`` with its recipes.
+
+    Plans and their recipe links are written with two ``bulk_create`` calls inside a
+    single transaction, so a failure never leaves a partial week behind. ``bulk_create``
+    sends no signals, so the user's cached shopping lists are dropped here. The returned
+    plans have their recipes prefetched.
+    """
+    through = MealPlan.recipes.through
+    with transaction.atomic():
+        response_cache.invalidate(response_cache.meal_plans_scope(user.pk))
+        meal_plans = MealPlan.objects.bulk_create([
+            MealPlan(user=user, date=start_date + timedelta(days=offset))
+            for offset in range(len(recipe_ids_by_day))
+        ])
+        through.objects.bulk_create([
+            through(mealplan_id=meal_plan.pk, recipe_id=recipe_id)
+            for meal_plan, recipe_ids in zip(meal_plans, recipe_ids_by_day)
+            for recipe_id in recipe_ids
+        ])
+    prefetch_related_objects(meal_plans, Prefetch("recipes", queryset=Recipe.objects.with_favorites()))
+    return meal_plans
@@ -0,0 +1,93 @@
+"""Running rating aggregates on ``Recipe``, kept in step with its ``RecipeReview`` rows."""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from . import response_cache
+from .models import Recipe, RecipeReview
+
+
+def _prior():
+    """Returns the (mean, weight) of the Bayesian prior every recipe's score starts from."""
+    return (
+        float(getattr(settings, "RATING_PRIOR_MEAN", 3.0)),
+        float(getattr(settings, "RATING_PRIOR_WEIGHT", 5)),
+    )
+
+
+def aggregates(total, count):
+    """
+    Returns the rating column values for ``count`` reviews summing to ``total``.
+
+    ``rating_score`` is the Bayesian average, the mean shrunk towards the prior by
+    ``RATING_PRIOR_WEIGHT`` virtual reviews, so a single five-star review does not
+    outrank a long record of fours. Unreviewed recipes score zero and sort last.
+    """
+    if not count:
+        return {"rating_sum": 0.0, "rating_count": 0, "rating_avg": 0.0, "rating_score": 0.0, "rating": 0.0}
+    mean, weight = _prior()
+    average = total / count
+    return {
+        "rating_sum": total,
+        "rating_count": count,
+        "rating_avg": average,
+        "rating_score": (weight * mean + total) / (weight + count),
+        "rating": average,
+    }
+
+
+def _expressions(total, count):
+    """The values of ``aggregates`` as SQL expressions, so one UPDATE can compute them from the stored row."""
+    mean, weight = _prior()
+    rated = GreaterThan(count, 0)
+    average = Case(When(rated, then=total / count), default=Value(0.0), output_field=FloatField())
+    return {
+        "rating_sum": total,
+        "rating_count": count,
+        "rating_avg": average,
+        "rating_score": Case(
+            When(rated, then=(Value(weight * mean) + total) / (Value(weight) + count)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        "rating": average,
+    }
+
+
+def apply_review_delta(recipe_id, rating_delta, count_delta):
+    """
+    Adds ``rating_delta`` and ``count_delta`` to a recipe's aggregates in a single UPDATE.
+
+    Every column is derived from the row's stored values inside the statement, so concurrent
+    reviews of the same recipe cannot lose each other's updates.
+    """
+    total = F("rating_sum") + Value(float(rating_delta))
+    count = F("rating_count") + Value(int(count_delta))
+    Recipe.objects.filter(pk=recipe_id).update(updated_at=timezone.now(), **_expressions(total, count))
+    response_cache.invalidate_recipes([recipe_id])
+
+
+def review_totals():
+    """Returns ``{recipe_id: (rating_sum, rating_count)}`` computed from the reviews in one GROUP BY."""
+    rows = RecipeReview.objects.order_by().values("recipe_id").annotate(total=Sum("rating"), count=Count("id"))
+    return {row["recipe_id"]: (row["total"], row["count"]) for row in rows}
+
+
+def rate(recipe, user, rating):
+    """Records ``user``'s rating of ``recipe``, updating their latest review instead of adding another."""
+    with transaction.atomic():
+        review = (
+            RecipeReview.objects.select_for_update()
+            .filter(recipe=recipe, user=user)
+            .order_by("-created_at", "-id")
+            .first()
+        )
+        if review is None:
+            RecipeReview.objects.create(recipe=recipe, user=user, rating=rating, review_text="")
+        elif review.rating != rating:
+            review.rating = rating
+            review.save(update_fields=["rating"])
+    recipe.refresh_from_db(fields=[*Recipe.RATING_FIELDS, "updated_at"])
+    return recipe
@@ -0,0 +1,177 @@
+"""Content-based "more like this" recommendations over precomputed recipe feature vectors."""
+import math
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .models import Recipe, RecipeIngredient
+from .snapshots import Snapshot
+
+# Dimensions of the hashed ingredient TF-IDF and dietary tag blocks.
+INGREDIENT_DIMENSIONS = getattr(settings, "RECOMMENDATION_INGREDIENT_DIMENSIONS", 256)
+TAG_DIMENSIONS = 32
+NUTRITION_DIMENSIONS = 5
+# Share of the similarity score contributed by each block.
+BLOCK_WEIGHTS = {"ingredients": 0.6, "tags": 0.25, "nutrition": 0.15}
+
+
+def _bucket(value, dimensions):
+    return zlib.crc32(str(value).encode()) % dimensions
+
+
+def _normalized(block, weight):
+    norm = np.linalg.norm(block)
+    return block * (math.sqrt(weight) / norm) if norm else block
+
+
+class _Rows:
+    """
+    The rows one reader sees: the first ``size`` rows of ``matrix``, ``recipe_ids`` and ``live``.
+
+    As in ``recipes.leftovers``, writers only fill slots past what a published ``_Rows``
+    covers and growth allocates fresh arrays, so a reader that takes ``index.rows`` once
+    never sees an array change shape under it.
+    """
+    __slots__ = ("matrix", "recipe_ids", "live", "size")
+
+    def __init__(self, matrix, recipe_ids, live, size):
+        self.matrix = matrix
+        self.recipe_ids = recipe_ids
+        self.live = live
+        self.size = size
+
+
+class RecommendationIndex:
+    """
+    A dense ``float32`` matrix with one L2-normalized feature row per recipe.
+
+    Each row concatenates three independently normalized blocks, hashed ingredient TF-IDF,
+    dietary tags and macro-nutrient profile, scaled so that the dot product of two rows is
+    the weighted sum of the per-block cosine similarities.
+    """
+
+    width = INGREDIENT_DIMENSIONS + TAG_DIMENSIONS + NUTRITION_DIMENSIONS
+
+    def __init__(self, capacity=1024):
+        self.rows = _Rows(
+            np.zeros((capacity, self.width), dtype=np.float32),
+            np.zeros(capacity, dtype=np.int64),
+            np.zeros(capacity, dtype=bool),
+            0,
+        )
+        self.row_of = {}
+        self.idf = {}
+        self.default_idf = 1.0
+
+    @classmethod
+    def build(cls):
+        ingredients = defaultdict(set)
+        rows = RecipeIngredient.objects.order_by().values_list("recipe_id", "ingredient_id")
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            ingredients[recipe_id].add(ingredient_id)
+        recipes = list(Recipe.objects.values_list("id", "dietary_tags", "calories", "protein", "carbs", "fat", "fiber"))
+
+        index = cls(capacity=max(len(recipes) * 5 // 4, 1024))
+        document_frequency = Counter()
+        for ingredient_ids in ingredients.values():
+            document_frequency.update(ingredient_ids)
+        total = max(len(recipes), 1)
+        index.idf = {
+            ingredient_id: math.log(total / count) + 1.0 for ingredient_id, count in document_frequency.items()
+        }
+        index.default_idf = math.log(total) + 1.0
+        for recipe_id, tags, *nutrition in recipes:
+            index._set_row(recipe_id, index.features(ingredients.get(recipe_id, ()), tags, nutrition))
+        return index
+
+    def features(self, ingredient_ids, tags, nutrition):
+        """Returns the feature row for a recipe; ``nutrition`` is (calories, protein, carbs, fat, fiber)."""
+        ingredient_block = np.zeros(INGREDIENT_DIMENSIONS, dtype=np.float32)
+        for ingredient_id in set(ingredient_ids):
+            ingredient_block[_bucket(ingredient_id, INGREDIENT_DIMENSIONS)] += self.idf.get(
+                ingredient_id, self.default_idf
+            )
+
+        tag_block = np.zeros(TAG_DIMENSIONS, dtype=np.float32)
+        for tag in tags if isinstance(tags, list) else ():
+            tag_block[_bucket(str(tag).strip().lower(), TAG_DIMENSIONS)] = 1.0
+
+        calories, protein, carbs, fat, fiber = (value or 0.0 for value in nutrition)
+        macro_energy = protein * 4 + carbs * 4 + fat * 9
+        nutrition_block = np.zeros(NUTRITION_DIMENSIONS, dtype=np.float32)
+        if macro_energy:
+            nutrition_block[:3] = (protein * 4 / macro_energy, carbs * 4 / macro_energy, fat * 9 / macro_energy)
+        nutrition_block[3] = math.log1p(calories) / 10
+        nutrition_block[4] = math.log1p(fiber) / 5
+
+        return np.concatenate([
+            _normalized(ingredient_block, BLOCK_WEIGHTS["ingredients"]),
+            _normalized(tag_block, BLOCK_WEIGHTS["tags"]),
+            _normalized(nutrition_block, BLOCK_WEIGHTS["nutrition"]),
+        ])
+
+    def _set_row(self, recipe_id, vector):
+        rows = self.rows
+        row = self.row_of.get(recipe_id)
+        if row is not None:
+            rows.matrix[row] = vector
+            rows.live[row] = True
+            return
+        matrix, recipe_ids, live = rows.matrix, rows.recipe_ids, rows.live
+        row = rows.size
+        if row == len(matrix):
+            grow = max(len(matrix) // 2, 1024)
+            matrix = np.vstack([matrix, np.zeros((grow, self.width), dtype=np.float32)])
+            recipe_ids = np.concatenate([recipe_ids, np.zeros(grow, dtype=np.int64)])
+            live = np.concatenate([live, np.zeros(grow, dtype=bool)])
+        matrix[row] = vector
+        recipe_ids[row] = recipe_id
+        live[row] = True
+        self.rows = _Rows(matrix, recipe_ids, live, row + 1)
+        self.row_of[recipe_id] = row
+
+    def put(self, recipe, ingredient_ids):
+        """Recomputes one recipe's row in place, using the document frequencies from the last build."""
+        nutrition = [getattr(recipe, field) for field in Recipe.NUTRITION_FIELDS]
+        self._set_row(recipe.pk, self.features(ingredient_ids, recipe.dietary_tags, nutrition))
+
+    def remove(self, recipe_id):
+        row = self.row_of.pop(recipe_id, None)
+        if row is not None:
+            self.rows.live[row] = False
+            self.rows.matrix[row] = 0
+
+    def nearest(self, vector, limit, exclude=()):
+        """Returns ``[(recipe_id, score)]`` for the ``limit`` live rows most similar to ``vector``."""
+        rows = self.rows
+        scores = rows.matrix[:rows.size] @ vector
+        scores[~rows.live[:rows.size]] = -np.inf
+        for recipe_id in exclude:
+            row = self.row_of.get(recipe_id)
+            if row is not None and row < rows.size:
+                scores[row] = -np.inf
+        candidates = min(limit, int(np.count_nonzero(np.isfinite(scores))))
+        if candidates <= 0:
+            return []
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.lexsort((rows.recipe_ids[top], -scores[top]))]
+        return [(int(rows.recipe_ids[row]), float(scores[row])) for row in top]
+
+
+recommendation_index = Snapshot("recommendations", RecommendationIndex.build)
+
+
+def recommend(recipe, limit=3):
+    """Returns ``[(recipe_id, score)]`` for the recipes most similar to ``recipe``."""
+    index = recommendation_index.get()
+    rows = index.rows
+    row = index.row_of.get(recipe.pk)
+    if row is not None and row < rows.size:
+        vector = rows.matrix[row].copy()
+    else:
+        ingredient_ids = RecipeIngredient.objects.filter(recipe=recipe).values_list("ingredient_id", flat=True)
+        nutrition = [getattr(recipe, field) for field in Recipe.NUTRITION_FIELDS]
+        vector = index.features(list(ingredient_ids), recipe.dietary_tags, nutrition)
+    return index.nearest(vector, limit, exclude=(recipe.pk,))
@@ -0,0 +1,134 @@
+"""
+Versioned caching of read-only API payloads.
+
+Every cached payload is stored under a key that embeds the current version of each scope
+it depends on: one recipe, or a collection such as the dietary filters. Invalidating a
+scope bumps its version, which orphans every key built on the old one without having to
+find or delete them, so only ``get``/``set``/``add``/``incr`` are needed and any Django
+cache backend works unchanged. Versions are only shared by processes using the same
+backend: with the per-process local-memory cache, an invalidation reaches the process
+that made it and no other, which is why multi-worker deployments configure a shared one.
+"""
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+# Collection scopes. CATALOG is part of every key, so bulk writes can drop everything at once.
+CATALOG = "catalog"
+RECIPES = "recipes"
+DIETARY_FILTERS = "dietary-filters"
+SUBSTITUTES = "substitutes"
+# Bumped whenever any recipe's ingredient lines may have changed.
+RECIPE_INGREDIENTS = "recipe-ingredients"
+
+# Names of the cached endpoints, as passed to ``cached_response`` and reported by ``stats``.
+ENDPOINTS = (
+    "recipe-detail", "recipe-nutrition", "nutritional-summary", "dietary-filters", "popular-recipes",
+    "ingredient-substitute",
+)
+
+# Response headers stored along with the payload, so cache hits keep their validators.
+CACHED_HEADERS = ("ETag", "Last-Modified")
+
+_VERSION_PREFIX = "recipes:response-version:"
+_PAYLOAD_PREFIX = "recipes:response:"
+_STATS_PREFIX = "recipes:response-stats:"
+
+
+def recipe_scope(recipe_id):
+    return f"recipe:{recipe_id}"
+
+
+def meal_plans_scope(user_id):
+    return f"meal-plans:{user_id}"
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def _versions(scopes):
+    keys = [_VERSION_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seeded from the clock so a lost counter never restarts at a version already used.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _count(name, outcome):
+    key = f"{_STATS_PREFIX}{name}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def versioned_key(name, scopes, *args):
+    """Returns the cache key for ``name`` called with ``args`` under the current versions of ``scopes``."""
+    versions = _versions([CATALOG, *scopes])
+    # Arguments may come from the URL, so they are quoted to keep keys free of spaces and control characters.
+    return ":".join([_PAYLOAD_PREFIX + name, *(quote(str(arg)) for arg in args), *map(str, versions)])
+
+
+def cached_response(name, scopes, build, *args, timeout=None):
+    """
+    Returns the cached response for endpoint ``name`` called with ``args``, calling ``build()`` on a miss.
+
+    ``build`` returns a ``Response``; its status, data and validator headers are cached
+    for ``timeout`` seconds (``RESPONSE_CACHE_TIMEOUT`` by default) under the current
+    versions of ``scopes``. Responses with a 5xx status are never cached.
+    """
+    key = versioned_key(name, scopes, *args)
+    cached = cache.get(key)
+    if cached is not None:
+        _count(name, "hits")
+        status_code, data, headers = cached
+        response = Response(data, status=status_code, headers=headers)
+        response["X-Cache"] = "HIT"
+        return response
+
+    _count(name, "misses")
+    response = build()
+    if response.status_code < 500:
+        if timeout is None:
+            timeout = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+        headers = {header: response[header] for header in CACHED_HEADERS if response.has_header(header)}
+        cache.set(key, (response.status_code, response.data, headers), timeout)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+def invalidate(*scopes):
+    """Bumps the version of each scope once the current transaction commits."""
+    def bump():
+        for scope in scopes:
+            key = _VERSION_PREFIX + scope
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Nothing was cached under this scope yet, or its version was evicted.
+                pass
+
+    transaction.on_commit(bump)
+
+
+def invalidate_recipes(recipe_ids):
+    invalidate(RECIPES, *(recipe_scope(recipe_id) for recipe_id in recipe_ids))
+
+
+def stats():
+    """Returns ``{endpoint: {"hits": n, "misses": n}}`` for every cached endpoint."""
+    keys = [f"{_STATS_PREFIX}{name}:{outcome}" for name in ENDPOINTS for outcome in ("hits", "misses")]
+    counts = cache.get_many(keys)
+    return {
+        name: {outcome: counts.get(f"{_STATS_PREFIX}{name}:{outcome}", 0) for outcome in ("hits", "misses")}
+        for name in ENDPOINTS
+    }
@@ -0,0 +1,97 @@
+"""Uniform random recipe sampling over a compact in-memory array of live recipe ids."""
+import random
+import threading
+from array import array
+from collections import defaultdict
+
+from .models import Recipe, normalize_tag
+from .snapshots import Snapshot
+
+
+class IdPool:
+    """
+    An ``array`` of ids with O(1) add, swap-remove and uniform sampling.
+
+    A swap-remove shrinks the array while a draw may be indexing into it, so writes and
+    draws take the pool's lock; both are short, so readers rarely wait.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.position = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item):
+        with self._lock:
+            if item not in self.position:
+                self.position[item] = len(self.ids)
+                self.ids.append(item)
+
+    def discard(self, item):
+        with self._lock:
+            index = self.position.pop(item, None)
+            if index is None:
+                return
+            last = self.ids.pop()
+            if index < len(self.ids):
+                self.ids[index] = last
+                self.position[last] = index
+
+    def sample(self, k):
+        """Draws ``k`` distinct ids, or every id when the pool holds fewer than ``k``."""
+        with self._lock:
+            return random.sample(self.ids, min(k, len(self.ids)))
+
+
+class RecipeSampler:
+    """Id pools for the whole catalog and for each dietary tag."""
+
+    def __init__(self):
+        self.all = IdPool()
+        self.tags = defaultdict(IdPool)
+        self.tags_of = {}
+
+    @classmethod
+    def build(cls):
+        sampler = cls()
+        for recipe_id, tags in Recipe.objects.order_by().values_list("id", "dietary_tags").iterator(chunk_size=10000):
+            sampler.put(recipe_id, tags)
+        return sampler
+
+    def put(self, recipe_id, tags):
+        self.remove(recipe_id)
+        tags = {normalize_tag(tag) for tag in tags} if isinstance(tags, list) else set()
+        self.all.add(recipe_id)
+        self.tags_of[recipe_id] = tags
+        for tag in tags:
+            self.tags[tag].add(recipe_id)
+
+    def remove(self, recipe_id):
+        self.all.discard(recipe_id)
+        for tag in self.tags_of.pop(recipe_id, ()):
+            self.tags[tag].discard(recipe_id)
+
+    def sample(self, k, tag=None):
+        if tag is None:
+            return self.all.sample(k)
+        pool = self.tags.get(normalize_tag(tag))
+        return pool.sample(k) if pool else []
+
+
+recipe_sampler = Snapshot("sampler", RecipeSampler.build)
+
+
+def sample_recipes(k, tag=None):
+    """Returns up to ``k`` distinct random recipes, optionally restricted to one dietary tag."""
+    recipe_ids = recipe_sampler.get().sample(k, tag)
+    recipes = Recipe.objects.with_favorites().in_bulk(recipe_ids)
+    return [recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes]
+
+
+def pick_random_recipe():
+    """Returns one uniformly chosen recipe, or ``None`` for an empty catalog."""
+    recipes = sample_recipes(1)
+    return recipes[0] if recipes else None
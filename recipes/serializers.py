@@ -16,7 +16,9 @@ class DietaryFilterSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = '__all__'
+        # ``dietary_filters`` only indexes ``dietary_tags``.
+        exclude = ["dietary_filters"]
+        read_only_fields = Recipe.NUTRITION_FIELDS + Recipe.RATING_FIELDS + Recipe.POPULARITY_FIELDS
 
 class MealPlanSerializer(serializers.ModelSerializer):
     """Serializer for MealPlan objects"""
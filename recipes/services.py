@@ -1,45 +1,69 @@
 from datetime import timedelta, date
 import random
 from django.utils import timezone
-from django.db.models import Count
+from django.utils.dateparse import parse_date
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Recipe, MealPlan, IngredientSubstitute, DietaryFilter
+from .models import Recipe, MealPlan, IngredientSubstitute, DietaryFilter, RecipeIngredient
 from .serializers import RecipeSerializer, MealPlanSerializer, IngredientSubstituteSerializer, DietaryFilterSerializer
+from .indexing import search_recipe_ids
+from .nutrition import raw_value
+from .leftovers import rank_recipes
+from .recommendations import recommend
+from .sampling import pick_random_recipe
+from .ratings import rate
+from .leaderboard import BOARDS, popular_recipes
+from .favorites import favorite
+from .shopping import MAX_RANGE_DAYS, shopping_list
+from .substitutes import substitute_index
+from . import response_cache
+from .response_cache import cached_response, recipe_scope
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generate_shopping_list(request):
-    user = request.user
+    """Sums the ingredient quantities of the user's meal plans from ``start`` to ``end``, the coming week by default."""
     start_date = timezone.now().date()
     end_date = start_date + timedelta(days=7)
-
-    meal_plans = MealPlan.objects.filter(user=user, date__range=[start_date, end_date])
-    if not meal_plans.exists():
-        return Response({"detail": "No meal plans found for the current week."}, status=status.HTTP_404_NOT_FOUND)
-
-    shopping_list = {}
-    for meal_plan in meal_plans:
-        for recipe in meal_plan.recipes.all():
-            ingredients = recipe.ingredients.split(',')
-            for ingredient in ingredients:
-                ingredient = ingredient.strip()
-                shopping_list[ingredient] = shopping_list.get(ingredient, 0) + 1
-
-    formatted_list = [{"ingredient": item, "quantity": quantity} for item, quantity in shopping_list.items()]
-    return Response({"shopping_list": formatted_list}, status=status.HTTP_200_OK)
+    if request.query_params.get('start') or request.query_params.get('end'):
+        try:
+            start_date = parse_date(request.query_params.get('start', ''))
+            end_date = parse_date(request.query_params.get('end', ''))
+        except ValueError:
+            start_date = end_date = None
+        if not start_date or not end_date or end_date < start_date:
+            return Response({"error": "Invalid date range, use start and end as YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if (end_date - start_date).days >= MAX_RANGE_DAYS:
+            return Response({"error": f"The range can span at most {MAX_RANGE_DAYS} days."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    lines = shopping_list(request.user, start_date, end_date)
+    if lines is None:
+        return Response({"detail": "No meal plans found for the selected dates."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"start": start_date, "end": end_date, "shopping_list": lines}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_nutritional_summary(request, recipe_id):
+    return cached_response(
+        "nutritional-summary", [recipe_scope(recipe_id)], lambda: _nutritional_summary(recipe_id), recipe_id
+    )
+
+
+def _nutritional_summary(recipe_id):
     try:
         recipe = Recipe.objects.get(pk=recipe_id)
         nutrition = recipe.nutrition
-        summary = {key: nutrition.get(key, "N/A") for key in ["calories", "protein", "carbohydrates", "fat", "fiber"]}
+        summary = {
+            key: raw_value(nutrition, nutrient, "N/A")
+            for key, nutrient in [("calories", "calories"), ("protein", "protein"), ("carbohydrates", "carbs"),
+                                  ("fat", "fat"), ("fiber", "fiber")]
+        }
         return Response({"recipe": recipe.title, "nutritional_summary": summary}, status=status.HTTP_200_OK)
     except Recipe.DoesNotExist:
         return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -49,13 +73,14 @@ def get_nutritional_summary(request, recipe_id):
 @permission_classes([IsAuthenticated])
 def get_ingredient_substitute(request, ingredient):
     ingredient = ingredient.lower()
-    try:
-        substitute_entry = IngredientSubstitute.objects.get(ingredient=ingredient)
-        return Response({"ingredient": ingredient, "substitutes": substitute_entry.substitutes},
-                        status=status.HTTP_200_OK)
-    except IngredientSubstitute.DoesNotExist:
-        return Response({"ingredient": ingredient, "substitutes": ["No substitutes found."]},
-                        status=status.HTTP_404_NOT_FOUND)
+    index = substitute_index.get()
+    match = index.lookup(ingredient)
+    if match is None:
+        return Response({"ingredient": ingredient, "substitutes": ["No substitutes found."],
+                         "suggestions": index.suggest(ingredient)}, status=status.HTTP_404_NOT_FOUND)
+    matched, substitutes = match
+    return Response({"ingredient": ingredient, "matched": matched, "substitutes": substitutes},
+                    status=status.HTTP_200_OK)
 
 
 
@@ -77,8 +102,7 @@ def rate_recipe(request, id):
         recipe = Recipe.objects.get(id=id)
         new_rating = float(request.data.get('rating'))
         if 0 <= new_rating <= 5:
-            recipe.rating = new_rating
-            recipe.save()
+            rate(recipe, request.user, new_rating)
             return Response(RecipeSerializer(recipe).data, status=status.HTTP_200_OK)
         return Response({'detail': 'Rating must be between 0 and 5.'}, status=status.HTTP_400_BAD_REQUEST)
     except (Recipe.DoesNotExist, ValueError):
@@ -89,36 +113,38 @@ def rate_recipe(request, id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_popular_recipes(request):
-    recipes = Recipe.objects.annotate(favorites_count=Count('favorites')).order_by('-rating', '-favorites_count')[:10]
-    return Response(RecipeSerializer(recipes, many=True).data, status=status.HTTP_200_OK)
+    board = request.query_params.get('window', 'all-time')
+    if board not in BOARDS:
+        return Response({'detail': 'Invalid window.'}, status=status.HTTP_400_BAD_REQUEST)
+    build = lambda: Response(RecipeSerializer(popular_recipes(board), many=True).data, status=status.HTTP_200_OK)
+    timeout = getattr(settings, "POPULAR_RECIPES_MAX_STALENESS", 30)
+    return cached_response("popular-recipes", [response_cache.RECIPES], build, board, timeout=timeout)
 
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_to_favorites(request, id):
-    try:
-        recipe = Recipe.objects.get(id=id)
-        if recipe.favorites.filter(id=request.user.id).exists():
-            return Response({"detail": "Already in favorites."}, status=status.HTTP_400_BAD_REQUEST)
-        recipe.favorites.add(request.user)
+    if favorite(request.user, [id]):
         return Response({"detail": "Added to favorites."}, status=status.HTTP_200_OK)
-    except Recipe.DoesNotExist:
+    if not Recipe.objects.filter(id=id).exists():
         return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"detail": "Already in favorites."}, status=status.HTTP_400_BAD_REQUEST)
 
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_dietary_filters(request):
-    return Response(DietaryFilterSerializer(DietaryFilter.objects.all(), many=True).data, status=status.HTTP_200_OK)
+    build = lambda: Response(DietaryFilterSerializer(DietaryFilter.objects.all(), many=True).data, status=status.HTTP_200_OK)
+    return cached_response("dietary-filters", [response_cache.DIETARY_FILTERS], build)
 
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_today_meal_plan(request):
-    meal_plan = MealPlan.objects.filter(user=request.user, date=timezone.now().date()).first()
+    meal_plan = MealPlan.objects.filter(user=request.user, date=timezone.now().date()).with_recipes().first()
     if not meal_plan:
         return Response({'detail': 'No meal plan found for today.'}, status=status.HTTP_404_NOT_FOUND)
     return Response(MealPlanSerializer(meal_plan).data, status=status.HTTP_200_OK)
@@ -129,8 +155,8 @@ def get_weekly_meal_plan(user):
     start_date = timezone.now().date()
     end_date = start_date + timedelta(days=6)
 
-    meal_plans = MealPlan.objects.filter(user=user, date__range=[start_date, end_date])
-    if not meal_plans.exists():
+    meal_plans = list(MealPlan.objects.filter(user=user, date__range=[start_date, end_date]).with_recipes())
+    if not meal_plans:
         return None, {"error": "No meal plans found for this week."}
 
     return MealPlanSerializer(meal_plans, many=True).data, None
@@ -142,26 +168,22 @@ class RecipeRecommendationsView(APIView):
     def get(self, request, id):
         try:
             base_recipe = Recipe.objects.get(id=id)
-            other_recipes = Recipe.objects.exclude(id=id)
-            recommended_recipes = random.sample(list(other_recipes), min(3, other_recipes.count()))
+            recommended_ids = [recipe_id for recipe_id, _ in recommend(base_recipe)]
+            recipes_by_id = Recipe.objects.in_bulk(recommended_ids)
+            recommended_recipes = [recipes_by_id[pk] for pk in recommended_ids if pk in recipes_by_id]
             return Response(RecipeSerializer(recommended_recipes, many=True).data, status=status.HTTP_200_OK)
         except Recipe.DoesNotExist:
             return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
 
 def get_random_recipe():
     """Fetches a random recipe from the database."""
-    return Recipe.objects.order_by('?').first()
+    return pick_random_recipe()
 
 
 def search_recipes_by_ingredients(ingredients):
     """Finds recipes that contain all the given ingredients."""
     ingredient_list = [ingredient.strip().lower() for ingredient in ingredients.split(',')]
-
-    query = Q()
-    for ingredient in ingredient_list:
-        query &= Q(ingredients__icontains=ingredient)
-
-    return Recipe.objects.filter(query).distinct()
+    return Recipe.objects.filter(id__in=search_recipe_ids(ingredient_list))
 
 
 def update_preferences(user, data):
@@ -171,40 +193,40 @@ def update_preferences(user, data):
     preferences.save()
 
     return UserPreferencesSerializer(preferences).data
-def suggest_recipes(leftovers):
-    """Suggests recipes based on provided leftover ingredients."""
+def suggest_recipes(leftovers, limit=20, min_coverage=0.0):
+    """Suggests recipes ranked by how much of each recipe the leftover ingredients cover."""
     if not leftovers:
         return {"detail": "No leftover ingredients provided."}, 400
 
     leftovers = [ingredient.lower().strip() for ingredient in leftovers]
 
-    # Find recipes that contain at least one of the ingredients
-    suggested_recipes = Recipe.objects.filter(ingredients__icontains=leftovers[0]).distinct()
-
-    # Refine the search for multiple ingredients
-    for ingredient in leftovers[1:]:
-        suggested_recipes = suggested_recipes.filter(ingredients__icontains=ingredient)
-
-    if not suggested_recipes.exists():
+    matches, _ = rank_recipes(leftovers, limit, min_coverage)
+    if not matches:
         return {"detail": "No recipes found using the provided ingredients."}, 404
 
-    return RecipeSerializer(suggested_recipes, many=True).data, 200
+    recipes = Recipe.objects.in_bulk([recipe_id for recipe_id, _, _ in matches])
+    suggestions = []
+    for recipe_id, coverage, missing in matches:
+        if recipe_id in recipes:
+            suggestions.append({**RecipeSerializer(recipes[recipe_id]).data, "coverage": round(coverage, 3),
+                                "missing_count": len(missing), "missing_ingredients": missing})
+    return suggestions, 200
 def get_user_meal_history(user):
     """Retrieves the user's meal history and recommends new recipes."""
-    meal_plans = MealPlan.objects.filter(user=user).order_by('-date')
+    meal_plans = list(MealPlan.objects.filter(user=user).order_by('-date').with_recipes())
 
-    if not meal_plans.exists():
+    if not meal_plans:
         return {"detail": "No meal history found."}, 404
 
     meal_plan_data = MealPlanSerializer(meal_plans, many=True).data
 
     # Get recipe IDs from the user's meal history
-    recipe_ids = meal_plans.values_list('recipes', flat=True)
+    recipe_ids = MealPlan.objects.filter(user=user).values_list('recipes', flat=True)
 
     # Recommend recipes NOT already in the user's history
-    recommended_recipes = Recipe.objects.exclude(id__in=recipe_ids).annotate(
-        rating_count=Count('rating')
-    ).order_by('-rating', '-rating_count')[:5]
+    recommended_recipes = Recipe.objects.with_favorites().exclude(id__in=recipe_ids).order_by(
+        '-rating_score', '-rating_count'
+    )[:5]
 
     recommended_data = RecipeSerializer(recommended_recipes, many=True).data
 
@@ -215,11 +237,11 @@ def get_recipe_nutritional_summary(recipe_id):
         recipe = Recipe.objects.get(pk=recipe_id)
         nutrition = recipe.nutrition
         summary = {
-            "calories": nutrition.get("calories", "N/A"),
-            "protein": nutrition.get("protein", "N/A"),
-            "carbohydrates": nutrition.get("carbohydrates", "N/A"),
-            "fat": nutrition.get("fat", "N/A"),
-            "fiber": nutrition.get("fiber", "N/A")
+            "calories": raw_value(nutrition, "calories", "N/A"),
+            "protein": raw_value(nutrition, "protein", "N/A"),
+            "carbohydrates": raw_value(nutrition, "carbs", "N/A"),
+            "fat": raw_value(nutrition, "fat", "N/A"),
+            "fiber": raw_value(nutrition, "fiber", "N/A")
         }
         return {"recipe": recipe.title, "nutritional_summary": summary}, 200
 
@@ -0,0 +1,111 @@
+"""Quantity-aware shopping lists rolled up from a user's meal plans, cached per user and week."""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import response_cache
+from .ingredients import to_base_unit
+from .models import MealPlan
+
+# Longest range one shopping list may cover.
+MAX_RANGE_DAYS = 366
+# Larger units a total is shown in once it reaches them, e.g. 1500 ml as 1.5 l.
+DISPLAY_UNITS = {"ml": ("l", 1000.0), "g": ("kg", 1000.0)}
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _weeks(start, end):
+    week = week_start(start)
+    while week <= end:
+        yield week
+        week += timedelta(days=7)
+
+
+def _rollups(user, first_week, last_week):
+    """
+    Returns ``{week: rollup}`` for every week from ``first_week`` to ``last_week`` in one query.
+
+    A rollup holds the dates that have a plan and ``{(date, name, unit): quantity}``
+    summed in base units. Lines without a quantity are kept with a ``None`` unit and
+    quantity, so an ingredient listed only "to taste" still shows up.
+    """
+    rollups = {week: {"dates": set(), "items": defaultdict(float)} for week in _weeks(first_week, last_week)}
+    rows = MealPlan.objects.filter(user=user, date__range=[first_week, last_week + timedelta(days=6)]).order_by().values_list(
+        "date",
+        "recipes__recipe_ingredients__ingredient__name",
+        "recipes__recipe_ingredients__quantity",
+        "recipes__recipe_ingredients__unit",
+    )
+    for day, name, quantity, unit in rows:
+        rollup = rollups[week_start(day)]
+        rollup["dates"].add(day)
+        if name is None:
+            # A plan without recipes, or a recipe without parsed lines.
+            continue
+        if quantity is None:
+            rollup["items"][day, name, None] = 0.0
+        else:
+            quantity, unit = to_base_unit(quantity, unit)
+            rollup["items"][day, name, unit] += quantity
+    return {week: {"dates": rollup["dates"], "items": dict(rollup["items"])} for week, rollup in rollups.items()}
+
+
+def _cached_rollups(user, start, end):
+    """Returns the rollup of every week touching ``start``..``end``, querying only for the weeks not cached."""
+    prefix = response_cache.versioned_key(
+        "shopping-list", [response_cache.RECIPE_INGREDIENTS, response_cache.meal_plans_scope(user.pk)], user.pk
+    )
+    keys = {week: f"{prefix}:{week.isoformat()}" for week in _weeks(start, end)}
+    cached = cache.get_many(keys.values())
+    rollups = {week: cached[key] for week, key in keys.items() if key in cached}
+    missing = [week for week in keys if week not in rollups]
+    if missing:
+        fresh = _rollups(user, missing[0], missing[-1])
+        timeout = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+        cache.set_many({keys[week]: fresh[week] for week in missing}, timeout)
+        rollups.update((week, fresh[week]) for week in missing)
+    return rollups
+
+
+def _display(quantity, unit):
+    larger, factor = DISPLAY_UNITS.get(unit, (unit, None))
+    if factor and quantity >= factor:
+        quantity, unit = quantity / factor, larger
+    return round(quantity, 2), unit
+
+
+def shopping_list(user, start, end):
+    """
+    Returns the shopping list for the user's meal plans from ``start`` to ``end``, or ``None`` without plans.
+
+    Each line is ``{"ingredient", "quantity", "unit"}`` with quantities summed across
+    recipes and converted onto ml or g where the unit allows; an ingredient that never
+    comes with a quantity gets a single line with a ``None`` quantity.
+    """
+    planned = False
+    totals = defaultdict(float)
+    unquantified = set()
+    for rollup in _cached_rollups(user, start, end).values():
+        planned = planned or any(start <= day <= end for day in rollup["dates"])
+        for (day, name, unit), quantity in rollup["items"].items():
+            if not start <= day <= end:
+                continue
+            if unit is None:
+                unquantified.add(name)
+            else:
+                totals[name, unit] += quantity
+    if not planned:
+        return None
+
+    lines = []
+    for (name, unit), quantity in totals.items():
+        quantity, unit = _display(quantity, unit)
+        lines.append({"ingredient": name, "quantity": quantity, "unit": unit})
+    quantified = {name for name, _ in totals}
+    lines.extend({"ingredient": name, "quantity": None, "unit": ""} for name in unquantified - quantified)
+    return sorted(lines, key=lambda line: (line["ingredient"], line["unit"]))
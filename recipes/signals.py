@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .dietary import sync_dietary_filters
+from .indexing import index_recipes
+from .leftovers import leftover_index
+from .leaderboard import add_favorites, remove_favorites
+from . import response_cache
+from .models import (
+    DietaryFilter, IngredientSubstitute, MealPlan, Recipe, RecipeFavorite, RecipeIngredient, RecipeReview,
+)
+from .ratings import apply_review_delta
+from .optimizer import nutrition_matrix
+from .recommendations import recommendation_index
+from .sampling import recipe_sampler
+from .substitutes import substitute_index
+
+
+def _may_change(update_fields, *fields):
+    """Whether a save limited to ``update_fields`` (``None`` for a full save) can touch ``fields``."""
+    return update_fields is None or not update_fields.isdisjoint(fields)
+
+
+@receiver(post_save, sender=Recipe)
+def reindex_recipe(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keeps the ingredient index in step with saved ingredients; deletes cascade on their own."""
+    if raw or not _may_change(update_fields, "ingredients"):
+        return
+    ingredients = index_recipes([instance]).get(instance.pk, {})
+    response_cache.invalidate(response_cache.RECIPE_INGREDIENTS)
+    transaction.on_commit(lambda: leftover_index.update(lambda index: index.put(instance.pk, ingredients)))
+    transaction.on_commit(lambda: recommendation_index.update(lambda index: index.put(instance, list(ingredients))))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Drops the recipe's cached payloads on every save, and refreshes the snapshots built
+    from its tags and nutrition when those may have changed.
+    """
+    if raw:
+        return
+    response_cache.invalidate_recipes([instance.pk])
+    if not _may_change(update_fields, "dietary_tags", *Recipe.NUTRITION_FIELDS):
+        return
+    transaction.on_commit(lambda: recipe_sampler.update(lambda sampler: sampler.put(instance.pk, instance.dietary_tags)))
+    nutrition = [getattr(instance, field) for field in Recipe.NUTRITION_FIELDS]
+    transaction.on_commit(lambda: nutrition_matrix.update(lambda matrix: matrix.put(instance.pk, instance.dietary_tags, nutrition)))
+    if not _may_change(update_fields, "ingredients"):
+        # The recommendation row also encodes tags and nutrition; reindex_recipe refreshes it otherwise.
+        ingredient_ids = list(RecipeIngredient.objects.filter(recipe_id=instance.pk).values_list("ingredient_id", flat=True))
+        transaction.on_commit(lambda: recommendation_index.update(lambda index: index.put(instance, ingredient_ids)))
+
+
+@receiver(post_save, sender=Recipe)
+def index_dietary_tags(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mirrors ``dietary_tags`` into ``dietary_filters``; saves limited to other fields leave it alone."""
+    if raw or not _may_change(update_fields, "dietary_tags"):
+        return
+    sync_dietary_filters([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    response_cache.invalidate_recipes([recipe_id])
+    response_cache.invalidate(response_cache.RECIPE_INGREDIENTS)
+    transaction.on_commit(lambda: leftover_index.update(lambda index: index.remove(recipe_id)))
+    transaction.on_commit(lambda: recommendation_index.update(lambda index: index.remove(recipe_id)))
+    transaction.on_commit(lambda: recipe_sampler.update(lambda sampler: sampler.remove(recipe_id)))
+    transaction.on_commit(lambda: nutrition_matrix.update(lambda matrix: matrix.remove(recipe_id)))
+
+
+@receiver(pre_save, sender=RecipeReview)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    """Stashes the stored (recipe, rating) of an edited review so post_save can apply the difference."""
+    if raw or instance.pk is None:
+        return
+    instance._stored_rating = RecipeReview.objects.filter(pk=instance.pk).values_list("recipe_id", "rating").first()
+
+
+@receiver(post_save, sender=RecipeReview)
+def count_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stored = instance.__dict__.pop("_stored_rating", None)
+    if created:
+        apply_review_delta(instance.recipe_id, instance.rating, 1)
+        return
+    if stored is None:
+        return
+    recipe_id, rating = stored
+    if recipe_id == instance.recipe_id:
+        if rating != instance.rating:
+            apply_review_delta(recipe_id, instance.rating - rating, 0)
+    else:
+        apply_review_delta(recipe_id, -rating, -1)
+        apply_review_delta(instance.recipe_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=RecipeReview)
+def uncount_review(sender, instance, **kwargs):
+    apply_review_delta(instance.recipe_id, -instance.rating, -1)
+
+
+@receiver(m2m_changed, sender=RecipeFavorite)
+def count_added_favorites(sender, instance, action, reverse, pk_set, **kwargs):
+    """``favorites.add()`` bulk-creates its links, so it is the one path that sends no post_save."""
+    if action != "post_add" or not pk_set:
+        return
+    links = RecipeFavorite.objects.filter(**{"user" if reverse else "recipe": instance})
+    links = links.filter(**{"recipe_id__in" if reverse else "user_id__in": pk_set})
+    add_favorites(links.values_list("recipe_id", "created_at"))
+
+
+@receiver(post_save, sender=RecipeFavorite)
+def count_favorite(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_favorites([(instance.recipe_id, instance.created_at)])
+
+
+@receiver(post_delete, sender=RecipeFavorite)
+def uncount_favorite(sender, instance, **kwargs):
+    """Covers ``remove()``, ``clear()`` and cascades from deleted users alike."""
+    remove_favorites([(instance.recipe_id, instance.created_at)])
+
+
+@receiver(post_save, sender=DietaryFilter)
+@receiver(post_delete, sender=DietaryFilter)
+def invalidate_dietary_filters(sender, **kwargs):
+    response_cache.invalidate(response_cache.DIETARY_FILTERS)
+
+
+@receiver(post_save, sender=IngredientSubstitute)
+def index_substitute(sender, instance, created, raw=False, **kwargs):
+    """New rows are added in place; an edit may have renamed the ingredient, so the index is rebuilt."""
+    response_cache.invalidate(response_cache.SUBSTITUTES)
+    if raw or not created:
+        transaction.on_commit(substitute_index.invalidate)
+        return
+    ingredient, substitutes = instance.ingredient, instance.substitutes
+    transaction.on_commit(lambda: substitute_index.update(lambda index: index.put(ingredient, substitutes)))
+
+
+@receiver(post_delete, sender=IngredientSubstitute)
+def unindex_substitute(sender, instance, **kwargs):
+    response_cache.invalidate(response_cache.SUBSTITUTES)
+    ingredient = instance.ingredient
+    transaction.on_commit(lambda: substitute_index.update(lambda index: index.remove(ingredient)))
+
+
+@receiver(m2m_changed, sender=MealPlan.recipes.through)
+def touch_meal_plans(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Bumps ``MealPlan.updated_at`` when a plan's recipes change, since the plan row itself
+    is not saved, and drops the owners' cached shopping lists.
+    """
+    if action in ("post_add", "post_remove"):
+        plans = MealPlan.objects.filter(pk__in=pk_set) if reverse else MealPlan.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        plans = MealPlan.objects.filter(recipes=instance) if reverse else MealPlan.objects.filter(pk=instance.pk)
+    else:
+        return
+    plans.update(updated_at=timezone.now())
+    user_ids = set(plans.values_list("user_id", flat=True)) if reverse else {instance.user_id}
+    response_cache.invalidate(*(response_cache.meal_plans_scope(user_id) for user_id in user_ids))
+
+
+@receiver(post_save, sender=MealPlan)
+@receiver(post_delete, sender=MealPlan)
+def invalidate_meal_plans(sender, instance, **kwargs):
+    response_cache.invalidate(response_cache.meal_plans_scope(instance.user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    """Drops the cached JWT user, so deactivations and password changes apply on the next request."""
+    response_cache.invalidate(response_cache.user_scope(instance.pk))
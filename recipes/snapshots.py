@@ -0,0 +1,90 @@
+"""Process-local snapshots of derived data, invalidated through generations kept in Django's cache."""
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class Snapshot:
+    """
+    Lazily builds a derived in-memory structure and serves it until it is invalidated.
+
+    A generation counter stored in Django's cache is read on every ``get()``; bumping it
+    makes every process that reads the same counter rebuild on its next read. The process
+    that made the change can apply it incrementally with ``update()`` instead of rebuilding.
+
+    Processes only see each other's bumps when they share the cache backend. The
+    local-memory cache is per process, so under it a snapshot is only coherent within a
+    single process; the production settings configure a shared backend for that reason.
+
+    With ``max_age`` set, a copy checked less than ``max_age`` seconds ago is served
+    without reading the counter, so changes from other processes may take that long to
+    show up.
+    """
+
+    def __init__(self, name, builder, max_age=None):
+        self.name = name
+        self.builder = builder
+        self.max_age = max_age
+        self._key = f"recipes:snapshot:{name}"
+        self._lock = threading.RLock()
+        self._value = None
+        self._generation = None
+        self._checked_at = None
+
+    def _current_generation(self):
+        generation = cache.get(self._key)
+        if generation is None:
+            # Seeded from the clock so a cleared or evicted counter never restarts at a
+            # value some process still holds a stale copy for.
+            cache.add(self._key, time.time_ns(), timeout=None)
+            generation = cache.get(self._key)
+        return generation
+
+    def _bump(self):
+        try:
+            return cache.incr(self._key)
+        except ValueError:
+            cache.add(self._key, time.time_ns(), timeout=None)
+            return cache.incr(self._key)
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def get(self):
+        value, checked_at = self._value, self._checked_at
+        if self.max_age and value is not None and checked_at is not None and time.monotonic() - checked_at < self.max_age:
+            return value
+        generation = self._current_generation()
+        if self._value is None or generation != self._generation:
+            with self._lock:
+                if self._value is None or generation != self._generation:
+                    self._value = self.builder()
+                    self._generation = generation
+        self._checked_at = time.monotonic()
+        return self._value
+
+    def invalidate(self):
+        """Drops this process's copy and tells every other process to rebuild."""
+        with self._lock:
+            self._bump()
+            self._value = None
+            self._generation = None
+
+    def update(self, apply):
+        """
+        Applies ``apply(value)`` to the loaded copy and publishes a new generation.
+
+        If another process published a change since this copy was built, the copy is
+        dropped instead and rebuilt on the next read.
+        """
+        with self._lock:
+            built_at = self._generation
+            generation = self._bump()
+            if self._value is not None and built_at is not None and generation == built_at + 1:
+                apply(self._value)
+                self._generation = generation
+            else:
+                self._value = None
+                self._generation = None
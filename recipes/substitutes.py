@@ -0,0 +1,269 @@
+"""In-memory lookup of ingredient substitutes by normalized name, prefix and near-miss spelling."""
+from itertools import combinations
+
+from .ingredients import normalize_name, tokenize
+from .models import IngredientSubstitute
+from .snapshots import Snapshot
+
+# Marks the trie node where a complete key ends; every other child key is a single character.
+_END = ""
+# Suggestions returned for a name that matches nothing.
+MAX_SUGGESTIONS = 5
+# Ingredients resolved by one batch request.
+MAX_BATCH_SIZE = 200
+# Largest edit distance ever searched, and how much of each key the deletion index covers.
+MAX_EDITS = 2
+PREFIX_LENGTH = 7
+
+
+def max_edits(key):
+    """
+    Edit distance tolerated for a misspelt ``key``: names under five characters must
+    match exactly, since one edit turns "beet" into "beef"; longer ones allow one typo,
+    and two from eight characters on.
+    """
+    return 0 if len(key) < 5 else 1 if len(key) < 8 else MAX_EDITS
+
+
+def _deletions(word, count):
+    """Returns every string obtained by deleting up to ``count`` characters from ``word``."""
+    return {
+        "".join(char for position, char in enumerate(word) if position not in removed)
+        for size in range(min(count, len(word)) + 1)
+        for removed in map(set, combinations(range(len(word)), size))
+    }
+
+
+def edit_distance(a, b, bound):
+    """Levenshtein distance of ``a`` and ``b``, or ``bound + 1`` as soon as it must exceed ``bound``."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for row, char in enumerate(a, start=1):
+        current = [row]
+        for column in range(1, len(b) + 1):
+            current.append(min(
+                current[column - 1] + 1,
+                previous[column] + 1,
+                previous[column - 1] + (char != b[column - 1]),
+            ))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+def _with_leaf(key, nodes, leaf):
+    """
+    Returns a new trie root in which the path to ``key`` ends at ``leaf``.
+
+    ``nodes`` are the current nodes from the root down to ``key``. Only they are copied,
+    every other branch is shared, and nodes the change leaves empty are dropped.
+    """
+    child = leaf
+    for depth in range(len(key), 0, -1):
+        node = dict(nodes[depth - 1])
+        if child:
+            node[key[depth - 1]] = child
+        else:
+            node.pop(key[depth - 1], None)
+        child = node
+    return child
+
+# Words that rule a substitute out under a dietary tag, each paired with qualifiers that
+# lift the rule, so "almond milk" stays vegan while "almond flour" is still not nut-free.
+_PLANT_BASED = frozenset({"almond", "soy", "oat", "coconut", "rice", "cashew", "hemp", "plant", "vegan"})
+_GLUTEN_FREE = frozenset({"almond", "rice", "coconut", "corn", "chickpea", "buckwheat", "tapioca", "potato", "gluten"})
+_MEAT = (frozenset({
+    "beef", "pork", "chicken", "turkey", "bacon", "ham", "lamb", "veal", "sausage", "prosciutto", "gelatin", "lard",
+}), frozenset())
+_SEAFOOD = (frozenset({
+    "fish", "salmon", "tuna", "anchovy", "shrimp", "prawn", "crab", "lobster", "oyster", "clam", "mussel",
+}), frozenset())
+_DAIRY = (frozenset({
+    "milk", "buttermilk", "butter", "ghee", "cream", "cheese", "parmesan", "mozzarella", "cheddar", "ricotta",
+    "yogurt", "whey",
+}), _PLANT_BASED)
+_EGGS = (frozenset({"egg", "mayonnaise"}), _PLANT_BASED)
+_GLUTEN = (frozenset({
+    "wheat", "flour", "bread", "breadcrumb", "pasta", "noodle", "barley", "rye", "couscous", "semolina", "seitan",
+}), _GLUTEN_FREE)
+_NUTS = (frozenset({
+    "almond", "walnut", "pecan", "cashew", "hazelnut", "pistachio", "peanut", "macadamia",
+}), frozenset())
+DIET_EXCLUSIONS = {
+    "vegan": (_MEAT, _SEAFOOD, _DAIRY, _EGGS, (frozenset({"honey"}), frozenset())),
+    "vegetarian": (_MEAT, _SEAFOOD),
+    "pescatarian": (_MEAT,),
+    "dairy-free": (_DAIRY,),
+    "egg-free": (_EGGS,),
+    "gluten-free": (_GLUTEN,),
+    "nut-free": (_NUTS,),
+}
+
+
+def diet_tags(preferences):
+    """Returns the dietary tags of a ``UserPreferences.dietary_preferences`` value, lowercased and hyphenated."""
+    tags = preferences.get("tags", []) if isinstance(preferences, dict) else []
+    if not isinstance(tags, list):
+        return []
+    return [str(tag).strip().lower().replace("_", "-").replace(" ", "-") for tag in tags]
+
+
+def violated_diet(substitute, tags):
+    """Returns the first tag in ``tags`` that rules ``substitute`` out, or ``None``; unknown tags rule nothing out."""
+    tokens = tokenize(str(substitute))
+    for tag in tags:
+        for words, unless in DIET_EXCLUSIONS.get(tag, ()):
+            if tokens & words and not tokens & unless:
+                return tag
+    return None
+
+
+class SubstituteIndex:
+    """
+    Substitutes keyed by ``normalize_name`` of the ingredient, so "Eggs", "egg" and
+    "large eggs" share one entry.
+
+    A character trie over the keys serves prefix completion. Misspellings are found
+    through a deletion index: every string reachable by deleting up to ``MAX_EDITS``
+    characters from the first ``PREFIX_LENGTH`` of a key points back at it, so any key
+    within the edit bound of a query shares a deletion with it. A lookup then verifies a
+    handful of candidates instead of scanning the table.
+
+    Lookups run without a lock while ``put`` and ``remove`` apply changes, so nothing a
+    reader can reach is mutated: row dicts and deletion sets are replaced, and the trie
+    nodes along a changed key are copied up to a new root that is then swapped in.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.trie = {}
+        self.deletions = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for ingredient, substitutes in IngredientSubstitute.objects.values_list("ingredient", "substitutes"):
+            index.put(ingredient, substitutes)
+        return index
+
+    def put(self, ingredient, substitutes):
+        key = normalize_name(ingredient)
+        # Rows whose names normalize alike ("egg", "Eggs") are kept side by side.
+        rows = self.entries.get(key, {})
+        self.entries[key] = {**rows, ingredient: substitutes if isinstance(substitutes, list) else []}
+        if rows:
+            return
+        for variant in _deletions(key[:PREFIX_LENGTH], MAX_EDITS):
+            self.deletions[variant] = self.deletions.get(variant, frozenset()) | {key}
+        nodes = [self.trie]
+        for char in key:
+            nodes.append(nodes[-1].get(char, {}))
+        self.trie = _with_leaf(key, nodes, {**nodes[-1], _END: key})
+
+    def remove(self, ingredient):
+        key = normalize_name(ingredient)
+        rows = self.entries.get(key)
+        if rows is None or ingredient not in rows:
+            return
+        if len(rows) > 1:
+            self.entries[key] = {name: values for name, values in rows.items() if name != ingredient}
+            return
+        del self.entries[key]
+        for variant in _deletions(key[:PREFIX_LENGTH], MAX_EDITS):
+            keys = self.deletions.get(variant, frozenset()) - {key}
+            if keys:
+                self.deletions[variant] = keys
+            else:
+                self.deletions.pop(variant, None)
+        nodes = [self.trie]
+        for char in key:
+            nodes.append(nodes[-1][char])
+        self.trie = _with_leaf(key, nodes, {char: child for char, child in nodes[-1].items() if char != _END})
+
+    def _match(self, key):
+        """Returns ``(ingredient, substitutes)`` for a key, merging rows that share it, or ``None`` once it is gone."""
+        rows = self.entries.get(key)
+        if rows is None:
+            return None
+        substitutes = []
+        for values in rows.values():
+            substitutes.extend(value for value in values if value not in substitutes)
+        return next(iter(rows)), substitutes
+
+    def near(self, key, max_distance):
+        """Returns ``[(distance, key)]`` for stored keys within ``max_distance`` edits of ``key``, closest first."""
+        candidates = set()
+        for variant in _deletions(key[:PREFIX_LENGTH], min(max_distance, MAX_EDITS)):
+            candidates |= self.deletions.get(variant, frozenset())
+        matches = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return sorted(matches, key=lambda match: (match[0], len(match[1]), match[1]))
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        """Returns up to ``limit`` stored keys starting with ``prefix``, shortest first."""
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        keys = []
+        level = [node]
+        while level and len(keys) < limit:
+            keys.extend(sorted(child[_END] for child in level if _END in child))
+            level = [child for node in level for char, child in sorted(node.items()) if char != _END]
+        return keys[:limit]
+
+    def lookup(self, text):
+        """
+        Returns ``(ingredient, substitutes)`` for ``text``, or ``None``.
+
+        The normalized name is tried first, then the closest stored name within the
+        edit budget of ``max_edits``.
+        """
+        key = normalize_name(text)
+        match = self._match(key)
+        if match is not None:
+            return match
+        # A candidate may be removed between ``near`` and ``_match``; the next one is tried.
+        for _, candidate in self.near(key, max_edits(key)):
+            match = self._match(candidate)
+            if match is not None:
+                return match
+        return None
+
+    def suggest(self, text):
+        return self.complete(normalize_name(text))
+
+    def resolve(self, names, tags=()):
+        """
+        Returns ``{name: result}`` for every name, keyed by the text as given.
+
+        A match holds the stored ingredient and the substitutes allowed under ``tags``,
+        with the ones a tag rules out listed under "excluded"; a miss holds suggestions.
+        """
+        results = {}
+        for name in names:
+            if name in results:
+                continue
+            match = self.lookup(name)
+            if match is None:
+                results[name] = {"matched": None, "substitutes": [], "suggestions": self.suggest(name)}
+                continue
+            matched, substitutes = match
+            allowed, excluded = [], []
+            for substitute in substitutes:
+                tag = violated_diet(substitute, tags)
+                if tag is None:
+                    allowed.append(substitute)
+                else:
+                    excluded.append({"substitute": substitute, "diet": tag})
+            results[name] = {"matched": matched, "substitutes": allowed, "excluded": excluded}
+        return results
+
+
+substitute_index = Snapshot("substitutes", SubstituteIndex.build)
@@ -1,3 +1,1159 @@
-from django.test import TestCase
+import itertools
+import json
+import math
+import tempfile
+from datetime import date, datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import indexing, leftovers, response_cache
+from .authentication import user_cache_key
+from .ingredients import tokenize
+from .models import (
+    IngredientSubstitute, MealPlan, Recipe, RecipeFavorite, RecipeIngredientToken, RecipeReview, UserPreferences,
+)
+from .leaderboard import TRENDING_EPOCH, favorite_log_weight, leaderboard
+from .export import EXPORT_FIELDS
+from .leftovers import LeftoverIndex
+from .nutrition import normalize_nutrition
+from .ratings import aggregates, review_totals
+from .sampling import IdPool, RecipeSampler, recipe_sampler
+from .optimizer import NutritionMatrix, nutrition_matrix
+from .planning import create_meal_plans
+from .recommendations import RecommendationIndex, recommend, recommendation_index
+from .services import get_weekly_meal_plan
+from .substitutes import SubstituteIndex, substitute_index
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base class for asserting that an endpoint issues a bounded number of queries.
+
+    ``assertQueryBudget`` grows the fixture through each size in ``sizes`` and checks the
+    query count at every step, so an N+1 regression fails as soon as rows multiply.
+    """
+
+    sizes = (1, 100, 10_000)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="planner", password="secret")
+        self.client.force_authenticate(self.user)
+
+    def assertQueryBudget(self, budget, call, populate, sizes=None):
+        for size in sizes or self.sizes:
+            populate(size)
+            with self.subTest(rows=size), CaptureQueriesContext(connection) as queries:
+                response = call()
+                status_code = getattr(response, "status_code", 200)
+                self.assertLess(status_code, 400)
+                self.assertLessEqual(
+                    len(queries),
+                    budget,
+                    f"{len(queries)} queries for {size} rows:\n" + "\n".join(q["sql"] for q in queries),
+                )
+
+    def create_recipes(self, count):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(title=f"Recipe {index}", ingredients="flour, eggs", instructions="Mix.")
+            for index in range(count)
+        )
+        through = Recipe.favorites.through
+        through.objects.bulk_create(through(recipe_id=recipe.pk, user_id=self.user.pk) for recipe in recipes)
+        return recipes
+
+    def add_recipes_to_plan(self, meal_plan, count):
+        """Tops ``meal_plan`` up to ``count`` recipes."""
+        missing = count - meal_plan.recipes.count()
+        if missing > 0:
+            meal_plan.recipes.add(*self.create_recipes(missing))
+
+
+class MealPlanQueryBudgetTests(QueryBudgetTestCase):
+    def test_today_meal_plan(self):
+        meal_plan = MealPlan.objects.create(user=self.user, date=timezone.now().date())
+        self.assertQueryBudget(
+            3,
+            lambda: self.client.get(reverse("today-meal-plan")),
+            lambda size: self.add_recipes_to_plan(meal_plan, size),
+        )
+
+    def test_week_meal_plan(self):
+        today = timezone.now().date()
+        meal_plans = [MealPlan.objects.create(user=self.user, date=today + timedelta(days=day)) for day in range(7)]
+
+        def populate(size):
+            for index, meal_plan in enumerate(meal_plans):
+                self.add_recipes_to_plan(meal_plan, max(1, size // 7 + (index < size % 7)))
+
+        self.assertQueryBudget(3, lambda: self.client.get(reverse("week-meal-plan")), populate)
+
+    def test_weekly_meal_plan_service(self):
+        meal_plan = MealPlan.objects.create(user=self.user, date=timezone.now().date())
+        self.assertQueryBudget(
+            3,
+            lambda: get_weekly_meal_plan(self.user),
+            lambda size: self.add_recipes_to_plan(meal_plan, size),
+        )
+
+    def test_meal_history(self):
+        recipes = self.create_recipes(100)
+        through = MealPlan.recipes.through
+        today = timezone.now().date()
+
+        def populate(size):
+            existing = MealPlan.objects.filter(user=self.user).count()
+            meal_plans = MealPlan.objects.bulk_create(
+                MealPlan(user=self.user, date=today - timedelta(days=offset)) for offset in range(existing, size)
+            )
+            through.objects.bulk_create(
+                through(mealplan_id=meal_plan.pk, recipe_id=recipes[index % len(recipes)].pk)
+                for index, meal_plan in enumerate(meal_plans)
+            )
+
+        self.assertQueryBudget(5, lambda: self.client.get(reverse("get-meal-history")), populate)
+
+
+class FavoritesQueryBudgetTests(QueryBudgetTestCase):
+    def test_my_favorites(self):
+        def populate(size):
+            self.create_recipes(size - Recipe.objects.count())
+
+        self.assertQueryBudget(
+            2, lambda: self.client.get(reverse("my-favorites"), {"page_size": 200}), populate
+        )
+
+
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="critic", password="secret")
+        self.recipe = Recipe.objects.create(title="Stew", ingredients="beef, carrots", instructions="Simmer.")
+
+    def assertAggregatesMatchReviews(self):
+        self.recipe.refresh_from_db()
+        expected = aggregates(*review_totals().get(self.recipe.pk, (0.0, 0)))
+        for field, value in expected.items():
+            self.assertAlmostEqual(getattr(self.recipe, field), value, msg=field)
+
+    def test_review_create_update_delete(self):
+        other = User.objects.create_user(username="guest", password="secret")
+        review = RecipeReview.objects.create(user=self.user, recipe=self.recipe, rating=5, review_text="Great")
+        RecipeReview.objects.create(user=other, recipe=self.recipe, rating=2, review_text="Bland")
+        self.assertAggregatesMatchReviews()
+        self.assertEqual(self.recipe.rating_count, 2)
+        self.assertEqual(self.recipe.rating, 3.5)
+
+        review.rating = 4
+        review.save()
+        self.assertAggregatesMatchReviews()
+
+        review.delete()
+        self.assertAggregatesMatchReviews()
+        self.assertEqual(self.recipe.rating_count, 1)
+
+    def test_rate_recipe_replaces_the_users_rating(self):
+        self.client.force_authenticate(self.user)
+        for rating in (1, 4):
+            response = self.client.post(reverse("rate-recipe", args=[self.recipe.pk]), {"rating": rating})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rating_count"], 1)
+        self.assertEqual(response.data["rating"], 4.0)
+        self.assertAggregatesMatchReviews()
+
+    def test_every_posted_review_counts(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("recipe-reviews", args=[self.recipe.pk])
+        for rating, text in ((2, "Thin"), (4, "Better the next day")):
+            response = self.client.post(url, {"rating": rating, "review_text": text}, format="json")
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(RecipeReview.objects.filter(recipe=self.recipe, user=self.user).count(), 2)
+        self.assertAggregatesMatchReviews()
+        self.assertEqual((self.recipe.rating_count, self.recipe.rating_avg), (2, 3.0))
+
+
+class FavoriteCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        leaderboard.invalidate()
+        self.users = [User.objects.create_user(username=f"fan{index}", password="secret") for index in range(3)]
+        self.recipes = [
+            Recipe.objects.create(title=f"Dish {index}", ingredients="rice", instructions="Boil.") for index in range(3)
+        ]
+        self.client.force_authenticate(self.users[0])
+
+    def counts(self):
+        return [recipe.favorites_count for recipe in Recipe.objects.order_by("id")]
+
+    def test_counters_follow_add_and_remove(self):
+        first, second, third = self.recipes
+        third.favorites.add(*self.users)
+        self.users[1].favorite_recipes.add(first, second)
+        self.assertEqual(self.counts(), [1, 1, 3])
+
+        third.favorites.remove(self.users[0])
+        self.users[1].favorite_recipes.clear()
+        self.assertEqual(self.counts(), [0, 0, 1])
+        self.users[2].delete()
+        self.assertEqual(self.counts(), [0, 0, 0])
+
+    def test_popular_recipes_serve_the_leaderboard(self):
+        first, second, third = self.recipes
+        self.client.get(reverse("get-popular-recipes"))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.favorites.add(*self.users[:2])
+            third.favorites.add(self.users[0])
+        for window in ("all-time", "trending"):
+            response = self.client.get(reverse("get-popular-recipes"), {"window": window})
+            self.assertEqual([recipe["id"] for recipe in response.data], [second.pk, third.pk, first.pk])
+
+    def test_batch_favorites_are_idempotent(self):
+        recipe_ids = [recipe.pk for recipe in self.recipes[:2]]
+        for _ in range(2):
+            response = self.client.post(reverse("my-favorites"), {"recipe_ids": recipe_ids + [0]}, format="json")
+        self.assertEqual(response.data, {"added": []})
+        self.assertEqual(self.counts(), [1, 1, 0])
+
+        response = self.client.delete(reverse("favorite-recipe", args=[recipe_ids[0]]))
+        self.assertEqual(response.data, {"favorited": False, "changed": True})
+        response = self.client.delete(reverse("my-favorites"), {"recipe_ids": recipe_ids}, format="json")
+        self.assertEqual(response.data, {"removed": recipe_ids[1:]})
+        self.assertEqual(self.counts(), [0, 0, 0])
+
+    @override_settings(TRENDING_HALF_LIFE_DAYS=1)
+    def test_trending_scores_stay_finite_past_a_thousand_half_lives(self):
+        first, second, third = self.recipes
+        late = TRENDING_EPOCH + timedelta(days=5000)
+        for recipe, user, days in ((first, self.users[0], 0), (first, self.users[1], 0), (second, self.users[0], 2)):
+            RecipeFavorite.objects.create(recipe=recipe, user=user, created_at=late + timedelta(days=days))
+        scores = dict(Recipe.objects.values_list("id", "trending_score"))
+        # Two favorites weigh as much as one a half-life newer, so they lose to one two half-lives newer.
+        self.assertTrue(scores[third.pk] == 0.0 < scores[first.pk] < scores[second.pk] < 6000)
+        call_command("reconcile_favorites", "--check", stdout=StringIO())
+
+        RecipeFavorite.objects.get(recipe=second).delete()
+        RecipeFavorite.objects.filter(recipe=first, user=self.users[0]).delete()
+        scores = dict(Recipe.objects.values_list("id", "trending_score"))
+        self.assertEqual(scores[second.pk], 0.0)
+        self.assertAlmostEqual(scores[first.pk], 5000 * math.log(2))
+        call_command("reconcile_favorites", "--check", stdout=StringIO())
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="secret")
+        self.recipe = Recipe.objects.create(title="Soup", ingredients="leeks", instructions="Simmer.")
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_detail_is_served_from_cache_until_the_recipe_changes(self):
+        url = reverse("recipe-retrieve", args=[self.recipe.pk])
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.title = "Leek soup"
+            self.recipe.save()
+        response = self.client.get(url)
+        self.assertEqual((response["X-Cache"], response.data["title"]), ("MISS", "Leek soup"))
+
+    def test_favorites_invalidate_the_recipe(self):
+        url = reverse("recipe-retrieve", args=[self.recipe.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("favorite-recipe", args=[self.recipe.pk]))
+        self.assertEqual(self.client.get(url).data["favorites_count"], 1)
+
+
+class SubstituteIndexTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        substitute_index.invalidate()
+        self.user = User.objects.create_user(username="baker", password="secret")
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for ingredient, substitutes in (("butter", ["margarine"]), ("eggs", ["flaxseed meal"])):
+                self.client.post(reverse("add-ingredient-substitutes"), {
+                    "ingredient": ingredient, "substitutes": substitutes
+                }, format="json")
+
+    def test_lookup_folds_names_and_typos_without_queries(self):
+        substitute_index.get()
+        for text, matched in (("Egg", "eggs"), ("large eggs", "eggs"), ("buter", "butter")):
+            with self.subTest(text), self.assertNumQueries(0):
+                response = self.client.get(reverse("ingredient-substitutes", args=[text]))
+            self.assertEqual((response.status_code, response.data["matched"]), (200, matched))
+
+    def test_miss_suggests_completions(self):
+        response = self.client.get(reverse("ingredient-substitutes", args=["bu"]))
+        self.assertEqual((response.status_code, response.data["suggestions"]), (404, ["butter"]))
+
+    def test_batch_resolves_a_recipe_for_the_users_diet(self):
+        UserPreferences.objects.create(user=self.user, dietary_preferences={"tags": ["Vegan"]})
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientSubstitute.objects.create(ingredient="milk", substitutes=["oat milk", "cream"])
+            recipe = Recipe.objects.create(title="Cake", ingredients="2 eggs, 1 cup milk, saffron", instructions="Bake.")
+        substitute_index.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("batch-ingredient-substitutes"), {"recipe_id": recipe.pk})
+        results = response.data["substitutes"]
+        self.assertEqual(list(results), ["egg", "milk", "saffron"])
+        self.assertEqual(results["milk"]["substitutes"], ["oat milk"])
+        self.assertEqual(results["milk"]["excluded"], [{"substitute": "cream", "diet": "vegan"}])
+        self.assertIsNone(results["saffron"]["matched"])
+
+    def test_batch_rejects_impossible_dates(self):
+        url = reverse("batch-ingredient-substitutes")
+        for start, end in (("2024-02-30", "2024-03-01"), ("2024-03-01", "2024-02-01"), ("march", "2024-03-01")):
+            with self.subTest(start=start, end=end):
+                response = self.client.get(url, {"start_date": start, "end_date": end})
+                self.assertEqual(response.status_code, 400)
+
+
+class SubstituteIndexStructureTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SubstituteIndex()
+        for ingredient, substitutes in (("beef", ["seitan"]), ("Butter", ["ghee"]), ("butternut squash", ["pumpkin"])):
+            self.index.put(ingredient, substitutes)
+
+    def test_short_names_only_match_exactly(self):
+        self.assertEqual(self.index.lookup("Beef"), ("beef", ["seitan"]))
+        self.assertIsNone(self.index.lookup("beet"))
+        self.assertIsNone(self.index.lookup("beets"))
+        self.assertEqual(self.index.lookup("buter"), ("Butter", ["ghee"]))
+        self.assertEqual(self.index.lookup("butternut squosh"), ("butternut squash", ["pumpkin"]))
+
+    def test_changes_never_touch_what_readers_hold(self):
+        trie, postings, entries = self.index.trie, self.index.deletions["btter"], self.index.entries["butter"]
+        self.index.put("butter", ["margarine"])
+        self.index.put("buttermilk", ["soured milk"])
+        self.index.remove("beef")
+        self.assertEqual(sorted(trie["b"]["u"]["t"]["t"]["e"]["r"]), ["", "n"])
+        self.assertEqual(entries, {"Butter": ["ghee"]})
+        self.assertEqual(postings, {"butter", "butternut squash"})
+        self.assertEqual(self.index.deletions["btter"], {"butter", "buttermilk", "butternut squash"})
+        self.assertEqual(self.index.lookup("butter"), ("Butter", ["ghee", "margarine"]))
+        self.assertEqual(self.index.complete("butter"), ["butter", "buttermilk", "butternut squash"])
+
+        self.index.remove("Butter")
+        self.assertEqual(self.index.lookup("butter"), ("butter", ["margarine"]))
+        for ingredient in ("butter", "buttermilk", "butternut squash"):
+            self.index.remove(ingredient)
+        self.assertEqual((self.index.trie, self.index.deletions, self.index.entries), ({}, {}, {}))
+        self.assertEqual(trie["b"]["e"]["e"]["f"][""], "beef")
+
+
+class ShoppingListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="shopper", password="secret")
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        for offset, ingredients in enumerate(("2 cups milk, 200 g flour, salt", "1 cup milk, 1 kg flour, 2 eggs")):
+            recipe = Recipe.objects.create(title=f"Bake {offset}", ingredients=ingredients, instructions="Bake.")
+            MealPlan.objects.create(user=self.user, date=today + timedelta(days=offset)).recipes.add(recipe)
+        self.url = reverse("generate-shopping-list")
+
+    def test_quantities_are_converted_and_summed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["shopping_list"], [
+            {"ingredient": "egg", "quantity": 2.0, "unit": ""},
+            {"ingredient": "flour", "quantity": 1.2, "unit": "kg"},
+            {"ingredient": "milk", "quantity": 709.76, "unit": "ml"},
+            {"ingredient": "salt", "quantity": None, "unit": ""},
+        ])
+        today = timezone.now().date().isoformat()
+        response = self.client.get(self.url, {"start": today, "end": today})
+        self.assertEqual([line["ingredient"] for line in response.data["shopping_list"]], ["flour", "milk", "salt"])
+        for start, end in (("2024-02-30", "2024-03-01"), (today, "2000-01-01"), ("soon", today)):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(self.client.get(self.url, {"start": start, "end": end}).status_code, 400)
+
+    def test_cached_until_the_users_meal_plans_change(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            MealPlan.objects.get(date=timezone.now().date()).recipes.add(
+                Recipe.objects.create(title="Tea", ingredients="1 cup milk", instructions="Brew.")
+            )
+        milk = next(line for line in self.client.get(self.url).data["shopping_list"] if line["ingredient"] == "milk")
+        self.assertEqual(milk["quantity"], 946.35)
+
+
+class MealPlanOptimizerTests(APITestCase):
+    def setUp(self):
+        nutrition_matrix.invalidate()
+        self.user = User.objects.create_user(username="athlete", password="secret")
+        self.client.force_authenticate(self.user)
+        for index in range(60):
+            calories = 500 + 5 * index
+            Recipe.objects.create(
+                title=f"Bowl {index}", ingredients="rice", instructions="Mix.",
+                nutrition={"calories": calories, "protein": calories / 20}, dietary_tags=["vegan"] if index % 2 else [],
+            )
+
+    def test_week_meets_targets_without_repeats(self):
+        UserPreferences.objects.create(user=self.user, dietary_preferences={"tags": ["vegan"]})
+        response = self.client.post(reverse("optimize-meal-plan"), {
+            "targets": {"calories": 1950, "protein": 97.5}, "save": True
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        recipes = [recipe for day in response.data["plan"] for recipe in day["recipes"]]
+        self.assertEqual(len({recipe["id"] for recipe in recipes}), 21)
+        self.assertTrue(all(recipe["dietary_tags"] == ["vegan"] for recipe in recipes))
+        for day in response.data["plan"]:
+            self.assertAlmostEqual(day["totals"]["calories"], 1950, delta=50)
+        self.assertEqual(MealPlan.objects.filter(user=self.user).count(), 7)
+
+    def test_targets_are_validated(self):
+        response = self.client.post(reverse("optimize-meal-plan"), {"targets": {"sugar": 10}}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_start_date_is_validated(self):
+        targets = {"calories": 1950}
+        for start_date in ("2024-02-30", "next monday", "2024-13-01"):
+            with self.subTest(start_date):
+                response = self.client.post(reverse("optimize-meal-plan"), {
+                    "targets": targets, "start_date": start_date, "save": True
+                }, format="json")
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(MealPlan.objects.filter(user=self.user).exists())
+        response = self.client.post(reverse("optimize-meal-plan"), {
+            "targets": targets, "start_date": "2030-01-01", "days": 1, "save": True
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(MealPlan.objects.filter(user=self.user).values_list("date", flat=True)), [date(2030, 1, 1)])
+
+    def test_readers_keep_their_rows_while_the_matrix_grows(self):
+        matrix = NutritionMatrix(capacity=1)
+        matrix.put(1, ["Vegan"], [500, 20, 60, 10, 5])
+        rows = matrix.rows
+        matrix.put(2, ["keto"], [600, 30, 10, 40, 2])
+        self.assertEqual((rows.size, len(rows.matrix), len(rows.tag_masks["vegan"])), (1, 1, 1))
+        self.assertEqual([list(rows.eligible(tags)) for tags in (["vegan"], ["keto"])], [[0], []])
+        self.assertEqual(list(matrix.rows.eligible(["keto"])), [1])
+
+
+class NutritionSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="dietitian", password="secret")
+        self.client.force_authenticate(self.user)
+        self.recipes = {
+            title: Recipe.objects.create(title=title, ingredients="water", instructions="Mix.", nutrition=nutrition)
+            for title, nutrition in (
+                ("steak", {"calories": "650 kcal", "protein": "55g", "fats": "30g"}),
+                ("salad", {"calories": 250, "protein": "8g", "fat": "12g"}),
+                ("shake", {"calories": 380, "protein": "42 g", "fat": "4g"}),
+                ("toast", {"calories": 300, "protein": "9g"}),
+            )
+        }
+
+    def search(self, **params):
+        return self.client.get(reverse("search-by-nutrition"), params)
+
+    def titles(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [recipe["title"] for recipe in response.data]
+
+    def test_goals_and_bounds_filter_in_id_order(self):
+        self.assertEqual(self.titles(self.search(goal="High-Protein")), ["steak", "shake"])
+        self.assertEqual(self.titles(self.search(goal="low-calorie")), ["salad", "shake", "toast"])
+        self.assertEqual(self.titles(self.search(min_calories="280", max_protein="10")), ["toast"])
+        self.assertEqual(self.titles(self.search(goal="low-fat")), ["shake"])
+        # Recipes without a parsed fat value never match a fat bound.
+        self.assertEqual(self.titles(self.search(goal="low-calorie", max_fat="12")), ["salad", "shake"])
+        response = self.search(goal="high-protein", min_calories="700")
+        self.assertEqual(response.data, {"message": "No recipes found for goal: 'high-protein'"})
+        self.assertEqual(self.search(goal="sugar-free", min_protein="1").data, {"message": "No recipes found for goal: 'sugar-free'"})
+
+    def test_malformed_bounds_are_rejected(self):
+        for params in ({"min_calories": "lots"}, {"max_protein": "nan"}, {"goal": "low-fat", "max_fat": "inf"}):
+            with self.subTest(params):
+                self.assertEqual(self.search(**params).status_code, 400)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="poller", password="secret")
+        self.recipe = Recipe.objects.create(title="Oats", ingredients="oats, milk", instructions="Soak.")
+        self.meal_plan = MealPlan.objects.create(user=self.user, date=timezone.now().date())
+        self.meal_plan.recipes.add(self.recipe)
+        self.client.force_authenticate(self.user)
+
+    def assertNotModifiedWithOneQuery(self, url):
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_recipe_detail(self):
+        url = reverse("recipe-retrieve", args=[self.recipe.pk])
+        etag = self.assertNotModifiedWithOneQuery(url)
+        self.recipe.title = "Overnight oats"
+        self.recipe.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_meal_plans(self):
+        for name in ("today-meal-plan", "week-meal-plan"):
+            with self.subTest(name):
+                etag = self.assertNotModifiedWithOneQuery(reverse(name))
+                self.meal_plan.recipes.add(
+                    Recipe.objects.create(title=f"Toast {name}", ingredients="bread", instructions="Toast.")
+                )
+                self.assertEqual(self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="bearer", password="secret")
+        recipe = Recipe.objects.create(title="Salad", ingredients="lettuce", instructions="Toss.")
+        self.url = reverse("recipe-retrieve", args=[recipe.pk])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_cached_reads_skip_the_user_query(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivation_applies_on_the_next_request(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_cache_keeps_only_what_authentication_reads(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(self.url)
+        fields = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(fields, {"id": self.user.pk, "is_active": True, "is_staff": True})
+        # A cached staff user still passes IsAdminUser without loading the row.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse("response-cache-stats")).status_code, 200)
+
+    def test_save_during_a_miss_leaves_nothing_under_the_new_version(self):
+        load = JWTAuthentication.get_user
+
+        def load_then_save(authentication, validated_token):
+            user = load(authentication, validated_token)
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.get(pk=user.pk).save()
+            return user
+
+        with mock.patch.object(JWTAuthentication, "get_user", load_then_save):
+            self.client.get(self.url)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+
+class BatchRequestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="batcher", password="secret")
+        self.recipe = Recipe.objects.create(title="Stew", ingredients="2 carrots, 500 g beef", instructions="Braise.")
+        MealPlan.objects.create(user=self.user, date=timezone.now().date()).recipes.add(self.recipe)
+        self.client.force_authenticate(self.user)
+        self.url = reverse("batch")
+
+    def batch(self, *requests):
+        response = self.client.post(self.url, {"requests": list(requests)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["responses"]
+
+    @override_settings(BATCH_MAX_WORKERS=1)
+    def test_items_match_direct_calls_in_order(self):
+        paths = [reverse(name) for name in ("today-meal-plan", "week-meal-plan", "generate-shopping-list")]
+        expected = [self.client.get(path).json() for path in paths]
+        results = self.batch(*({"path": path} for path in paths), {"path": "/api/nowhere/"}, {"path": self.url})
+        self.assertEqual([result["path"] for result in results[:3]], paths)
+        self.assertEqual([result["body"] for result in results[:3]], expected)
+        self.assertEqual([result["status"] for result in results], [200, 200, 200, 404, 400])
+
+    @override_settings(BATCH_MAX_WORKERS=1)
+    def test_writes_are_barriers(self):
+        favorites = reverse("my-favorites")
+        results = self.batch(
+            {"path": favorites},
+            {"method": "POST", "path": reverse("favorite-recipe", args=[self.recipe.pk])},
+            {"path": favorites},
+        )
+        self.assertEqual([result["status"] for result in results], [200, 200, 200])
+        self.assertEqual(len(results[0]["body"]["results"]), 0)
+        self.assertEqual(len(results[2]["body"]["results"]), 1)
+
+    def test_rejects_invalid_batches(self):
+        for requests in ([], [{"method": "GET", "path": "/api/favorites/", "body": {}}], [{"path": 1}]):
+            with self.subTest(requests):
+                response = self.client.post(self.url, {"requests": requests}, format="json")
+                self.assertEqual(response.status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, {"requests": [{"path": reverse("recipe-list")}]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class ConcurrentBatchTests(APITransactionTestCase):
+    def test_reads_run_on_worker_threads(self):
+        user = User.objects.create_user(username="parallel", password="secret")
+        MealPlan.objects.create(user=user, date=timezone.now().date()).recipes.add(
+            Recipe.objects.create(title="Rice", ingredients="1 cup rice", instructions="Steam.")
+        )
+        self.client.force_authenticate(user)
+        paths = [reverse(name) for name in ("today-meal-plan", "week-meal-plan", "generate-shopping-list")]
+        expected = [self.client.get(path).json() for path in paths]
+        response = self.client.post(reverse("batch"), {"requests": [{"path": path} for path in paths]}, format="json")
+        self.assertEqual([result["body"] for result in response.json()["responses"]], expected)
+
+
+class DietaryFilterIndexTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="tagger", password="secret")
+        self.client.force_authenticate(self.user)
+        self.recipes = {
+            name: Recipe.objects.create(title=name, ingredients="water", instructions="Boil.", dietary_tags=tags)
+            for name, tags in (
+                ("both", ["Vegan", "gluten-free "]), ("meaty", ["non-vegan"]), ("vegan", ["vegan"]), ("plain", []),
+            )
+        }
+
+    def titles(self, queryset):
+        return sorted(queryset.values_list("title", flat=True))
+
+    def test_any_and_all_of_tags(self):
+        self.assertEqual(self.titles(Recipe.objects.with_any_tags(["vegan"])), ["both", "vegan"])
+        self.assertEqual(self.titles(Recipe.objects.with_any_tags(["Gluten-Free", "non-vegan"])), ["both", "meaty"])
+        self.assertEqual(self.titles(Recipe.objects.with_all_tags(["vegan", "gluten-free"])), ["both"])
+        self.assertEqual(self.titles(Recipe.objects.with_all_tags([])), ["both", "meaty", "plain", "vegan"])
+
+    def test_links_follow_the_json_field(self):
+        recipe = self.recipes["vegan"]
+        recipe.dietary_tags = ["keto"]
+        recipe.save()
+        self.assertEqual(self.titles(Recipe.objects.with_any_tags(["vegan"])), ["both"])
+        self.assertEqual(self.titles(Recipe.objects.with_any_tags(["keto"])), ["vegan"])
+        with CaptureQueriesContext(connection) as queries:
+            recipe.save(update_fields=["dietary_tags"])
+        # Unchanged tags are only read back, never rewritten.
+        self.assertEqual(sum("recipe_dietary_filters" in query["sql"] for query in queries), 1)
+
+    def test_recipe_list_filters(self):
+        url = reverse("recipe-list")
+        response = self.client.get(url, {"tags": "vegan,gluten-free"})
+        self.assertEqual([recipe["title"] for recipe in response.data["results"]], ["both"])
+        response = self.client.get(url, {"tags": "vegan", "match": "any"})
+        self.assertEqual(sorted(recipe["title"] for recipe in response.data["results"]), ["both", "vegan"])
+        self.assertEqual(self.client.get(url, {"tags": "vegan", "match": "some"}).status_code, 400)
+
+    def test_plan_meals_uses_preference_tags(self):
+        UserPreferences.objects.create(user=self.user, dietary_preferences={"tags": ["Vegan"]})
+        url = reverse("plan-meals")
+        response = self.client.post(url, {"date": "2030-01-01"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(recipe["title"] for recipe in response.data["recipes"]), ["both", "vegan"])
+        self.assertEqual(self.client.post(url, {"date": "2030-02-30"}, format="json").status_code, 400)
+
+
+class LeftoverIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = LeftoverIndex()
+        names = {1: "rice", 2: "egg", 3: "chicken breast", 4: "soy sauce", 5: "onion"}
+        for recipe_id, ingredient_ids in {10: [1, 2], 11: [1, 2, 4], 12: [3, 5], 13: [1, 2, 4, 5]}.items():
+            self.index.put(recipe_id, {ingredient_id: names[ingredient_id] for ingredient_id in ingredient_ids})
+
+    def rank(self, leftovers, **kwargs):
+        matches, truncated = self.index.rank(leftovers, kwargs.pop("limit", 10), **kwargs)
+        return [(recipe_id, round(coverage, 2), missing) for recipe_id, coverage, missing in matches], truncated
+
+    def test_orders_by_coverage_then_missing_then_id(self):
+        self.assertEqual(self.rank(["Rice", "eggs", "soy sauce"]), ([
+            (10, 1.0, []), (11, 1.0, []), (13, 0.75, [5]),
+        ], False))
+        self.assertEqual(self.rank(["chicken"], limit=1), ([(12, 0.5, [5])], False))
+
+    def test_min_coverage(self):
+        self.assertEqual([match[0] for match in self.rank(["rice"], min_coverage=0.4)[0]], [10])
+
+    def test_budget_truncates_the_merge(self):
+        for ingredient_id in range(100, 120):
+            self.index.put(ingredient_id, {ingredient_id: f"spice {ingredient_id}"})
+        leftovers_ = [f"spice {ingredient_id}" for ingredient_id in range(100, 120)]
+        with mock.patch.object(leftovers.time, "monotonic", side_effect=itertools.count()):
+            matches, truncated = self.index.rank(leftovers_, 50, budget_ms=1)
+        self.assertTrue(truncated)
+        self.assertEqual(len(matches), leftovers._MERGE_GROUP_SIZE)
+
+    def test_put_and_remove(self):
+        self.index.put(10, {5: "onion"})
+        self.index.remove(11)
+        self.assertEqual([match[0] for match in self.rank(["rice", "egg", "soy sauce"])[0]], [13])
+        self.assertEqual(self.rank(["onion"])[0][0], (10, 1.0, []))
+
+    def test_compaction_keeps_live_rows(self):
+        for version in range(leftovers._MIN_RETIRED_TO_COMPACT * 2):
+            self.index.put(20, {1: "rice", 100 + version % 3: "salt"})
+        self.assertLess(self.index.size, leftovers._MIN_RETIRED_TO_COMPACT * 2)
+        self.assertEqual([match[0] for match in self.rank(["rice", "egg"])[0]][:2], [10, 11])
+        self.assertIn(20, [match[0] for match in self.rank(["rice"])[0]])
+
+
+class IngredientIndexTests(APITestCase):
+    def setUp(self):
+        self.soup = Recipe.objects.create(title="soup", ingredients="2 cups water\n1 onion", instructions="Boil.")
+
+    def tokens(self, recipe):
+        return set(RecipeIngredientToken.objects.filter(recipe=recipe).values_list("token", flat=True))
+
+    def test_saves_limited_to_other_fields_skip_the_reindex(self):
+        with mock.patch("recipes.signals.index_recipes", wraps=indexing.index_recipes) as index_recipes:
+            self.soup.title = "stock"
+            self.soup.save(update_fields=["title"])
+            index_recipes.assert_not_called()
+            self.soup.ingredients = "1 leek"
+            self.soup.save(update_fields=["ingredients"])
+            index_recipes.assert_called_once()
+        self.assertEqual(self.tokens(self.soup), tokenize("1 leek"))
+
+    def test_search_matches_every_token(self):
+        stew = Recipe.objects.create(title="stew", ingredients="3 red onions, chopped\n2 cloves garlic", instructions="Simmer.")
+        self.assertEqual(indexing.search_recipe_ids(["Onion"]), [self.soup.pk, stew.pk])
+        self.assertEqual(indexing.search_recipe_ids(["onions", "garlic"]), [stew.pk])
+        self.assertEqual(indexing.search_recipe_ids(["onion", "saffron"]), [])
+        self.assertEqual(indexing.search_recipe_ids([""]), [])
+
+    def test_rebuild_check_reports_drift(self):
+        out = StringIO()
+        call_command("rebuild_recipe_index", "--check", stdout=out)
+        self.assertIn("consistent for 1 recipes", out.getvalue())
+        # Queryset updates send no signals, so the index falls behind.
+        Recipe.objects.filter(pk=self.soup.pk).update(ingredients="1 leek")
+        with self.assertRaisesMessage(CommandError, "1 of 1 recipes"):
+            call_command("rebuild_recipe_index", "--check", stdout=StringIO())
+        # The rewrite bypasses the signals, so everything built from the index tables is dropped.
+        with mock.patch.object(leftovers.leftover_index, "invalidate") as drop_leftovers, \
+                mock.patch.object(recommendation_index, "invalidate") as drop_recommendations, \
+                mock.patch.object(response_cache, "invalidate") as drop_responses:
+            call_command("rebuild_recipe_index", stdout=StringIO())
+        drop_leftovers.assert_called_once_with()
+        drop_recommendations.assert_called_once_with()
+        drop_responses.assert_called_once_with(response_cache.RECIPE_INGREDIENTS)
+        call_command("rebuild_recipe_index", "--check", stdout=StringIO())
+        self.assertEqual(self.tokens(self.soup), {"leek"})
+
+
+class RecipeExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="archivist", password="secret")
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            Recipe.objects.create(title=title, ingredients="water", instructions="Boil.") for title in ("old", "new")
+        ]
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(updated_at=timezone.make_aware(datetime(2020, 1, 1)))
+        self.recipes[1].favorites.add(self.user)
+        self.url = reverse("recipe-export")
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_streams_one_line_per_recipe(self):
+        rows = self.export(fields="id,title,favorites")
+        self.assertEqual(rows, [
+            {"id": self.recipes[0].pk, "title": "old", "favorites": []},
+            {"id": self.recipes[1].pk, "title": "new", "favorites": [self.user.pk]},
+        ])
+        self.assertEqual(set(self.export()[0]), set(EXPORT_FIELDS))
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(self.url, {"fields": "title,password"})
+        self.assertEqual((response.status_code, response.data["error"]), (400, "Unknown fields: password"))
+
+    def test_updated_since_filters_by_date_or_datetime(self):
+        for updated_since in ("2021-01-01", "2021-01-01T12:30:00", "2021-01-01T12:30:00+02:00"):
+            with self.subTest(updated_since):
+                self.assertEqual([row["title"] for row in self.export(fields="title", updated_since=updated_since)], ["new"])
+        self.assertEqual(len(self.export(fields="title", updated_since="2019-12-31")), 2)
+        for updated_since in ("yesterday", "2024-02-30", "2024-02-30T10:00:00"):
+            with self.subTest(updated_since):
+                self.assertEqual(self.client.get(self.url, {"updated_since": updated_since}).status_code, 400)
+
+
+class MigrationTestCase(TransactionTestCase):
+    """
+    Migrates ``recipes`` back to ``migrate_from``, lets ``populate`` add rows through the
+    historical ``apps``, then migrates to ``migrate_to`` and exposes its models as ``self.apps``.
+    """
+    migrate_from = migrate_to = None
+
+    def migrate(self, name):
+        executor = MigrationExecutor(connection)
+        executor.migrate([("recipes", name)])
+        return executor.loader.project_state([("recipes", name)]).apps
+
+    def setUp(self):
+        self.populate(self.migrate(self.migrate_from))
+        self.apps = self.migrate(self.migrate_to)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def populate(self, apps):
+        pass
+
+
+class NutritionParsingTests(SimpleTestCase):
+    def test_amounts_with_units_and_thousands_separators(self):
+        nutrition = {"kcal": "1,200 kcal", "proteins": "30.5g", "carbs": 12, "fat": "", "fibre": "none"}
+        self.assertEqual(normalize_nutrition(nutrition), {
+            "calories": 1200.0, "protein": 30.5, "carbs": 12.0, "fat": None, "fiber": None,
+        })
+        self.assertEqual(normalize_nutrition({"energy": "12,000.5 kJ", "fat": "1,5 g"})["calories"], 12000.5)
+        self.assertEqual(normalize_nutrition({"fat": "1,5 g"})["fat"], 1.0)
+        self.assertEqual(normalize_nutrition(["not", "a", "dict"])["calories"], None)
+
+
+class IngredientBackfillMigrationTests(MigrationTestCase):
+    migrate_from = "0011_recipeingredienttoken"
+    migrate_to = "0012_ingredient_recipeingredient"
+
+    def populate(self, apps):
+        Recipe = apps.get_model("recipes", "Recipe")
+        self.recipe_ids = [
+            Recipe.objects.create(title=title, ingredients=ingredients, instructions="Cook.").pk
+            for title, ingredients in (
+                ("porridge", "1 1/2 cups whole milk, 2 Tbsp. butter, salt"),
+                ("omelette", "3 large Eggs, salt"),
+                ("nothing", ""),
+            )
+        ]
+
+    def test_rows_are_parsed_from_the_ingredients_text(self):
+        RecipeIngredient = self.apps.get_model("recipes", "RecipeIngredient")
+        rows = RecipeIngredient.objects.order_by("recipe_id", "position").values_list(
+            "recipe_id", "position", "quantity", "unit", "ingredient__name"
+        )
+        porridge, omelette, _ = self.recipe_ids
+        self.assertEqual(list(rows), [
+            (porridge, 0, 1.5, "cup", "whole milk"),
+            (porridge, 1, 2.0, "tbsp", "butter"),
+            (porridge, 2, None, "", "salt"),
+            (omelette, 0, 3.0, "", "egg"),
+            (omelette, 1, None, "", "salt"),
+        ])
+        self.assertEqual(self.apps.get_model("recipes", "Ingredient").objects.filter(name="salt").count(), 1)
+
+class NutritionBackfillMigrationTests(MigrationTestCase):
+    migrate_from = "0012_ingredient_recipeingredient"
+    migrate_to = "0013_recipe_nutrition_columns"
+
+    def populate(self, apps):
+        Recipe = apps.get_model("recipes", "Recipe")
+        self.recipe_ids = [
+            Recipe.objects.create(title=title, ingredients="rice", instructions="Cook.", nutrition=nutrition).pk
+            for title, nutrition in (("feast", {"kcal": "1,200 kcal", "protein": "45g"}), ("plain", {}))
+        ]
+
+    def test_columns_are_parsed_from_the_json(self):
+        Recipe = self.apps.get_model("recipes", "Recipe")
+        rows = Recipe.objects.filter(pk__in=self.recipe_ids).order_by("id").values_list("calories", "protein", "fat")
+        self.assertEqual(list(rows), [(1200.0, 45.0, None), (None, None, None)])
+
+
+class FavoritePopularityMigrationTests(MigrationTestCase):
+    migrate_from = "0017_recipe_rating_aggregates"
+    migrate_to = "0018_recipe_favorite_popularity"
+
+    def populate(self, apps):
+        User = apps.get_model("auth", "User")
+        Recipe = apps.get_model("recipes", "Recipe")
+        self.liked, self.ignored = (
+            Recipe.objects.create(title=title, ingredients="rice", instructions="Cook.").pk for title in ("liked", "ignored")
+        )
+        Recipe.objects.get(pk=self.liked).favorites.add(*(User.objects.create(username=name) for name in ("ann", "bob")))
+
+    def test_backfills_counts_and_log_scores(self):
+        Recipe = self.apps.get_model("recipes", "Recipe")
+        created_at = self.apps.get_model("recipes", "RecipeFavorite").objects.values_list("created_at", flat=True)[0]
+        rows = {recipe_id: values for recipe_id, *values in Recipe.objects.values_list("id", "favorites_count", "trending_score")}
+        self.assertEqual(rows[self.ignored], [0, 0.0])
+        self.assertEqual(rows[self.liked][0], 2)
+        self.assertAlmostEqual(rows[self.liked][1], math.log(1 + 2 * math.exp(favorite_log_weight(created_at))), places=4)
+
+
+class RecommendationTests(APITestCase):
+    def setUp(self):
+        recommendation_index.invalidate()
+        self.client.force_authenticate(User.objects.create_user(username="curious", password="secret"))
+        self.recipes = {
+            title: Recipe.objects.create(
+                title=title, ingredients=ingredients, instructions="Cook.", dietary_tags=tags,
+                nutrition={"calories": calories, "protein": 20, "carbs": 60, "fat": 10},
+            )
+            for title, ingredients, tags, calories in (
+                ("fried rice", "2 cups rice, 2 eggs, 1 onion, soy sauce", ["vegetarian"], 500),
+                ("egg rice bowl", "1 cup rice, 2 eggs, 1 onion, 1 carrot", ["vegetarian"], 520),
+                ("chicken rice", "1 cup rice, 1 chicken breast, 1 onion", [], 600),
+                ("fudge", "200 g chocolate, 100 g sugar, 50 g butter", ["dessert"], 900),
+            )
+        }
+
+    def titles(self, recipe, **params):
+        response = self.client.get(reverse("recipe-recommendations", args=[recipe.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.data]
+
+    def test_ranked_by_shared_ingredients_tags_and_nutrition(self):
+        self.assertEqual(self.titles(self.recipes["fried rice"]), ["egg rice bowl", "chicken rice", "fudge"])
+        self.assertEqual(self.titles(self.recipes["fried rice"], limit=1), ["egg rice bowl"])
+        scores = [score for _, score in recommend(self.recipes["fried rice"], 3)]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # Fudge shares neither ingredients nor tags, so only the nutrition block can score.
+        self.assertLessEqual(recommend(self.recipes["fudge"], 1)[0][1], 0.15 + 1e-6)
+
+    def test_follows_edits_and_deletes(self):
+        recommendation_index.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            fudge = self.recipes["fudge"]
+            fudge.ingredients, fudge.dietary_tags = "2 cups rice, 2 eggs, 1 onion, soy sauce", ["vegetarian"]
+            fudge.nutrition = {"calories": 500, "protein": 20, "carbs": 60, "fat": 10}
+            fudge.save()
+            self.recipes["egg rice bowl"].delete()
+        self.assertEqual(self.titles(self.recipes["fried rice"]), ["fudge", "chicken rice"])
+
+    def test_limit_is_validated(self):
+        response = self.client.get(reverse("recipe-recommendations", args=[self.recipes["fudge"].pk]), {"limit": "a"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("recipe-recommendations", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+    def test_readers_keep_their_rows_while_the_index_grows(self):
+        index = RecommendationIndex(capacity=1)
+        vector = np.ones(index.width, dtype=np.float32)
+        index.put(self.recipes["fudge"], [])
+        rows = index.rows
+        for recipe in self.recipes.values():
+            index.put(recipe, [])
+        self.assertEqual((rows.size, len(rows.matrix), len(rows.live)), (1, 1, 1))
+        self.assertEqual(index.rows.size, 4)
+        self.assertEqual(len(index.nearest(vector, 10)), 4)
+
+class IdPoolTests(SimpleTestCase):
+    def assertConsistent(self, pool, expected):
+        self.assertEqual(sorted(pool.ids), sorted(expected))
+        self.assertEqual({item: pool.ids[index] for item, index in pool.position.items()}, {item: item for item in expected})
+
+    def test_add_and_swap_remove_keep_positions(self):
+        pool = IdPool()
+        for item in (5, 7, 9, 7, 11):
+            pool.add(item)
+        self.assertConsistent(pool, [5, 7, 9, 11])
+        pool.discard(7)
+        pool.discard(7)
+        pool.discard(42)
+        self.assertConsistent(pool, [5, 9, 11])
+        pool.discard(11)
+        self.assertConsistent(pool, [5, 9])
+        pool.add(7)
+        self.assertConsistent(pool, [5, 7, 9])
+
+    def test_sample_draws_distinct_ids(self):
+        pool = IdPool()
+        for item in range(100):
+            pool.add(item)
+        for _ in range(20):
+            drawn = pool.sample(10)
+            self.assertEqual(len(set(drawn)), 10)
+            self.assertTrue(set(drawn) <= set(range(100)))
+        self.assertEqual(sorted(pool.sample(500)), list(range(100)))
+        self.assertEqual(IdPool().sample(3), [])
+
+    def test_sampler_pools_follow_tag_changes(self):
+        sampler = RecipeSampler()
+        sampler.put(1, ["Vegan", "gluten-free"])
+        sampler.put(2, ["vegan "])
+        sampler.put(3, "not a list")
+        self.assertEqual(sorted(sampler.sample(5, "VEGAN")), [1, 2])
+        sampler.put(1, ["keto"])
+        self.assertEqual(sampler.sample(5, "vegan"), [2])
+        self.assertEqual(sampler.sample(5, "gluten-free"), [])
+        sampler.remove(2)
+        self.assertEqual(sorted(sampler.sample(5)), [1, 3])
+        self.assertEqual(sampler.sample(5, "paleo"), [])
+
+
+class WeeklyMealPlanTests(APITestCase):
+    def setUp(self):
+        recipe_sampler.invalidate()
+        self.user = User.objects.create_user(username="planner", password="secret")
+        self.client.force_authenticate(self.user)
+        self.recipe_ids = [
+            Recipe.objects.create(title=f"Dish {index}", ingredients="rice", instructions="Cook.").pk for index in range(25)
+        ]
+
+    def test_week_without_repeats(self):
+        response = self.client.post(reverse("weekly-meal-plan"), {"start_date": "2030-01-07"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([plan["date"] for plan in response.data], [f"2030-01-{day:02}" for day in range(7, 14)])
+        recipe_ids = [recipe["id"] for plan in response.data for recipe in plan["recipes"]]
+        self.assertEqual(len(recipe_ids), 21)
+        self.assertEqual(len(set(recipe_ids)), 21)
+
+    def test_failure_leaves_no_partial_week(self):
+        through = MealPlan.recipes.through
+        with mock.patch.object(through.objects, "bulk_create", side_effect=IntegrityError("links")):
+            with self.assertRaises(IntegrityError):
+                create_meal_plans(self.user, date(2030, 1, 7), [self.recipe_ids[:3]] * 7)
+        self.assertFalse(MealPlan.objects.filter(user=self.user).exists())
+        meal_plans = create_meal_plans(self.user, date(2030, 1, 7), [self.recipe_ids[:3]] * 7)
+        self.assertEqual(MealPlan.objects.filter(user=self.user).count(), 7)
+        self.assertEqual([len(plan.recipes.all()) for plan in meal_plans], [3] * 7)
+
+
+    def test_preferences_that_are_not_an_object_are_ignored(self):
+        preferences = UserPreferences.objects.create(user=self.user, dietary_preferences=["vegan"])
+        response = self.client.post(reverse("weekly-meal-plan"), {"start_date": "2030-01-07"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        # None of these recipes carry nutrition, so the optimizer finds nothing to plan with.
+        response = self.client.post(reverse("optimize-meal-plan"), {"targets": {"calories": 2000}}, format="json")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("batch-ingredient-substitutes"), {"recipe_id": self.recipe_ids[0]})
+        self.assertEqual((response.status_code, response.data["dietary_tags"]), (200, []))
+
+        preferences.dietary_preferences = {"tags": "vegan", "targets": ["lots"]}
+        preferences.save()
+        response = self.client.post(reverse("weekly-meal-plan"), {"start_date": "2030-02-04"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+class FavoriteCursorTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="collector", password="secret")
+        self.client.force_authenticate(self.user)
+        recipes = [Recipe.objects.create(title=f"Dish {index}", ingredients="rice", instructions="Cook.") for index in range(11)]
+        self.client.post(reverse("my-favorites"), {"recipe_ids": [recipe.pk for recipe in recipes]}, format="json")
+        # A batch insert can give every link the same created_at; keep two distinct ones around the tie.
+        links = RecipeFavorite.objects.filter(user=self.user).order_by("id")
+        moment = timezone.now()
+        links.update(created_at=moment)
+        links.filter(pk=links[0].pk).update(created_at=moment - timedelta(days=1))
+        links.filter(pk=links[10].pk).update(created_at=moment + timedelta(days=1))
+        self.expected = [recipes[10].pk] + [recipe.pk for recipe in reversed(recipes[1:10])] + [recipes[0].pk]
+
+    def walk(self, url, key):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe["id"] for recipe in response.data["results"]])
+            url = response.data[key]
+        return pages
+
+    def test_cursors_round_trip_across_created_at_ties(self):
+        for page_size in (2, 3, 4):
+            with self.subTest(page_size=page_size):
+                forward = self.walk(f"{reverse('my-favorites')}?page_size={page_size}", "next")
+                self.assertEqual([recipe_id for page in forward for recipe_id in page], self.expected)
+                self.assertTrue(all(len(page) == page_size for page in forward[:-1]))
+
+                response = self.client.get(f"{reverse('my-favorites')}?page_size={page_size}")
+                while response.data["next"]:
+                    response = self.client.get(response.data["next"])
+                backward = self.walk(response.data["previous"], "previous")
+                self.assertEqual([recipe_id for page in reversed(backward) for recipe_id in page] + forward[-1], self.expected)
+
+
+class ImportRecipesTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.existing = Recipe.objects.create(title="Soup", ingredients="water", instructions="Boil.")
+
+    def run_import(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content, encoding="utf-8")
+        out, err = StringIO(), StringIO()
+        call_command("import_recipes", str(path), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        rows = [
+            json.dumps({"title": "Salad", "ingredients": ["2 tomatoes", "1 cucumber"], "instructions": "Toss.",
+                        "nutrition": {"calories": "1,200 kcal"}, "dietary_tags": ["Vegan"]}),
+            "{not json",
+            json.dumps(["a", "list"]),
+            json.dumps({"title": "", "ingredients": "salt", "instructions": "Mix."}),
+            json.dumps({"title": "Stew", "ingredients": "beef", "instructions": "Simmer.", "nutrition": [1]}),
+        ]
+        out, err = self.run_import("recipes.ndjson", "\n".join(rows) + "\n")
+        self.assertEqual(err.splitlines(), [
+            "line 2: invalid JSON: Expecting property name enclosed in double quotes",
+            "line 3: expected a JSON object",
+            "line 4: title is required",
+            "line 5: nutrition must be a dict",
+        ])
+        self.assertIn("Imported 1 new and 0 updated recipes, skipped 4 invalid rows", out)
+        salad = Recipe.objects.get(title="Salad")
+        self.assertEqual((salad.ingredients, salad.calories), ("2 tomatoes, 1 cucumber", 1200.0))
+        self.assertEqual(set(RecipeIngredientToken.objects.filter(recipe=salad).values_list("token", flat=True)),
+                         {"tomato", "cucumber"})
+        self.assertEqual(list(Recipe.objects.with_any_tags(["vegan"]).values_list("title", flat=True)), ["Salad"])
+
+    def test_update_existing_rewrites_matching_titles(self):
+        content = "title,ingredients,instructions,dietary_tags\nSoup,2 leeks,Simmer.,vegan;keto\nBread,flour,Bake.,\n"
+        out, err = self.run_import("recipes.csv", content, "--update-existing")
+        self.assertEqual(err, "")
+        self.assertIn("Imported 1 new and 1 updated recipes", out)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.ingredients, self.existing.dietary_tags), ("2 leeks", ["vegan", "keto"]))
+        self.assertEqual(set(RecipeIngredientToken.objects.filter(recipe=self.existing).values_list("token", flat=True)),
+                         {"leek"})
+
+        out, _ = self.run_import("again.csv", content)
+        self.assertIn("Imported 2 new and 0 updated recipes", out)
+        self.assertEqual(Recipe.objects.filter(title="Soup").count(), 2)
+
+    def test_rows_sharing_a_title_are_kept_unless_updating(self):
+        rows = [
+            {"title": "Pancakes", "ingredients": "flour, milk", "instructions": "Fry."},
+            {"title": "Pancakes", "ingredients": "buckwheat, water", "instructions": "Fry thin."},
+            {"title": "Soup", "ingredients": "2 leeks", "instructions": "Simmer."},
+        ]
+        content = "".join(json.dumps(row) + "\n" for row in rows)
+        out, _ = self.run_import("recipes.ndjson", content)
+        self.assertIn("Imported 3 new and 0 updated recipes", out)
+        self.assertEqual(
+            sorted(Recipe.objects.filter(title="Pancakes").values_list("ingredients", flat=True)),
+            ["buckwheat, water", "flour, milk"],
+        )
+
+        Recipe.objects.filter(title="Pancakes").delete()
+        out, _ = self.run_import("again.ndjson", content, "--update-existing")
+        self.assertIn("Imported 1 new and 2 updated recipes", out)
+        self.assertEqual(list(Recipe.objects.filter(title="Pancakes").values_list("ingredients", flat=True)),
+                         ["buckwheat, water"])
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.ingredients, "2 leeks")
@@ -1,32 +1,67 @@
 from rest_framework import generics, status, permissions
-from .models import Recipe, MealPlan, RecipeReview
+from .models import Recipe, MealPlan, RecipeFavorite, RecipeReview
 from .serializers import RecipeSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
-import random
 from .serializers import MealPlanSerializer
 from rest_framework.decorators import api_view, permission_classes
 from django.utils import timezone
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import CachedJWTAuthentication
 from rest_framework.decorators import authentication_classes
 from datetime import date, timedelta
-from .models import UserPreferences
+from .models import UserPreferences, tag_names
 from .serializers import UserPreferencesSerializer
 from .models import DietaryFilter
 from .serializers import DietaryFilterSerializer
 import logging
-from django.db.models import Count
+import math
 from .serializers import RecipeSerializer
-from .models import IngredientSubstitute
+from .models import IngredientSubstitute, RecipeIngredient
 from .serializers import IngredientSubstituteSerializer
 from django.db.models import F
 from django.db.models.functions import Cast
 from .serializers import RecipeReviewSerializer
+from .dietary import filter_by_tags
+from .indexing import search_recipe_ids
+from .nutrition import raw_value
+from .leftovers import rank_recipes
+from .recommendations import recommend
+from .sampling import pick_random_recipe, sample_recipes
+from .planning import create_meal_plans, draw_recipe_ids
+from .pagination import (
+    FavoriteCursorPagination, MealHistoryCursorPagination, RecipeCursorPagination, ReviewCursorPagination,
+)
+from .export import EXPORT_FIELDS, export_queryset, iter_ndjson
+from .ratings import rate
+from .leaderboard import BOARDS, popular_recipes
+from .favorites import MAX_BATCH_SIZE, favorite, unfavorite
+from .optimizer import MAX_DAYS as MAX_OPTIMIZED_DAYS, MAX_MEALS_PER_DAY, optimize_week, parse_targets
+from .shopping import MAX_RANGE_DAYS, shopping_list
+from .substitutes import MAX_BATCH_SIZE as SUBSTITUTE_BATCH_SIZE, diet_tags, substitute_index
+from . import batch, response_cache
+from .response_cache import cached_response, recipe_scope
+from django.conf import settings
+from .conditional import (
+    has_validators, meal_plan_version, not_modified, recipe_version, set_validators, stored_meal_plan_version,
+    stored_recipe_version,
+)
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import IsAdminUser
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+
+def _dietary_preferences(user):
+    """Returns the user's stored ``dietary_preferences``, or ``{}`` when there are none or they are not an object."""
+    preferences = UserPreferences.objects.filter(user=user).values_list("dietary_preferences", flat=True).first()
+    return preferences if isinstance(preferences, dict) else {}
+
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def plan_meals(request):
     data = request.data
@@ -35,20 +70,22 @@ def plan_meals(request):
     if not date_str:
         return Response({"error": "Date is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    date = parse_date(date_str)
+    try:
+        date = parse_date(str(date_str))
+    except ValueError:
+        date = None
     if not date:
         return Response({"error": "Invalid date format, use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
 
     if MealPlan.objects.filter(user=request.user, date=date).exists():
         return Response({"error": "Meal plan already exists for this date"}, status=status.HTTP_400_BAD_REQUEST)
 
-    user_preferences = UserPreferences.objects.filter(user=request.user).first()
-    dietary_tags = user_preferences.dietary_preferences.get("tags", []) if user_preferences else []
+    dietary_tags = tag_names(_dietary_preferences(request.user).get("tags"))
 
     if dietary_tags:
-        recipes = Recipe.objects.filter(dietary_tags__overlap=dietary_tags)[:3]
+        recipes = Recipe.objects.with_any_tags(dietary_tags).order_by('id')[:3]
     else:
-        recipes = Recipe.objects.all()[:3]
+        recipes = Recipe.objects.order_by('id')[:3]
 
     if not recipes.exists():
         return Response({"error": "No suitable recipes found based on your preferences"}, status=status.HTTP_404_NOT_FOUND)
@@ -57,19 +94,15 @@ def plan_meals(request):
     meal_plan.recipes.set(recipes)
     meal_plan.save()
 
-    print(f"MealPlan object: {meal_plan.__dict__}")
-
-    # 🚀 Debugging: Print the serialized MealPlan data
     serializer = MealPlanSerializer(meal_plan)
-    print(f"Serialized MealPlan Data: {json.dumps(serializer.data, indent=2)}")
-
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_dietary_filters(request):
-    filters = DietaryFilter.objects.all()
-    serializer = DietaryFilterSerializer(filters, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    def build():
+        serializer = DietaryFilterSerializer(DietaryFilter.objects.all(), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    return cached_response("dietary-filters", [response_cache.DIETARY_FILTERS], build)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -87,11 +120,17 @@ def get_week_meal_plan(request):
     start_date = timezone.now().date()
     end_date = start_date + timedelta(days=6)
     user = request.user
-    meal_plans = MealPlan.objects.filter(user=user, date__range=[start_date, end_date])
-    if not meal_plans.exists():
+    week = MealPlan.objects.filter(user=user, date__range=[start_date, end_date])
+    if has_validators(request):
+        response = not_modified(request, stored_meal_plan_version('week', week))
+        if response is not None:
+            return response
+    meal_plans = list(week.with_recipes())
+    if not meal_plans:
         return Response({'detail': 'No meal plans found for this week.'}, status=status.HTTP_404_NOT_FOUND)
     serializer = MealPlanSerializer(meal_plans, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    response = Response(serializer.data, status=status.HTTP_200_OK)
+    return set_validators(response, meal_plan_version('week', meal_plans))
 
 class RecipeReviewView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -101,8 +140,10 @@ class RecipeReviewView(APIView):
         reviews = RecipeReview.objects.filter(recipe_id=recipe_id)
         if not reviews.exists():
             return Response({"message": "No ratings yet"}, status=status.HTTP_200_OK)
-        serializer = RecipeReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = ReviewCursorPagination()
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        serializer = RecipeReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request, recipe_id):
         try:
@@ -116,36 +157,39 @@ class RecipeReviewView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+NUTRITION_GOALS = {
+    'high-protein': {'protein__gte': 40},
+    'low-protein': {'protein__lte': 20},
+    'low-calorie': {'calories__lte': 400},
+    'low-fat': {'fat__lte': 10},
+    'high-fat': {'fat__gte': 20},
+    'high-carbs': {'carbs__gte': 30},
+}
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_by_nutrition(request):
+    """Filters recipes by a named ``goal``, ``min_<field>``/``max_<field>`` bounds on the nutrition columns, or both."""
     goal = request.query_params.get('goal', '').lower()
-    recipes = Recipe.objects.all()
-    filtered_recipes = []
-    for recipe in recipes:
-        if isinstance(recipe.nutrition, dict):
+    bounds = {}
+    for field in Recipe.NUTRITION_FIELDS:
+        for prefix, lookup in (('min', 'gte'), ('max', 'lte')):
+            value = request.query_params.get(f'{prefix}_{field}')
+            if value is None:
+                continue
             try:
-                protein = int(str(recipe.nutrition.get("protein", "0")).replace("g", ""))
-                calories = int(str(recipe.nutrition.get("calories", "0")).replace("g", ""))
-                carbs = int(str(recipe.nutrition.get("carbs", "0")).replace("g", ""))
-                fat = recipe.nutrition.get("fat") or recipe.nutrition.get("fats", "0")
-                fat = int(str(fat).replace("g", ""))
-
-                if goal == 'high-protein' and protein >= 40:
-                    filtered_recipes.append(recipe)
-                elif goal == 'low-protein' and protein <= 20:
-                    filtered_recipes.append(recipe)
-                elif goal == 'low-calorie' and calories <= 400:
-                    filtered_recipes.append(recipe)
-                elif goal == 'low-fat' and fat <= 10:
-                    filtered_recipes.append(recipe)
-                elif goal == 'high-fat' and fat >= 20:
-                    filtered_recipes.append(recipe)
-                elif goal == 'high-carbs' and carbs >= 30:
-                    filtered_recipes.append(recipe)
+                value = float(value)
             except ValueError:
-                continue
-    if not filtered_recipes:
+                value = math.nan
+            if not math.isfinite(value):
+                return Response({"error": f"{prefix}_{field} must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+            bounds[f'{field}__{lookup}'] = value
+    if goal in NUTRITION_GOALS or (bounds and not goal):
+        filtered_recipes = Recipe.objects.with_favorites().filter(**NUTRITION_GOALS.get(goal, {})).filter(**bounds).order_by('id')
+    else:
+        filtered_recipes = Recipe.objects.none()
+    if not filtered_recipes.exists():
         return Response({"message": f"No recipes found for goal: '{goal}'"}, status=status.HTTP_200_OK)
     serializer = RecipeSerializer(filtered_recipes, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -153,17 +197,20 @@ def search_by_nutrition(request):
 @permission_classes([IsAuthenticated])
 def get_meal_history(request):
     user = request.user
-    meal_plans = MealPlan.objects.filter(user=user).order_by('-date')
-    if not meal_plans.exists():
+    paginator = MealHistoryCursorPagination()
+    meal_plans = paginator.paginate_queryset(MealPlan.objects.filter(user=user).with_recipes(), request)
+    if not meal_plans and not paginator.cursor:
         return Response({"detail": "No meal history found."}, status=status.HTTP_404_NOT_FOUND)
 
     meal_plan_serializer = MealPlanSerializer(meal_plans, many=True)
-    recipe_ids = meal_plans.values_list('recipes', flat=True)
-    recommended_recipes = Recipe.objects.exclude(id__in=recipe_ids).annotate(
-        rating_count=Count('rating')
-    ).order_by('-rating', '-rating_count')[:5]
+    recipe_ids = MealPlan.objects.filter(user=user).values_list('recipes', flat=True)
+    recommended_recipes = Recipe.objects.with_favorites().exclude(id__in=recipe_ids).order_by(
+        '-rating_score', '-rating_count'
+    )[:5]
     recommended_serializer = RecipeSerializer(recommended_recipes, many=True)
     return Response({
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link(),
         "meal_history": meal_plan_serializer.data,
         "recommended_recipes": recommended_serializer.data
     }, status=status.HTTP_200_OK)
@@ -177,56 +224,74 @@ def suggest_recipes_from_leftovers(request):
         return Response({
             "detail": "No leftover ingredients provided."
         }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(data.get('limit', 20))
+        min_coverage = float(data.get('min_coverage', 0))
+    except (TypeError, ValueError):
+        return Response({"detail": "limit must be an integer and min_coverage a number."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= limit <= 100 or not 0 <= min_coverage <= 1:
+        return Response({"detail": "limit must be between 1 and 100 and min_coverage between 0 and 1."},
+                        status=status.HTTP_400_BAD_REQUEST)
     leftovers = [ingredient.lower().strip() for ingredient in leftovers]
-    suggested_recipes = Recipe.objects.filter(
-        ingredients__icontains=leftovers[0]
-    ).distinct()
-    if len(leftovers) > 1:
-        for ingredient in leftovers[1:]:
-            suggested_recipes = suggested_recipes.filter(ingredients__icontains=ingredient)
-    if not suggested_recipes.exists():
+    matches, truncated = rank_recipes(leftovers, limit, min_coverage)
+    if not matches:
         return Response({
             "detail": "No recipes found using the provided ingredients."
         }, status=status.HTTP_404_NOT_FOUND)
-    serializer = RecipeSerializer(suggested_recipes, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    recipes = Recipe.objects.with_favorites().in_bulk([recipe_id for recipe_id, _, _ in matches])
+    suggestions = []
+    for recipe_id, coverage, missing in matches:
+        if recipe_id not in recipes:
+            continue
+        suggestion = RecipeSerializer(recipes[recipe_id]).data
+        suggestion["coverage"] = round(coverage, 3)
+        suggestion["missing_count"] = len(missing)
+        suggestion["missing_ingredients"] = missing
+        suggestions.append(suggestion)
+    response = Response(suggestions, status=status.HTTP_200_OK)
+    if truncated:
+        response["X-Results-Truncated"] = "true"
+    return response
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generate_shopping_list(request):
-    user = request.user
+    """Sums the ingredient quantities of the user's meal plans from ``start`` to ``end``, the coming week by default."""
     start_date = timezone.now().date()
     end_date = start_date + timedelta(days=7)
-    meal_plans = MealPlan.objects.filter(user=user, date__range=[start_date, end_date])
-    if not meal_plans.exists():
-        return Response({
-            "detail": "No meal plans found for the current week."
-        }, status=status.HTTP_404_NOT_FOUND)
-    shopping_list = {}
-    for meal_plan in meal_plans:
-        for recipe in meal_plan.recipes.all():
-            ingredients = recipe.ingredients.split(',')
-            for ingredient in ingredients:
-                ingredient = ingredient.strip()
-                if ingredient in shopping_list:
-                    shopping_list[ingredient] += 1
-                else:
-                    shopping_list[ingredient] = 1
-    formatted_list = [{"ingredient": item, "quantity": quantity} for item, quantity in shopping_list.items()]
-    return Response({
-        "shopping_list": formatted_list
-    }, status=status.HTTP_200_OK)
+    if request.query_params.get('start') or request.query_params.get('end'):
+        try:
+            start_date = parse_date(request.query_params.get('start', ''))
+            end_date = parse_date(request.query_params.get('end', ''))
+        except ValueError:
+            start_date = end_date = None
+        if not start_date or not end_date or end_date < start_date:
+            return Response({"error": "Invalid date range, use start and end as YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if (end_date - start_date).days >= MAX_RANGE_DAYS:
+            return Response({"error": f"The range can span at most {MAX_RANGE_DAYS} days."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    lines = shopping_list(request.user, start_date, end_date)
+    if lines is None:
+        return Response({"detail": "No meal plans found for the selected dates."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"start": start_date, "end": end_date, "shopping_list": lines}, status=status.HTTP_200_OK)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_nutritional_summary(request, recipe_id):
+    return cached_response(
+        "nutritional-summary", [recipe_scope(recipe_id)], lambda: _nutritional_summary(recipe_id), recipe_id
+    )
+
+def _nutritional_summary(recipe_id):
     try:
         recipe = Recipe.objects.get(pk=recipe_id)
         nutrition = recipe.nutrition
         summary = {
-            "calories": nutrition.get("calories", "N/A"),
-            "protein": nutrition.get("protein", "N/A"),
-            "carbohydrates": nutrition.get("carbohydrates", "N/A"),
-            "fat": nutrition.get("fat", "N/A"),
-            "fiber": nutrition.get("fiber", "N/A")
+            "calories": raw_value(nutrition, "calories", "N/A"),
+            "protein": raw_value(nutrition, "protein", "N/A"),
+            "carbohydrates": raw_value(nutrition, "carbs", "N/A"),
+            "fat": raw_value(nutrition, "fat", "N/A"),
+            "fiber": raw_value(nutrition, "fiber", "N/A")
         }
 
         return Response({
@@ -243,17 +308,25 @@ def get_nutritional_summary(request, recipe_id):
 @permission_classes([IsAuthenticated])
 def get_ingredient_substitute(request, ingredient):
     ingredient = ingredient.lower()
-    try:
-        substitute_entry = IngredientSubstitute.objects.get(ingredient=ingredient)
-        return Response({
-            "ingredient": ingredient,
-            "substitutes": substitute_entry.substitutes
-        }, status=status.HTTP_200_OK)
-    except IngredientSubstitute.DoesNotExist:
+    return cached_response(
+        "ingredient-substitute", [response_cache.SUBSTITUTES], lambda: _ingredient_substitute(ingredient), ingredient
+    )
+
+def _ingredient_substitute(ingredient):
+    index = substitute_index.get()
+    match = index.lookup(ingredient)
+    if match is None:
         return Response({
             "ingredient": ingredient,
-            "substitutes": ["No substitutes found."]
+            "substitutes": ["No substitutes found."],
+            "suggestions": index.suggest(ingredient)
         }, status=status.HTTP_404_NOT_FOUND)
+    matched, substitutes = match
+    return Response({
+        "ingredient": ingredient,
+        "matched": matched,
+        "substitutes": substitutes
+    }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -263,6 +336,57 @@ def add_ingredient_substitute(request):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_ingredient_substitutes(request):
+    """
+    Resolves substitutes for many ingredients at once, keyed by ingredient.
+
+    The ingredients come from exactly one of ``ingredients`` (comma-separated),
+    ``recipe_id``, or ``start_date`` and ``end_date`` spanning the user's meal plans.
+    Substitutes ruled out by the user's dietary tags are listed under "excluded".
+    """
+    params = request.query_params
+    sources = [name for name in ("ingredients", "recipe_id", "start_date") if params.get(name)]
+    if len(sources) != 1:
+        return Response({"error": "Provide exactly one of ingredients, recipe_id or start_date and end_date."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if sources == ["ingredients"]:
+        names = [name.strip().lower() for name in params["ingredients"].split(',') if name.strip()]
+    elif sources == ["recipe_id"]:
+        try:
+            recipe_id = int(params["recipe_id"])
+        except ValueError:
+            return Response({"error": "recipe_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        names = list(RecipeIngredient.objects.filter(recipe_id=recipe_id).values_list("ingredient__name", flat=True))
+        if not names and not Recipe.objects.filter(pk=recipe_id).exists():
+            return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        try:
+            start_date, end_date = parse_date(params["start_date"]), parse_date(params.get("end_date", ""))
+        except ValueError:
+            start_date = end_date = None
+        if not start_date or not end_date or end_date < start_date:
+            return Response({"error": "Invalid date range, use start_date and end_date as YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        names = list(
+            RecipeIngredient.objects.filter(
+                recipe__mealplan__user=request.user, recipe__mealplan__date__range=[start_date, end_date]
+            ).order_by("ingredient__name").values_list("ingredient__name", flat=True).distinct()
+        )
+
+    names = list(dict.fromkeys(names))
+    if len(names) > SUBSTITUTE_BATCH_SIZE:
+        return Response({"error": f"At most {SUBSTITUTE_BATCH_SIZE} ingredients can be resolved at once."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    preferences = _dietary_preferences(request.user)
+    tags = diet_tags(preferences)
+    return Response({
+        "dietary_tags": tags,
+        "substitutes": substitute_index.get().resolve(names, tags)
+    }, status=status.HTTP_200_OK)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def rate_recipe(request, id):
@@ -282,29 +406,71 @@ def rate_recipe(request, id):
             raise ValueError
     except ValueError:
         return Response({'detail': 'Rating must be a number between 0 and 5.'}, status=status.HTTP_400_BAD_REQUEST)
-    recipe.rating = new_rating
-    recipe.save()
+    rate(recipe, request.user, new_rating)
     serializer = RecipeSerializer(recipe)
     return Response(serializer.data, status=status.HTTP_200_OK)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_popular_recipes(request):
-    recipes = Recipe.objects.annotate(
-        favorites_count=Count('favorites')
-    ).order_by('-rating', '-favorites_count')[:10]
-    serializer = RecipeSerializer(recipes, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    board = request.query_params.get('window', 'all-time')
+    if board not in BOARDS:
+        return Response(
+            {'detail': f"window must be one of: {', '.join(BOARDS)}."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def build():
+        serializer = RecipeSerializer(popular_recipes(board, limit=10), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    # Never keep a payload longer than the leaderboard it was built from may be stale.
+    timeout = getattr(settings, "POPULAR_RECIPES_MAX_STALENESS", 30)
+    return cached_response("popular-recipes", [response_cache.RECIPES], build, board, timeout=timeout)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_to_favorites(request, id):
-    try:
-        recipe = Recipe.objects.get(id=id)
-    except Recipe.DoesNotExist:
+    if favorite(request.user, [id]):
+        return Response({"detail": "Recipe added to favorites."}, status=status.HTTP_200_OK)
+    if not Recipe.objects.filter(id=id).exists():
         return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
-    if recipe.favorites.filter(id=request.user.id).exists():
-        return Response({"detail": "Recipe is already in favorites."}, status=status.HTTP_400_BAD_REQUEST)
-    recipe.favorites.add(request.user)
-    return Response({"detail": "Recipe added to favorites."}, status=status.HTTP_200_OK)
+    return Response({"detail": "Recipe is already in favorites."}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def favorite_recipe(request, id):
+    """Idempotently favorites (POST) or unfavorites (DELETE) one recipe."""
+    if request.method == 'POST':
+        changed = bool(favorite(request.user, [id]))
+    else:
+        changed = bool(unfavorite(request.user, [id]))
+    if not changed and not Recipe.objects.filter(id=id).exists():
+        return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"favorited": request.method == 'POST', "changed": changed}, status=status.HTTP_200_OK)
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def my_favorites(request):
+    """Lists the user's favorites, newest first, or favorites (POST) / unfavorites (DELETE) a list of ``recipe_ids``."""
+    if request.method == 'GET':
+        paginator = FavoriteCursorPagination()
+        links = RecipeFavorite.objects.filter(user=request.user).select_related('recipe').prefetch_related(
+            Prefetch('recipe__favorites', queryset=User.objects.only('id'))
+        )
+        page = paginator.paginate_queryset(links, request)
+        serializer = RecipeSerializer([link.recipe for link in page], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    recipe_ids = request.data.get('recipe_ids')
+    if (
+        not isinstance(recipe_ids, list)
+        or not all(isinstance(recipe_id, int) and not isinstance(recipe_id, bool) for recipe_id in recipe_ids)
+    ):
+        return Response({"detail": "recipe_ids must be a list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(recipe_ids) > MAX_BATCH_SIZE:
+        return Response(
+            {"detail": f"At most {MAX_BATCH_SIZE} recipe_ids per request."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if request.method == 'POST':
+        return Response({"added": favorite(request.user, recipe_ids)}, status=status.HTTP_200_OK)
+    return Response({"removed": unfavorite(request.user, recipe_ids)}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -312,11 +478,17 @@ def add_to_favorites(request, id):
 def get_today_meal_plan(request):
     today = timezone.now().date()
     user = request.user
-    meal_plan = MealPlan.objects.filter(user=user, date=today).first()
+    today_plans = MealPlan.objects.filter(user=user, date=today)
+    if has_validators(request):
+        response = not_modified(request, stored_meal_plan_version('today', today_plans, limit=1))
+        if response is not None:
+            return response
+    meal_plan = today_plans.with_recipes().first()
     if not meal_plan:
         return Response({'detail': 'No meal plan found for today.'}, status=status.HTTP_404_NOT_FOUND)
     serializer = MealPlanSerializer(meal_plan)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    response = Response(serializer.data, status=status.HTTP_200_OK)
+    return set_validators(response, meal_plan_version('today', [meal_plan]))
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def weekly_meal_plan(request):
@@ -328,35 +500,105 @@ def weekly_meal_plan(request):
         start_date = date.fromisoformat(start_date_str)
     except ValueError:
         return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
-    user = request.user
-    meal_plans = []
-    for i in range(7):
-        meal_date = start_date + timedelta(days=i)
-        recipes = Recipe.objects.order_by('?')[:3]
-        if not recipes.exists():
-            return Response({"error": "No recipes available to create meal plan."}, status=status.HTTP_400_BAD_REQUEST)
-        meal_plan = MealPlan.objects.create(user=user, date=meal_date)
-        meal_plan.recipes.set(recipes)
-        meal_plan.save()
-        meal_plans.append(meal_plan)
+    preferences = _dietary_preferences(request.user)
+    raw_targets = data.get("targets") or preferences.get("targets")
+    if raw_targets:
+        # With nutrition targets the week is solved for them instead of drawn at random.
+        try:
+            targets = parse_targets(raw_targets)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result = optimize_week(targets, tags=tag_names(preferences.get("tags")))
+        recipe_ids_by_day = result["recipe_ids"] if result else []
+    else:
+        recipe_ids_by_day = draw_recipe_ids(days=7, per_day=3)
+    if not recipe_ids_by_day:
+        return Response({"error": "No recipes available to create meal plan."}, status=status.HTTP_400_BAD_REQUEST)
+    meal_plans = create_meal_plans(request.user, start_date, recipe_ids_by_day)
     serializer = MealPlanSerializer(meal_plans, many=True)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def optimize_meal_plan(request):
+    """
+    Solves ``days`` days of ``meals_per_day`` recipes for daily nutrition ``targets``.
+
+    Targets default to ``targets`` in the user's dietary preferences, whose tags every
+    recipe must carry. The plan is only previewed unless ``save`` is true, in which case
+    it is stored as meal plans from ``start_date``.
+    """
+    data = request.data
+    start_date = timezone.now().date()
+    if data.get("start_date"):
+        try:
+            start_date = parse_date(str(data["start_date"]))
+        except ValueError:
+            start_date = None
+        if not start_date:
+            return Response({"error": "Invalid start_date, use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        days = int(data.get("days", 7))
+        meals_per_day = int(data.get("meals_per_day", 3))
+    except (TypeError, ValueError):
+        return Response({"error": "days and meals_per_day must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= MAX_OPTIMIZED_DAYS or not 1 <= meals_per_day <= MAX_MEALS_PER_DAY:
+        return Response({"error": f"Plan 1 to {MAX_OPTIMIZED_DAYS} days of 1 to {MAX_MEALS_PER_DAY} meals."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    preferences = _dietary_preferences(request.user)
+    try:
+        targets = parse_targets(data.get("targets") or preferences.get("targets"))
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    result = optimize_week(targets, tags=tag_names(preferences.get("tags")), days=days, meals_per_day=meals_per_day)
+    if result is None:
+        return Response({"error": "Not enough recipes with nutrition data match your preferences."},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    if data.get("save"):
+        meal_plans = create_meal_plans(request.user, start_date, result["recipe_ids"])
+        recipes = {recipe.pk: recipe for meal_plan in meal_plans for recipe in meal_plan.recipes.all()}
+    else:
+        recipes = Recipe.objects.with_favorites().in_bulk([pk for day in result["recipe_ids"] for pk in day])
+    plan = [
+        {
+            "date": start_date + timedelta(days=offset),
+            "recipes": RecipeSerializer([recipes[pk] for pk in recipe_ids if pk in recipes], many=True).data,
+            "totals": totals,
+        }
+        for offset, (recipe_ids, totals) in enumerate(zip(result["recipe_ids"], result["totals"]))
+    ]
+    return Response({
+        "targets": targets,
+        "plan": plan,
+        "error": result["error"],
+        "saved": bool(data.get("save")),
+    }, status=status.HTTP_201_CREATED if data.get("save") else status.HTTP_200_OK)
 class RecipeRecommendationsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, id):
         try:
             base_recipe = Recipe.objects.get(id=id)
-            other_recipes = Recipe.objects.exclude(id=id)
-            recommended_recipes = random.sample(list(other_recipes), min(3, other_recipes.count()))
-            serializer = RecipeSerializer(recommended_recipes, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
         except Recipe.DoesNotExist:
             return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 3)), 1), 50)
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        recommended_ids = [recipe_id for recipe_id, _ in recommend(base_recipe, limit)]
+        recipes_by_id = Recipe.objects.with_favorites().in_bulk(recommended_ids)
+        recommended_recipes = [recipes_by_id[recipe_id] for recipe_id in recommended_ids if recipe_id in recipes_by_id]
+        serializer = RecipeSerializer(recommended_recipes, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 class RecipeNutritionView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, id):
+        return cached_response("recipe-nutrition", [recipe_scope(id)], lambda: self.build(id), id)
+
+    def build(self, id):
         try:
             recipe = Recipe.objects.get(id=id)
             nutrition = recipe.nutrition
@@ -364,9 +606,23 @@ class RecipeNutritionView(APIView):
         except Recipe.DoesNotExist:
             return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
 class RecipeRetrieveView(generics.RetrieveAPIView):
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.with_favorites()
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticated]
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs["pk"]
+        if has_validators(request):
+            response = not_modified(request, stored_recipe_version(pk))
+            if response is not None:
+                return response
+        return cached_response("recipe-detail", [recipe_scope(pk)], self.build, pk)
+
+    def build(self):
+        # A missing recipe raises Http404 here, so only found recipes are cached.
+        recipe = self.get_object()
+        response = Response(self.get_serializer(recipe).data, status=status.HTTP_200_OK)
+        return set_validators(response, recipe_version(recipe))
 class RecipeDeleteView(generics.DestroyAPIView):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
@@ -378,12 +634,11 @@ class RecipeListView(generics.ListAPIView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def random_recipe(request):
-    recipes = Recipe.objects.all()
+    recipe = pick_random_recipe()
 
-    if not recipes.exists():
+    if recipe is None:
         return Response({"error": "No recipes available"}, status=404)
 
-    recipe = random.choice(recipes)
     serializer = RecipeSerializer(recipe)
     return Response(serializer.data)
 class RecipeUpdateView(generics.UpdateAPIView):
@@ -407,8 +662,16 @@ class RecipeCreateView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 class RecipeListView(generics.ListCreateAPIView):
-    queryset = Recipe.objects.all()
+    """Lists recipes, optionally only those carrying all (or, with ``match=any``, any) of ``tags``."""
+    queryset = Recipe.objects.with_favorites()
     serializer_class = RecipeSerializer
+    pagination_class = RecipeCursorPagination
+
+    def get_queryset(self):
+        try:
+            return filter_by_tags(super().get_queryset(), self.request.query_params)
+        except ValueError as exc:
+            raise ParseError(str(exc))
 
 class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Recipe.objects.all()
@@ -424,14 +687,13 @@ class RecipeSearchByIngredientsView(APIView):
             return Response({"error": "No ingredients provided"}, status=400)
 
         ingredient_list = [ingredient.strip().lower() for ingredient in ingredients_query.split(',')]
-        recipes = Recipe.objects.filter(ingredients__icontains=ingredient_list[0])
-
-        for ingredient in ingredient_list[1:]:
-            recipes = recipes.filter(ingredients__icontains=ingredient)
-
-        if not recipes.exists():
+        recipe_ids = search_recipe_ids(ingredient_list)
+        if not recipe_ids:
             return Response({"message": "No available"}, status=200)
 
+        recipes_by_id = Recipe.objects.with_favorites().in_bulk(recipe_ids)
+        recipes = [recipes_by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes_by_id]
+
         serializer = RecipeSerializer(recipes, many=True)
         return Response(serializer.data)
 
@@ -448,19 +710,64 @@ class MealPlanCreateView(APIView):
         if not date:
             return Response({"error": "Date is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if dietary_preference:
-            recipes = Recipe.objects.filter(dietary_tags__icontains=dietary_preference)
-        else:
-            recipes = Recipe.objects.all()
-
-        if not recipes.exists():
+        meal_plan = sample_recipes(3, tag=dietary_preference or None)
+        if not meal_plan:
             return Response({"error": "No recipes found for the given dietary preference"}, status=status.HTTP_404_NOT_FOUND)
 
-        meal_plan = random.sample(list(recipes), min(3, len(recipes)))
-
-        serializer = MealPlanSerializer(meal_plan, many=True)
+        serializer = RecipeSerializer(meal_plan, many=True)
         return Response({
             "date": date,
             "meals": serializer.data
         }, status=status.HTTP_201_CREATED)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_recipes(request):
+    """Streams the catalog as NDJSON, one recipe per line, with optional updated_since and fields filters."""
+    fields = [field.strip() for field in request.query_params.get('fields', '').split(',') if field.strip()]
+    fields = fields or list(EXPORT_FIELDS)
+    unknown = sorted(set(fields) - set(EXPORT_FIELDS))
+    if unknown:
+        return Response({"error": f"Unknown fields: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    updated_since = None
+    updated_since_str = request.query_params.get('updated_since')
+    if updated_since_str:
+        try:
+            updated_since = parse_datetime(updated_since_str)
+            if updated_since is None and parse_date(updated_since_str):
+                updated_since = parse_datetime(f"{updated_since_str}T00:00:00")
+        except ValueError:
+            updated_since = None
+        if updated_since is None:
+            return Response({"error": "Invalid updated_since, use an ISO 8601 date or datetime."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(updated_since):
+            updated_since = timezone.make_aware(updated_since)
+
+    queryset = export_queryset(fields, updated_since)
+    return StreamingHttpResponse(iter_ndjson(queryset, fields), content_type="application/x-ndjson")
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """Hit and miss counts of the response cache per endpoint."""
+    return Response(response_cache.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_requests(request):
+    """
+    Answers a list of API calls, e.g. everything a screen needs, in one round trip.
+
+    ``requests`` holds ``{"method", "path", "body"}`` items, run as the authenticated
+    user without repeating authentication or middleware. Results come back in the same
+    order, each with its own status; a failing item does not fail the batch.
+    """
+    try:
+        items = batch.parse(request.data.get("requests"))
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"responses": batch.run(request, items)}, status=status.HTTP_200_OK)